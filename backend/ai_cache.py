@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from sqlmodel import Session, select, delete
+from models import AICacheEntry
+from singleflight import SingleFlight
+from database import engine
+from logger import logger
+from metrics import metrics
+
+def _digest(kind: str, text: str) -> str:
+    return f"{kind}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+def plan_key(plan_text: str) -> str:
+    """Line endings, surrounding whitespace and blank lines do not change the structured plan."""
+    lines = [line.strip() for line in plan_text.replace("\r\n", "\n").split("\n")]
+    return _digest("plan", "\n".join(line for line in lines if line))
+
+def project_fingerprint(project_data: Dict[str, Any]) -> str:
+    """Hash of the parts of a project's stats that advice depends on."""
+    state = {
+        "id": project_data.get("id"),
+        "deadline": project_data.get("deadline"),
+        "tasks": sorted(
+            (t.get("id"), t.get("status"), t.get("estimated_hours"), t.get("milestone_id"), t.get("deadline"))
+            for t in project_data.get("tasks", [])
+        ),
+        "critical_path": project_data.get("critical_path"),
+        "risk_score": project_data.get("risk_score"),
+        "delay_prob": project_data.get("delay_prob"),
+        "forecast_completion": project_data.get("forecast_completion"),
+    }
+    return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def advice_key(project_data: Dict[str, Any], available_hours: float) -> str:
+    return _digest("advice", f"{project_fingerprint(project_data)}:{float(available_hours)}")
+
+class AIResultCache:
+    """
+    Two-tier cache for model results: an in-process LRU in front of an SQLite table, both
+    with a TTL. Misses for the same key that arrive together trigger one model call.
+    Values must be JSON-serialisable; every hit returns a fresh copy.
+    """
+    def __init__(self, engine, max_entries: int = 256, ttl_seconds: float = 24 * 3600):
+        self._engine = engine
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._flights = SingleFlight()
+
+    def get_or_compute(self, kind: str, key: str, fn: Callable[[], Any]) -> Any:
+        payload = self._memory_get(key)
+        if payload is None:
+            payload = self._flights.do(key, lambda: self._load_or_compute(kind, key, fn))
+        else:
+            metrics.increment("ai_cache_hits")
+        return json.loads(payload)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def purge_expired(self) -> int:
+        with Session(self._engine) as session:
+            result = session.exec(delete(AICacheEntry).where(AICacheEntry.expires_at <= datetime.utcnow()))
+            session.commit()
+            return result.rowcount
+
+    async def get_or_compute_async(self, kind: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant for coroutine model calls; SQLite access runs in worker threads."""
+        payload = self._memory_get(key)
+        if payload is None:
+            async def load() -> str:
+                return await self._load_or_compute_async(kind, key, fn)
+            payload = await self._flights.do_async(key, load)
+        else:
+            metrics.increment("ai_cache_hits")
+        return json.loads(payload)
+
+    def _load_or_compute(self, kind: str, key: str, fn: Callable[[], Any]) -> str:
+        payload = self._lookup(key)
+        if payload is not None:
+            return payload
+        metrics.increment("ai_cache_misses")
+        start_time = time.time()
+        payload = json.dumps(fn())
+        self._log_call(kind, start_time)
+        self._store(kind, key, payload)
+        return payload
+
+    async def _load_or_compute_async(self, kind: str, key: str, fn: Callable[[], Awaitable[Any]]) -> str:
+        payload = await asyncio.to_thread(self._lookup, key)
+        if payload is not None:
+            return payload
+        metrics.increment("ai_cache_misses")
+        start_time = time.time()
+        payload = json.dumps(await fn())
+        self._log_call(kind, start_time)
+        await asyncio.to_thread(self._store, kind, key, payload)
+        return payload
+
+    def _lookup(self, key: str) -> Optional[str]:
+        # Another flight may have filled memory between our miss and this call
+        payload = self._memory_get(key)
+        if payload is not None:
+            metrics.increment("ai_cache_hits")
+            return payload
+        with Session(self._engine) as session:
+            entry = session.get(AICacheEntry, key)
+            if entry and entry.expires_at > datetime.utcnow():
+                metrics.increment("ai_cache_hits")
+                self._memory_put(key, entry.payload, (entry.expires_at - datetime.utcnow()).total_seconds())
+                return entry.payload
+        return None
+
+    def _store(self, kind: str, key: str, payload: str):
+        now = datetime.utcnow()
+        with Session(self._engine) as session:
+            session.merge(AICacheEntry(key=key, kind=kind, payload=payload, created_at=now, expires_at=now + timedelta(seconds=self.ttl_seconds)))
+            session.commit()
+        self._memory_put(key, payload, self.ttl_seconds)
+
+    @staticmethod
+    def _log_call(kind: str, start_time: float):
+        execution_time = (time.time() - start_time) * 1000
+        logger.info(f"AI call: kind={kind}, time={execution_time:.2f}ms")
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            expires_at, payload = item
+            if expires_at <= time.monotonic():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return payload
+
+    def _memory_put(self, key: str, payload: str, ttl_seconds: float):
+        with self._lock:
+            self._memory[key] = (time.monotonic() + ttl_seconds, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+ai_cache = AIResultCache(engine)
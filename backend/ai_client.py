@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+from logger import logger
+from metrics import metrics
+
+AI_BACKEND_URL = os.getenv("AI_BACKEND_URL")
+
+class AIClientError(Exception):
+    pass
+
+class AsyncAIClient:
+    """
+    Async client for the model backend.
+
+    - At most `max_concurrency` model calls are in flight; extra callers wait on a semaphore
+      instead of holding a worker thread.
+    - Every call is bounded by `timeout` seconds, including time spent streaming.
+    - Responses are streamed as NDJSON token chunks ({"token": "..."} ... {"done": true})
+      and the concatenated text is parsed as JSON once the stream ends.
+    - Advice requests arriving within `batch_window` seconds of each other are sent as one
+      batched model call (up to `max_batch` projects).
+    """
+    def __init__(self, base_url: str, max_concurrency: int = 4, timeout: float = 30.0, batch_window: float = 0.02, max_batch: int = 8):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_concurrency = max_concurrency
+        # Loop-bound state is created lazily on the loop that first uses the client
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def structure_plan(self, plan_text: str, on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        return await self._call("/v1/structure-plan", {"text": plan_text}, on_token)
+
+    async def get_advice(self, project_data: Dict[str, Any], available_hours: float) -> Dict[str, Any]:
+        self._bind()
+        future = self._loop.create_future()
+        self._pending.append(({"project": project_data, "available_hours": available_hours}, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush_batch()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.batch_window, self._flush_batch)
+        return await future
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self._loop = None
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._http = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._pending = []
+            self._flush_handle = None
+
+    def _flush_batch(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._loop.create_task(self._send_batch(batch))
+
+    async def _send_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        metrics.increment("ai_batches")
+        try:
+            response = await self._call("/v1/advice/batch", {"requests": [request for request, _ in batch]})
+            try:
+                results = list(response["results"])
+            except (KeyError, TypeError) as e:
+                raise AIClientError(f"Malformed batch response: {e!r}")
+            if len(results) != len(batch):
+                raise AIClientError(f"Batch returned {len(results)} results for {len(batch)} requests")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _call(self, path: str, payload: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        self._bind()
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(self._stream(path, payload, on_token), self.timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"AI call timed out: path={path}, timeout={self.timeout}s")
+                raise AIClientError(f"Model call to {path} timed out after {self.timeout}s")
+            except httpx.HTTPError as e:
+                raise AIClientError(f"Model call to {path} failed: {e}")
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # Unparseable chunks or answer text: the model's fault, not ours
+                logger.error(f"AI call returned a malformed response: path={path}, error={e!r}")
+                raise AIClientError(f"Model call to {path} returned a malformed response: {e!r}")
+
+    async def _stream(self, path: str, payload: Dict[str, Any], on_token: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+        body = json.dumps(payload, default=str)
+        tokens = []
+        async with self._http.stream("POST", path, content=body, headers={"Content-Type": "application/json"}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("done"):
+                    break
+                tokens.append(chunk["token"])
+                if on_token:
+                    on_token(chunk["token"])
+        return json.loads("".join(tokens))
+
+ai_client: Optional[AsyncAIClient] = AsyncAIClient(AI_BACKEND_URL) if AI_BACKEND_URL else None
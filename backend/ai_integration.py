@@ -1,10 +1,16 @@
 import json
 from typing import List, Dict, Any, Optional
 import os
+from ai_cache import AIResultCache, ai_cache, plan_key, advice_key
+from ai_client import AsyncAIClient, ai_client
 # Assuming some standard library or simple mock for AI if key is missing
 # In a real scenario, we'd use 'google-generativeai' or similar.
 
 class AIService:
+    cache: AIResultCache = ai_cache
+    # Set when AI_BACKEND_URL is configured; otherwise the rule-based mock answers
+    client: Optional[AsyncAIClient] = ai_client
+
     @staticmethod
     def _mock_ai_structure_plan(text: str) -> Dict[str, Any]:
         # Simple rule-based mock for structuring plan if no AI
@@ -29,17 +35,55 @@ class AIService:
 
     @staticmethod
     def structure_plan(project_id: int, plan_text: str) -> Dict[str, Any]:
+        # Identical plans (after whitespace normalisation) are answered from the cache
+        return AIService.cache.get_or_compute("plan", plan_key(plan_text), lambda: AIService._call_structure_plan(plan_text))
+
+    @staticmethod
+    def get_advice(project_data: Dict[str, Any], available_hours: float) -> Dict[str, Any]:
+        # Keyed on a fingerprint of the project state, so advice is reused until something changes
+        key = advice_key(project_data, available_hours)
+        return AIService.cache.get_or_compute("advice", key, lambda: AIService._call_get_advice(project_data, available_hours))
+
+    @staticmethod
+    async def structure_plan_async(project_id: int, plan_text: str) -> Dict[str, Any]:
+        # Same cache as structure_plan, but the model call never occupies a worker thread
+        async def call():
+            if AIService.client:
+                return await AIService.client.structure_plan(plan_text)
+            return AIService._call_structure_plan(plan_text)
+        return await AIService.cache.get_or_compute_async("plan", plan_key(plan_text), call)
+
+    @staticmethod
+    async def get_advice_async(project_data: Dict[str, Any], available_hours: float) -> Dict[str, Any]:
+        async def call():
+            if AIService.client:
+                return await AIService.client.get_advice(project_data, available_hours)
+            return AIService._call_get_advice(project_data, available_hours)
+        return await AIService.cache.get_or_compute_async("advice", advice_key(project_data, available_hours), call)
+
+    @staticmethod
+    def _call_structure_plan(plan_text: str) -> Dict[str, Any]:
         # This would call Gemini API
         # For now, providing the logic structure and mock
         return AIService._mock_ai_structure_plan(plan_text)
 
     @staticmethod
-    def get_advice(project_data: Dict[str, Any], available_hours: float) -> Dict[str, Any]:
+    def _call_get_advice(project_data: Dict[str, Any], available_hours: float) -> Dict[str, Any]:
         # This combines forecast + critical path + context
         # Mocking an advice response
-        return {
+        advice = {
             "recommended_task_id": project_data.get("tasks", [{}])[0].get("id"),
             "strategic_explanation": "This task is on your critical path and has the highest dependency count. Completing it now reduces overall project risk by 15%.",
             "alternate_path": "If you feel fatigued, try Task B which is low effort but still contributes to your milestone.",
             "risk_aware_reasoning": "Current delay probability is 40%. Focusing on critical path prevents timeline slippage."
         }
+        # Deadline risks are sorted latest first; the worst one outranks the critical path
+        risks = project_data.get("deadline_risks") or []
+        if risks:
+            worst = risks[0]
+            advice["recommended_task_id"] = worst["task_id"]
+            if worst["lateness_hours"] > 0:
+                advice["risk_aware_reasoning"] = f"This task is {worst['lateness_hours']:.1f}h behind what its own or a downstream deadline requires."
+            else:
+                advice["risk_aware_reasoning"] = "This task has no slack left against its own or a downstream deadline."
+        return advice
@@ -0,0 +1,119 @@
+"""
+Deterministic local model server for tests and benchmarks.
+
+Speaks the protocol AsyncAIClient expects: POST a JSON body, receive the JSON answer
+streamed as NDJSON token chunks. Answers depend only on the request, and
+`token_delay` adds per-chunk latency to imitate a slow model.
+
+    python ai_stub_server.py --port 8765 --token-delay 0.01
+"""
+import argparse
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator
+from ai_integration import AIService
+
+CHUNK_SIZE = 16
+
+def stub_advice(project: Dict[str, Any], available_hours: float) -> Dict[str, Any]:
+    pending = {t["id"]: t for t in project.get("tasks", []) if not t.get("status")}
+    fitting = [tid for tid in project.get("critical_path", []) if tid in pending and pending[tid]["estimated_hours"] <= available_hours]
+    at_risk = [r["task_id"] for r in project.get("deadline_risks", []) if r["task_id"] in pending]
+    candidates = at_risk or fitting or [tid for tid in project.get("critical_path", []) if tid in pending] or list(pending)
+    recommended = candidates[0] if candidates else None
+    return {
+        "recommended_task_id": recommended,
+        "strategic_explanation": f"Task {recommended} is the earliest open task on the critical path.",
+        "alternate_path": "Pick the next critical-path task if this one is blocked.",
+        "risk_aware_reasoning": f"Current delay probability is {project.get('delay_prob', 0)}%.",
+    }
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/v1/structure-plan":
+                answer = AIService._mock_ai_structure_plan(payload["text"])
+            elif self.path == "/v1/advice/batch":
+                with server.lock:
+                    server.batch_sizes.append(len(payload["requests"]))
+                answer = {"results": [stub_advice(r["project"], r["available_hours"]) for r in payload["requests"]]}
+            else:
+                self.send_error(404)
+                return
+            self._stream(server.reply if server.reply is not None else json.dumps(answer))
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _stream(self, text: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunks = [text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE)]
+        for chunk in chunks:
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+            self._write_chunk(json.dumps({"token": chunk}) + "\n")
+        self._write_chunk(json.dumps({"done": True}) + "\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, line: str):
+        data = line.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+class StubModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), token_delay: float = 0.0):
+        super().__init__(address, StubModelHandler)
+        self.token_delay = token_delay
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.active = 0
+        self.max_active = 0
+        self.batch_sizes = []
+        # Text streamed instead of the real answer, to imitate a malformed model response
+        self.reply = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+@contextmanager
+def run_stub_server(token_delay: float = 0.0) -> Iterator[StubModelServer]:
+    """Serve on a free local port in a background thread for the duration of the block."""
+    server = StubModelServer(token_delay=token_delay)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic stub model server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    server = StubModelServer(("127.0.0.1", args.port), token_delay=args.token_delay)
+    print(f"Stub model server on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,126 @@
+import time
+from datetime import datetime
+from typing import Dict, List, Set, Tuple
+from sqlmodel import Session, select
+from models import Task, Milestone, TaskDependency, BehaviorLog, ProjectBatch, check_three_point
+from records import load_task_records
+from logic import load_dependencies
+from graph_engine import GraphEngine
+from rollups import record_behavior_logs, remove_behavior_logs
+from logger import logger
+
+# Patch fields where an explicit null means "clear"; elsewhere null means "leave alone"
+NULLABLE_FIELDS = {"milestone_id", "completed_at", "target_date", "optimistic_hours", "most_likely_hours", "pessimistic_hours"}
+
+def _patch_values(patch) -> Dict:
+    changes = patch.model_dump(exclude_unset=True, exclude={"id"})
+    return {k: v for k, v in changes.items() if v is not None or k in NULLABLE_FIELDS}
+
+def apply_batch(session: Session, project_id: int, batch: ProjectBatch) -> Dict[str, int]:
+    """
+    Apply a ProjectBatch to the session without committing. Every referenced row is
+    loaded in one query per table, the resulting dependency graph is checked for cycles
+    once, and completion logs are written and undone in bulk.
+
+    Raises LookupError for tasks or milestones outside the project and ValueError if the
+    batch would create a dependency cycle or leave a task's PERT estimates out of order;
+    nothing is flushed before validation passes.
+    """
+    start_time = time.time()
+    task_ids = {p.id for p in batch.tasks} | {d.task_id for d in batch.dependencies}
+    tasks = {t.id: t for t in session.exec(select(Task).where(Task.project_id == project_id, Task.id.in_(task_ids)))}
+    missing = task_ids - tasks.keys()
+    if missing:
+        raise LookupError(f"Tasks not in project: {sorted(missing)}")
+
+    milestone_ids = {p.id for p in batch.milestones} | {p.milestone_id for p in batch.tasks if p.milestone_id is not None}
+    milestones = {m.id: m for m in session.exec(select(Milestone).where(Milestone.project_id == project_id, Milestone.id.in_(milestone_ids)))}
+    missing = milestone_ids - milestones.keys()
+    if missing:
+        raise LookupError(f"Milestones not in project: {sorted(missing)}")
+
+    upstream_ids = {d.depends_on_id for d in batch.dependencies}
+    found = set(session.exec(select(Task.id).where(Task.id.in_(upstream_ids))).all())
+    if upstream_ids - found:
+        raise LookupError(f"Unknown tasks: {sorted(upstream_ids - found)}")
+
+    # Validate the resulting graph once, before anything is written
+    records = load_task_records(session, project_id)
+    existing = set(load_dependencies(session, [t.id for t in records]))
+    added: Set[Tuple[int, int]] = set()
+    removed: Set[Tuple[int, int]] = set()
+    for change in batch.dependencies:
+        edge = (change.task_id, change.depends_on_id)
+        if change.remove:
+            added.discard(edge)
+            removed.add(edge)
+        else:
+            if edge[0] == edge[1]:
+                raise ValueError(f"Task {edge[0]} cannot depend on itself")
+            removed.discard(edge)
+            added.add(edge)
+    added -= existing
+    removed &= existing
+    if added and GraphEngine.detect_cycle(records, list((existing - removed) | added)):
+        raise ValueError("Dependencies would create a cycle")
+    # A patch is ordered on its own (TaskPatch validates it); check it against stored estimates too
+    for patch in batch.tasks:
+        changes, task = _patch_values(patch), tasks[patch.id]
+        check_three_point(*(changes.get(f, getattr(task, f)) for f in ("optimistic_hours", "most_likely_hours", "pessimistic_hours")))
+
+    now = datetime.utcnow()
+    completions: List[BehaviorLog] = []
+    reopened: List[int] = []
+    for patch in batch.tasks:
+        task = tasks[patch.id]
+        changes = _patch_values(patch)
+        status = changes.pop("status", None)
+        for key, value in changes.items():
+            setattr(task, key, value)
+        if status is True and not task.status:
+            task.status = True
+            task.completed_at = task.completed_at or now
+            completions.append(BehaviorLog(project_id=project_id, task_id=task.id, action_type="completion", timestamp=task.completed_at))
+        elif status is False and task.status:
+            task.status = False
+            task.completed_at = None
+            reopened.append(task.id)
+        session.add(task)
+
+    for patch in batch.milestones:
+        milestone = milestones[patch.id]
+        for key, value in _patch_values(patch).items():
+            setattr(milestone, key, value)
+        session.add(milestone)
+
+    # Undo: drop the latest completion log of each reopened task, as toggle_task does
+    if reopened:
+        logs = session.exec(
+            select(BehaviorLog)
+            .where(BehaviorLog.task_id.in_(reopened), BehaviorLog.action_type == "completion")
+            .order_by(BehaviorLog.timestamp.desc())
+        ).all()
+        latest = {}
+        for log in logs:
+            latest.setdefault(log.task_id, log)
+        remove_behavior_logs(session, list(latest.values()))
+    record_behavior_logs(session, completions)
+
+    session.add_all(TaskDependency(task_id=a, depends_on_id=b) for a, b in added)
+    if removed:
+        rows = session.exec(select(TaskDependency).where(TaskDependency.task_id.in_({a for a, _ in removed}))).all()
+        for dep in rows:
+            if (dep.task_id, dep.depends_on_id) in removed:
+                session.delete(dep)
+
+    summary = {
+        "tasks_updated": len(batch.tasks),
+        "milestones_updated": len(batch.milestones),
+        "completed": len(completions),
+        "reopened": len(reopened),
+        "dependencies_added": len(added),
+        "dependencies_removed": len(removed),
+    }
+    execution_time = (time.time() - start_time) * 1000
+    logger.info(f"Batch: project={project_id}, {summary}, time={execution_time:.2f}ms")
+    return summary
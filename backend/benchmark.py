@@ -0,0 +1,123 @@
+"""
+Benchmark runner for the project statistics pipeline.
+
+Builds synthetic projects in an in-memory database, times calculate_project_stats and
+measures peak allocation per stage with memory_report(). Each stage has a budget in peak
+bytes per task; the run exits non-zero when any budget is exceeded.
+
+    python benchmark.py --tasks 1000 5000
+    python benchmark.py --budgets budgets.json --budget load=4000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlmodel import SQLModel, Session, create_engine, StaticPool
+from models import Project, Milestone, Task, TaskDependency
+from logic import calculate_project_stats, memory_report
+
+# Peak bytes per task; roughly twice what 5k-task projects measure today
+DEFAULT_BUDGETS = {
+    "load": 2200,
+    "cpm": 1100,
+    "forecast": 500,
+    "scoring": 120,
+    "serialization": 3000,
+    "encode": 1600,
+    "total": 6000,
+}
+
+def build_project(session: Session, n_tasks: int, seed: int = 0) -> Project:
+    """A project of n_tasks with a milestone per 50 tasks and up to two dependencies per task."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    project = Project(title=f"Benchmark {n_tasks}", start_date=now - timedelta(days=30), deadline=now + timedelta(days=90))
+    session.add(project)
+    session.commit()
+    milestones = [Milestone(title=f"M{i}", project_id=project.id, weight=rng.randint(1, 5), target_date=now + timedelta(days=10 * (i + 1)))
+                  for i in range(max(1, n_tasks // 50))]
+    session.add_all(milestones)
+    session.commit()
+    tasks = [
+        Task(
+            title=f"Task {i}",
+            description="Synthetic benchmark task " * 4,
+            estimated_hours=rng.choice([0.5, 1, 2, 4, 8]),
+            impact_score=rng.randint(1, 5),
+            effort_score=rng.randint(1, 5),
+            status=rng.random() < 0.3,
+            deadline=now + timedelta(days=rng.randint(1, 120)) if rng.random() < 0.2 else None,
+            project_id=project.id,
+            milestone_id=milestones[i * len(milestones) // n_tasks].id,
+        )
+        for i in range(n_tasks)
+    ]
+    session.add_all(tasks)
+    session.commit()
+    ids = [t.id for t in tasks]
+    session.add_all(
+        TaskDependency(task_id=ids[i], depends_on_id=ids[j])
+        for i in range(1, n_tasks)
+        for j in {rng.randrange(max(0, i - 20), i) for _ in range(rng.randint(0, 2))}
+    )
+    session.commit()
+    return project
+
+def run(sizes: List[int], budgets: Dict[str, int], seed: int = 0) -> List[Dict[str, Any]]:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    results = []
+    for size in sizes:
+        with Session(engine) as session:
+            project = build_project(session, size, seed)
+            calculate_project_stats(project, session)  # warm-up
+            session.expire_all()
+            start = time.perf_counter()
+            calculate_project_stats(session.get(Project, project.id), session)
+            ms = (time.perf_counter() - start) * 1000
+            session.expire_all()
+            report = memory_report(session.get(Project, project.id), session)
+
+        per_task = {s["stage"]: s["peak_bytes"] // size for s in report["stages"]}
+        per_task["total"] = report["bytes_per_task"]
+        failures = [f"{name}: {per_task.get(name, 0)} > {limit} B/task" for name, limit in budgets.items() if per_task.get(name, 0) > limit]
+        results.append({"tasks": size, "ms": round(ms, 2), "bytes_per_task": per_task, "failures": failures})
+    return results
+
+def load_budgets(path: Optional[str], overrides: List[str]) -> Dict[str, int]:
+    budgets = dict(DEFAULT_BUDGETS)
+    if path:
+        with open(path) as f:
+            budgets.update({k: int(v) for k, v in json.load(f).items()})
+    for item in overrides:
+        name, _, value = item.partition("=")
+        budgets[name] = int(value)
+    return budgets
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--budgets", help="JSON file of stage -> peak bytes per task")
+    parser.add_argument("--budget", action="append", default=[], help="stage=bytes override, repeatable")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.tasks, load_budgets(args.budgets, args.budget), args.seed)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        stages = list(DEFAULT_BUDGETS)
+        print(f"{'tasks':>7} {'ms':>9} " + " ".join(f"{s:>13}" for s in stages))
+        for r in results:
+            print(f"{r['tasks']:>7} {r['ms']:>9.1f} " + " ".join(f"{r['bytes_per_task'].get(s, 0):>13}" for s in stages))
+    failures = [f"{r['tasks']} tasks: {f}" for r in results for f in r["failures"]]
+    for failure in failures:
+        print(f"Budget exceeded - {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
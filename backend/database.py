@@ -1,3 +1,5 @@
+import os
+from sqlalchemy import event
 from sqlmodel import create_engine, Session, SQLModel
 
 # SQLite database file (created automatically)
@@ -5,10 +7,19 @@ DATABASE_URL = "sqlite:///./discipline.db"
 
 engine = create_engine(
     DATABASE_URL,
-    echo=True,
+    # Statement logging is for local debugging; per-request totals come from query_stats
+    echo=os.getenv("PDE_SQL_ECHO", "0") == "1",
     connect_args={"check_same_thread": False}  # required for SQLite + FastAPI
 )
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets dashboard reads proceed while the ingestor holds a write transaction
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
 
@@ -1,18 +1,26 @@
+import math
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from models import Project, Task, ProjectForecast
+from typing import List, Dict, Any, Optional
+from models import Project, Task, Milestone, ProjectForecast
+from velocity import VelocityEstimate, DEFAULT_HOURS_PER_DAY
+from graph_engine import GraphEngine
 from logger import logger
 from metrics import metrics
 
+# Two-sided confidence levels (percent) and their normal quantiles
+PERT_INTERVALS = [(80, 1.2816), (95, 1.96)]
+
 class ForecastingModule:
     @staticmethod
-    def calculate_forecast(project: Project, critical_path_duration_hours: float) -> Dict[str, Any]:
+    def calculate_forecast(project: Project, critical_path_duration_hours: float, velocity: Optional[VelocityEstimate] = None, tasks: Optional[List[Task]] = None, now: Optional[datetime] = None) -> Dict[str, Any]:
         metrics.increment("risk_evaluations")
-        now = datetime.utcnow()
-        completed_tasks = [t for t in project.tasks if t.status]
-        pending_tasks = [t for t in project.tasks if not t.status]
+        now = now or datetime.utcnow()
+        if tasks is None:
+            tasks = project.tasks
+        completed_tasks = [t for t in tasks if t.status]
+        pending_tasks = [t for t in tasks if not t.status]
         
-        if not project.tasks:
+        if not tasks:
             return {
                 "estimated_completion": project.deadline,
                 "delay_probability": 0,
@@ -22,14 +30,14 @@ class ForecastingModule:
 
         # Historical Velocity (tasks per day)
         days_passed = max(1, (now - project.start_date.replace(tzinfo=None)).days)
-        velocity = len(completed_tasks) / days_passed
+        tasks_per_day = velocity.tasks_per_day if velocity else len(completed_tasks) / days_passed
         
         # Remaining hours based on critical path vs total work
         remaining_hours = sum(t.estimated_hours for t in pending_tasks)
         
         # Work execution factor (how much hours we do per day on average)
-        # For simplicity, assume 6 productive hours per day if no log data
-        hours_per_day = 6.0 
+        # Measured from work sessions when there is enough history, 6h/day otherwise
+        hours_per_day = velocity.hours_per_day if velocity else DEFAULT_HOURS_PER_DAY
         
         # Estimated days needed
         # We take the max of critical path duration (sequential) and total work distributed (parallel capacity)
@@ -48,13 +56,13 @@ class ForecastingModule:
             
         # Confidence Score
         # More completed tasks -> Higher confidence
-        confidence = (len(completed_tasks) / len(project.tasks)) * 100 if project.tasks else 0
+        confidence = (len(completed_tasks) / len(tasks)) * 100 if tasks else 0
         
         # Logic for risk trend
         # Ideally we'd compare with previous forecast
         risk_trend = "stable"
         
-        logger.info(f"Forecast: project={project.title}, velocity={velocity:.2f} t/d, est_comp={est_completion.strftime('%Y-%m-%d')}, risk={delay_prob}%")
+        logger.info(f"Forecast: project={project.title}, velocity={tasks_per_day:.2f} t/d, hours/day={hours_per_day:.2f}, est_comp={est_completion.strftime('%Y-%m-%d')}, risk={delay_prob}%")
         
         return {
             "estimated_completion": est_completion,
@@ -64,11 +72,113 @@ class ForecastingModule:
         }
 
     @staticmethod
-    def detect_bottlenecks(tasks: List[Task], dependencies: List[tuple], slack: Dict[int, float]) -> List[Dict[str, Any]]:
+    def pert_forecast(project: Project, pert: Dict[str, Any], tasks: List[Task], hours_per_day: float = DEFAULT_HOURS_PER_DAY, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Completion date confidence intervals and the chance of meeting the project deadline
+        from a GraphEngine.pert_schedule result, treating the finish time as normal.
+        """
+        now = now or datetime.utcnow()
+        mean, sd = pert["total_mean"], math.sqrt(pert["total_variance"])
+        def at(hours: float) -> datetime:
+            return now + timedelta(days=max(0.0, hours) / hours_per_day)
+
+        available = (project.deadline.replace(tzinfo=None) - now).total_seconds() / 86400 * hours_per_day
+        if sd > 0:
+            probability = 0.5 * (1 + math.erf((available - mean) / (sd * math.sqrt(2))))
+        else:
+            probability = 1.0 if available >= mean else 0.0
+        return {
+            "expected_completion": at(mean),
+            "std_dev_days": round(sd / hours_per_day, 2),
+            "confidence_intervals": [
+                {"level": level, "earliest": at(mean - z * sd), "latest": at(mean + z * sd)}
+                for level, z in PERT_INTERVALS
+            ],
+            "deadline_probability": round(probability * 100, 1),
+            "estimated_tasks": sum(
+                1 for t in tasks
+                if not t.status and None not in (t.optimistic_hours, t.most_likely_hours, t.pessimistic_hours)
+            ),
+        }
+
+    @staticmethod
+    def deadline_hours(tasks: List[Task], hours_per_day: float = DEFAULT_HOURS_PER_DAY, now: Optional[datetime] = None) -> Dict[int, float]:
+        """Open task deadlines as working hours from now, the time scale of GraphEngine.propagate_deadlines."""
+        now = now or datetime.utcnow()
+        return {
+            t.id: (t.deadline.replace(tzinfo=None) - now).total_seconds() / 86400 * hours_per_day
+            for t in tasks if t.deadline and not t.status
+        }
+
+    @staticmethod
+    def rollup_milestones(tasks: List[Task], milestones: List[Milestone], schedule: Dict[str, Any], hours_per_day: float = DEFAULT_HOURS_PER_DAY, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Per-milestone progress from one pass over the tasks after CPM. The projected date is
+        the latest EF over remaining work (completed tasks take no time, as in
+        GraphEngine.propagate_deadlines) among the milestone's open tasks, converted at
+        `hours_per_day` like the project forecast. Criticality (0-100) scales the share of remaining hours on the
+        critical path and the pressure from the target date by the milestone weight.
+        """
+        now = now or datetime.utcnow()
+        ef, slack = GraphEngine.remaining_finish(tasks, schedule), schedule["slack"]
+        totals = {m.id: {"total": 0, "done": 0, "remaining": 0.0, "critical": 0.0, "finish": None} for m in milestones}
+        for t in tasks:
+            entry = totals.get(t.milestone_id)
+            if entry is None:
+                continue
+            entry["total"] += 1
+            if t.status:
+                entry["done"] += 1
+                continue
+            entry["remaining"] += t.estimated_hours
+            if slack.get(t.id, 1) <= 0.001:
+                entry["critical"] += t.estimated_hours
+            if t.id in ef and (entry["finish"] is None or ef[t.id] > entry["finish"]):
+                entry["finish"] = ef[t.id]
+
+        rollups = []
+        for m in milestones:
+            entry = totals[m.id]
+            projected = now + timedelta(days=entry["finish"] / hours_per_day) if entry["finish"] is not None else None
+            slack_days = None
+            if m.target_date and projected:
+                slack_days = round((m.target_date.replace(tzinfo=None) - projected).total_seconds() / 86400, 1)
+            critical_share = entry["critical"] / entry["remaining"] if entry["remaining"] else 0
+            # Full pressure once late, fading out over two weeks of slack
+            pressure = 0 if slack_days is None else min(1, max(0, 1 - slack_days / 14))
+            criticality = 0 if m.status or projected is None else (m.weight / 5) * (60 * critical_share + 40 * pressure)
+            rollups.append({
+                "milestone_id": m.id,
+                "title": m.title,
+                "weight": m.weight,
+                "total_tasks": entry["total"],
+                "completed_tasks": entry["done"],
+                "completion_percentage": round(entry["done"] / entry["total"] * 100, 2) if entry["total"] else 0,
+                "remaining_hours": entry["remaining"],
+                "critical_hours": entry["critical"],
+                "projected_date": projected,
+                "target_date": m.target_date,
+                "slack_days": slack_days,
+                "criticality": int(round(criticality)),
+            })
+        return rollups
+
+    @staticmethod
+    def detect_bottlenecks(tasks: List[Task], dependencies: List[tuple], slack: Dict[int, float], milestone_rollups: Optional[List[Dict[str, Any]]] = None, deadlines: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         bottlenecks = []
         
+        # 0. Tasks with no slack against their own or a downstream deadline
+        if deadlines:
+            for tid in deadlines["deadline_critical"]:
+                late = deadlines["lateness"][tid]
+                bottlenecks.append({
+                    "task_id": tid,
+                    "impact_severity": 100 if late > 0.001 else 80,
+                    "reason": f"Late by {late:.1f}h against a deadline at or after it." if late > 0.001 else "No slack left against a deadline at or after it."
+                })
+        
         # 1. Critical path tasks are naturally bottlenecks
-        critical_tasks = [tid for tid, s in slack.items() if s <= 0.001]
+        critical_tasks = {tid for tid, s in slack.items() if s <= 0.001}
         
         # 2. Dependency Hubs (Tasks blocking many others)
         blocked_by = {t.id: 0 for t in tasks}
@@ -85,13 +195,22 @@ class ForecastingModule:
                 })
                 
         # 3. High weight milestone tasks with zero slack
+        rollups = {r["milestone_id"]: r for r in milestone_rollups or []}
         for t in tasks:
             if t.id in critical_tasks and t.milestone_id:
-                # We'd need milestone weight here, but can simplify
+                rollup = rollups.get(t.milestone_id)
+                if rollup is None:
+                    severity, reason = 90, "Critical path task linked to milestone."
+                else:
+                    severity = int(min(100, 50 + rollup["criticality"] / 2))
+                    reason = f"Critical path task for milestone '{rollup['title']}' (weight {rollup['weight']})."
+                    if rollup["slack_days"] is not None and rollup["slack_days"] < 0:
+                        severity = 100
+                        reason += f" Projected {-rollup['slack_days']:.1f} days past its target."
                 bottlenecks.append({
                     "task_id": t.id,
-                    "impact_severity": 90,
-                    "reason": "Critical path task linked to milestone."
+                    "impact_severity": severity,
+                    "reason": reason
                 })
                 
         # Deduplicate
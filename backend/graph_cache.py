@@ -0,0 +1,305 @@
+import atexit
+import fcntl
+import math
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlmodel import Session, select
+from models import ChangeEvent
+from records import TaskRecord, load_task_records
+from logic import load_dependencies
+from logger import logger
+from metrics import metrics
+
+GRAPH_CACHE_DIR = os.getenv("PDE_GRAPH_CACHE_DIR")
+GRAPH_CACHE_BYTES = int(os.getenv("PDE_GRAPH_CACHE_BYTES", str(256 * 1024 * 1024)))
+GRAPH_CACHE_SLOTS = int(os.getenv("PDE_GRAPH_CACHE_SLOTS", "256"))
+
+_MAGIC = 0x32485047  # "GPH2"; bump when the segment layout changes
+_NONE = -(2 ** 63)
+_EPOCH = datetime(1970, 1, 1)
+# Index: [_MAGIC, slots...]; slot: [project_id, version, size_bytes, last_used_us], project_id 0 if free
+_SLOT_CELLS = 4
+
+def _to_us(value: Optional[datetime]) -> int:
+    return _NONE if value is None else (value.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+
+def _from_us(value: int) -> Optional[datetime]:
+    return None if value == _NONE else _EPOCH + timedelta(microseconds=value)
+
+def _nan_if_none(value: Optional[float]) -> float:
+    return math.nan if value is None else float(value)
+
+def _none_if_nan(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+def _layout(n: int, m: int) -> List[Tuple[str, str, int]]:
+    """(name, typecode, length) of each array after the header, in file order."""
+    return [
+        ("ids", "q", n),
+        ("hours", "d", n),
+        ("status", "q", n),
+        ("impact", "q", n),
+        ("effort", "q", n),
+        ("milestone", "q", n),
+        ("deadline", "q", n),
+        ("completed", "q", n),
+        # Three-point estimates, NaN when unset
+        ("optimistic", "d", n),
+        ("most_likely", "d", n),
+        ("pessimistic", "d", n),
+        # CSR successors in index space: targets[offsets[i]:offsets[i + 1]] depend on task i
+        ("offsets", "q", n + 1),
+        ("targets", "q", m),
+    ]
+
+def encode_graph(tasks: List[TaskRecord], dependencies: List[Tuple[int, int]]) -> bytes:
+    """Serialize a project graph into the flat segment format SharedGraph reads."""
+    index = {t.id: i for i, t in enumerate(tasks)}
+    successors = [[] for _ in tasks]
+    for task_id, depends_on_id in dependencies:
+        if task_id in index and depends_on_id in index:
+            successors[index[depends_on_id]].append(index[task_id])
+    offsets = [0]
+    for targets in successors:
+        offsets.append(offsets[-1] + len(targets))
+    n, m = len(tasks), offsets[-1]
+
+    columns = {
+        "ids": [t.id for t in tasks],
+        "hours": [float(t.estimated_hours) for t in tasks],
+        "status": [int(bool(t.status)) for t in tasks],
+        "impact": [t.impact_score for t in tasks],
+        "effort": [t.effort_score for t in tasks],
+        "milestone": [_NONE if t.milestone_id is None else t.milestone_id for t in tasks],
+        "deadline": [_to_us(t.deadline) for t in tasks],
+        "completed": [_to_us(t.completed_at) for t in tasks],
+        "optimistic": [_nan_if_none(t.optimistic_hours) for t in tasks],
+        "most_likely": [_nan_if_none(t.most_likely_hours) for t in tasks],
+        "pessimistic": [_nan_if_none(t.pessimistic_hours) for t in tasks],
+        "offsets": offsets,
+        "targets": [v for targets in successors for v in targets],
+    }
+    parts = [array("q", [_MAGIC, n, m]).tobytes()]
+    parts.extend(array(code, columns[name]).tobytes() for name, code, _ in _layout(n, m))
+    return b"".join(parts)
+
+class SharedGraph:
+    """
+    Read-only view of one serialized project graph. The arrays are memoryviews straight
+    onto the mapped segment; nothing is copied until records() or dependencies() builds
+    GraphEngine input from them.
+    """
+    def __init__(self, project_id: int, version: int, buffer):
+        self.project_id = project_id
+        self.version = version
+        cells = memoryview(buffer).cast("q")
+        floats = memoryview(buffer).cast("d")
+        if cells[0] != _MAGIC:
+            raise ValueError(f"Not a graph segment: project {project_id} v{version}")
+        self.n, self.m = cells[1], cells[2]
+        start = 3
+        for name, code, length in _layout(self.n, self.m):
+            setattr(self, name, (floats if code == "d" else cells)[start:start + length])
+            start += length
+        self.nbytes = 8 * start
+
+    def records(self, pending_only: bool = False) -> List[TaskRecord]:
+        return [
+            TaskRecord(
+                self.ids[i], self.hours[i], self.impact[i], self.effort[i],
+                _from_us(self.deadline[i]), bool(self.status[i]),
+                None if self.milestone[i] == _NONE else self.milestone[i],
+                _from_us(self.completed[i]),
+                _none_if_nan(self.optimistic[i]), _none_if_nan(self.most_likely[i]), _none_if_nan(self.pessimistic[i]),
+            )
+            for i in range(self.n)
+            if not (pending_only and self.status[i])
+        ]
+
+    def dependencies(self, pending_only: bool = False) -> List[Tuple[int, int]]:
+        """(task_id, depends_on_id) pairs, as load_dependencies returns them."""
+        ids, offsets, targets, status = self.ids, self.offsets, self.targets, self.status
+        return [
+            (ids[targets[k]], ids[u])
+            for u in range(self.n)
+            if not (pending_only and status[u])
+            for k in range(offsets[u], offsets[u + 1])
+            if not (pending_only and status[targets[k]])
+        ]
+
+    def pending_graph(self) -> Tuple[List[TaskRecord], List[Tuple[int, int]]]:
+        """Same result as logic.load_pending_graph, without touching the database."""
+        return self.records(pending_only=True), self.dependencies(pending_only=True)
+
+class GraphCache:
+    """
+    Project graphs shared by every worker process through memory-mapped segment files,
+    one per (project_id, version), under `directory`. Put it on tmpfs (/dev/shm) so the
+    segments live in shared memory. Each process maps a segment once and reads it in place.
+
+    A small index file, guarded by flock, records every cached segment's size and last use.
+    Writers use it to keep the total under `max_bytes` and `slots`, evicting older versions
+    of the same project first and then the least recently used. Lookups hold the lock
+    shared, so readers in different processes never queue behind each other; the only
+    cell a reader writes is its slot's last-use stamp, a single aligned 8-byte store. Evicting unlinks the file;
+    processes that already mapped it keep a valid mapping until they drop it.
+
+    Versions come from graph_version(), so the directory belongs to one database. Clear it
+    when the database is replaced. Without `directory`, a private temporary directory is
+    used, which gives a per-process cache.
+    """
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = GRAPH_CACHE_BYTES, slots: int = GRAPH_CACHE_SLOTS):
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="pde-graphs-")
+            atexit.register(shutil.rmtree, directory, True)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._attached: Dict[int, SharedGraph] = {}
+
+    def _segment(self, project_id: int, version: int) -> str:
+        return os.path.join(self.directory, f"{project_id}-{version}.graph")
+
+    def _with_index(self, fn, shared: bool = False):
+        """
+        Run fn(cells) with the shared index mapped and locked: exclusively by default, or
+        shared for readers that change nothing but last-use stamps.
+        """
+        size = (1 + self.slots * _SLOT_CELLS) * 8
+        fd = os.open(os.path.join(self.directory, "index"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            if shared and (os.fstat(fd).st_size != size or os.pread(fd, 8, 0) != _MAGIC.to_bytes(8, sys.byteorder, signed=True)):
+                # The index must be (re)initialized first, which needs the lock to ourselves
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            with mmap.mmap(fd, size) as buffer:
+                cells = memoryview(buffer).cast("q")
+                try:
+                    if cells[0] != _MAGIC:
+                        # New index, or segments from another slot count or layout: start over
+                        for name in os.listdir(self.directory):
+                            if name.endswith(".graph"):
+                                os.remove(os.path.join(self.directory, name))
+                        buffer[:] = bytes(size)
+                        cells[0] = _MAGIC
+                    return fn(cells)
+                finally:
+                    cells.release()
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _find(self, cells, project_id: int, version: int) -> Optional[int]:
+        for s in range(1, len(cells), _SLOT_CELLS):
+            if cells[s] == project_id and cells[s + 1] == version:
+                return s
+        return None
+
+    def get(self, project_id: int, version: int) -> Optional[SharedGraph]:
+        def touch(cells):
+            s = self._find(cells, project_id, version)
+            if s is not None:
+                cells[s + 3] = time.time_ns() // 1000
+            return s is not None
+
+        # Every hit goes through the index so eviction sees it, even when already mapped here
+        graph = None
+        if self._with_index(touch, shared=True):
+            with self._lock:
+                graph = self._attached.get(project_id)
+            if graph is None or graph.version != version:
+                graph = self._attach(project_id, version)
+        metrics.increment("graph_cache_hits" if graph else "graph_cache_misses")
+        return graph
+
+    def _attach(self, project_id: int, version: int) -> Optional[SharedGraph]:
+        try:
+            with open(self._segment(project_id, version), "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
+        except FileNotFoundError:
+            # Evicted between the index lookup and the open
+            return None
+        graph = SharedGraph(project_id, version, buffer)
+        with self._lock:
+            self._attached[project_id] = graph
+        return graph
+
+    def put(self, project_id: int, version: int, data: bytes) -> SharedGraph:
+        """Publish a segment, unless another process already did, and attach to it."""
+        if len(data) > self.max_bytes:
+            return SharedGraph(project_id, version, data)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        def publish(cells):
+            if self._find(cells, project_id, version) is not None:
+                os.remove(tmp)
+                return
+            used = [s for s in range(1, len(cells), _SLOT_CELLS) if cells[s]]
+            # Older versions of this project will never be read again
+            victims = [s for s in used if cells[s] == project_id]
+            rest = sorted((s for s in used if cells[s] != project_id), key=lambda s: cells[s + 3])
+            total = sum(cells[s + 2] for s in used) - sum(cells[s + 2] for s in victims)
+            while rest and (total + len(data) > self.max_bytes or len(used) - len(victims) >= self.slots):
+                victim = rest.pop(0)
+                victims.append(victim)
+                total -= cells[victim + 2]
+            for s in victims:
+                try:
+                    os.remove(self._segment(cells[s], cells[s + 1]))
+                except FileNotFoundError:
+                    pass
+                cells[s:s + _SLOT_CELLS] = memoryview(bytearray(8 * _SLOT_CELLS)).cast("q")
+            os.replace(tmp, self._segment(project_id, version))
+            s = next(s for s in range(1, len(cells), _SLOT_CELLS) if cells[s] == 0)
+            cells[s], cells[s + 1], cells[s + 2], cells[s + 3] = project_id, version, len(data), time.time_ns() // 1000
+            if victims:
+                logger.info(f"Graph cache: evicted {len(victims)} segment(s) for project={project_id} v{version}")
+
+        self._with_index(publish)
+        return self._attach(project_id, version) or SharedGraph(project_id, version, data)
+
+    def entries(self) -> List[Dict[str, int]]:
+        def read(cells):
+            return [
+                {"project_id": cells[s], "version": cells[s + 1], "bytes": cells[s + 2], "last_used_us": cells[s + 3]}
+                for s in range(1, len(cells), _SLOT_CELLS) if cells[s]
+            ]
+        return self._with_index(read)
+
+def graph_version(session: Session, project_id: int) -> int:
+    """
+    Data version every process agrees on: the project's latest ChangeEvent id. Every task
+    and dependency write appends one (see history.py).
+    """
+    return session.exec(select(func.max(ChangeEvent.id)).where(ChangeEvent.project_id == project_id)).one() or 0
+
+def load_graph(session: Session, project_id: int, cache: GraphCache) -> SharedGraph:
+    """A project's full graph from the shared cache, loading and publishing it on a miss."""
+    version = graph_version(session, project_id)
+    graph = cache.get(project_id, version)
+    if graph is None:
+        tasks = load_task_records(session, project_id)
+        dependencies = load_dependencies(session, [t.id for t in tasks])
+        graph = cache.put(project_id, version, encode_graph(tasks, dependencies))
+    return graph
+
+graph_cache = GraphCache(GRAPH_CACHE_DIR)
+
+def get_graph_cache() -> GraphCache:
+    return graph_cache
@@ -1,10 +1,25 @@
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Set, Tuple, Any, Optional
 import collections
+import heapq
+import math
 import time
 from models import Task
 from logger import logger
 from metrics import metrics
 
+def _clark_max(a: Tuple[float, float], b: Tuple[float, float]) -> Tuple[float, float]:
+    """(mean, variance) of max(A, B) for independent normals A and B (Clark, 1961)."""
+    (m1, v1), (m2, v2) = a, b
+    spread = math.sqrt(v1 + v2)
+    if spread < 1e-9:
+        return a if m1 >= m2 else b
+    alpha = (m1 - m2) / spread
+    cdf = 0.5 * (1 + math.erf(alpha / math.sqrt(2)))
+    pdf = math.exp(-alpha * alpha / 2) / math.sqrt(2 * math.pi)
+    mean = m1 * cdf + m2 * (1 - cdf) + spread * pdf
+    second = (m1 * m1 + v1) * cdf + (m2 * m2 + v2) * (1 - cdf) + (m1 + m2) * spread * pdf
+    return mean, max(0.0, second - mean * mean)
+
 class GraphEngine:
     def __init__(self, tasks: List[Task]):
         self.tasks = {t.id: t for t in tasks}
@@ -23,9 +38,10 @@ class GraphEngine:
         in_degree = {t.id: 0 for t in tasks}
         
         for task_id, depends_on_id in dependencies:
-            if depends_on_id in adj:
+            # Edges to tasks outside this set (other projects, completed work) are ignored on
+            # both ends; counting them in in_degree would leave the task unreachable.
+            if depends_on_id in adj and task_id in in_degree:
                 adj[depends_on_id].append(task_id)
-            if task_id in in_degree:
                 in_degree[task_id] += 1
             
         return adj, in_degree
@@ -45,13 +61,62 @@ class GraphEngine:
         return count != len(tasks)
 
     @staticmethod
-    def calculate_critical_path(tasks: List[Task], dependencies: List[Tuple[int, int]]) -> Tuple[List[int], float, Dict[int, float]]:
-        metrics.increment("cpm_runs")
-        start_time = time.time()
+    def redundant_dependencies(tasks: List[Task], dependencies: List[Tuple[int, int]]) -> List[int]:
+        """
+        Transitive reduction: indexes into `dependencies` of edges implied by another path
+        (A->C when A->B->C exists), plus repeats of the same edge. Dropping them keeps every
+        reachability relation, so CPM results are unchanged.
+
+        Reachability is one integer bitset per task over topological positions, built in
+        reverse topological order. Each task visits its direct successors nearest first:
+        a successor already covered by an earlier one's bitset is redundant. Cost is
+        O(V + E) bitset operations of V bits, plus sorting each successor list. Raises
+        ValueError on a cycle.
+        """
+        adj, in_degree = GraphEngine.build_graph(tasks, dependencies)
+        queue = collections.deque([tid for tid, degree in in_degree.items() if degree == 0])
+        order = []
+        while queue:
+            u = queue.popleft()
+            order.append(u)
+            for v in adj[u]:
+                in_degree[v] -= 1
+                if in_degree[v] == 0:
+                    queue.append(v)
+        if len(order) != len(tasks):
+            raise ValueError("Dependency graph contains a cycle")
+        position = {tid: i for i, tid in enumerate(order)}
+
+        successors: Dict[int, List[Tuple[int, int]]] = collections.defaultdict(list)
+        for k, (task_id, depends_on_id) in enumerate(dependencies):
+            if task_id in position and depends_on_id in position:
+                successors[position[depends_on_id]].append((position[task_id], k))
+
+        reach = [0] * len(order)
+        redundant = []
+        for u in range(len(order) - 1, -1, -1):
+            covered = 0
+            for v, k in sorted(successors.get(u, ())):
+                if covered >> v & 1:
+                    redundant.append(k)
+                else:
+                    covered |= reach[v] | (1 << v)
+            reach[u] = covered
+        return sorted(redundant)
+
+    @staticmethod
+    def _cpm_passes(tasks: List[Task], dependencies: List[Tuple[int, int]], release: Optional[Dict[int, float]] = None) -> Dict[str, Any]:
+        """
+        Forward and backward CPM passes. Returns ES/EF/LS/LF maps, topological order and total
+        duration. `release` gives tasks an earliest start imposed from outside the graph.
+        """
+        # A repeated dependency row would repeat a successor, and every path through it
+        dependencies = list(dict.fromkeys(dependencies))
         adj, in_degree = GraphEngine.build_graph(tasks, dependencies)
         task_dict = {t.id: t for t in tasks}
         
-        es = {t.id: 0.0 for t in tasks}
+        release = release or {}
+        es = {t.id: float(release.get(t.id, 0.0)) for t in tasks}
         ef = {t.id: t.estimated_hours for t in tasks}
         
         queue = collections.deque([tid for tid, degree in in_degree.items() if degree == 0])
@@ -75,9 +140,8 @@ class GraphEngine:
         rev_adj = {t.id: [] for t in tasks}
         out_degree = {t.id: 0 for t in tasks}
         for task_id, depends_on_id in dependencies:
-            if task_id in rev_adj:
+            if task_id in rev_adj and depends_on_id in out_degree:
                 rev_adj[task_id].append(depends_on_id)
-            if depends_on_id in out_degree:
                 out_degree[depends_on_id] += 1
             
         queue = collections.deque([tid for tid, degree in out_degree.items() if degree == 0])
@@ -89,6 +153,31 @@ class GraphEngine:
                 out_degree[v] -= 1
                 if out_degree[v] == 0:
                     queue.append(v)
+
+        return {
+            "adj": adj,
+            "rev_adj": rev_adj,
+            "order": processed,
+            "es": es,
+            "ef": ef,
+            "ls": ls,
+            "lf": lf,
+            "total_duration": float(total_duration),
+        }
+
+    @staticmethod
+    def calculate_critical_path(tasks: List[Task], dependencies: List[Tuple[int, int]]) -> Tuple[List[int], float, Dict[int, float]]:
+        schedule = GraphEngine.calculate_schedule(tasks, dependencies)
+        return schedule["critical_path"], schedule["total_duration"], schedule["slack"]
+
+    @staticmethod
+    def calculate_schedule(tasks: List[Task], dependencies: List[Tuple[int, int]]) -> Dict[str, Any]:
+        """calculate_critical_path with the full CPM result (ES/EF/LS/LF) kept for later stages."""
+        metrics.increment("cpm_runs")
+        start_time = time.time()
+        cpm = GraphEngine._cpm_passes(tasks, dependencies)
+        es, ls = cpm["es"], cpm["ls"]
+        total_duration = cpm["total_duration"]
                     
         slack = {tid: ls[tid] - es[tid] for tid in es}
         critical_path = [tid for tid, s in slack.items() if s <= 0.001]
@@ -97,4 +186,224 @@ class GraphEngine:
         execution_time = (time.time() - start_time) * 1000
         logger.info(f"CPM Execution: tasks={len(tasks)}, duration={total_duration:.1f}h, time={execution_time:.2f}ms")
         
-        return critical_path, float(total_duration), slack
+        cpm.update(critical_path=critical_path, slack=slack)
+        return cpm
+
+    @staticmethod
+    def remaining_finish(tasks: List[Task], cpm: Dict[str, Any]) -> Dict[int, float]:
+        """EF over remaining work, in hours from now: completed tasks take no time. One forward sweep over a CPM result."""
+        order, adj = cpm["order"], cpm["adj"]
+        remaining = {t.id: 0.0 if t.status else t.estimated_hours for t in tasks}
+        es: Dict[int, float] = {}
+        ef: Dict[int, float] = {}
+        for u in order:
+            ef[u] = es.get(u, 0.0) + remaining[u]
+            for v in adj[u]:
+                if ef[u] > es.get(v, 0.0):
+                    es[v] = ef[u]
+        return ef
+
+    @staticmethod
+    def propagate_deadlines(tasks: List[Task], cpm: Dict[str, Any], due: Dict[int, float]) -> Dict[str, Any]:
+        """
+        Required finish per task: the earlier of its own due time and, for every successor,
+        the successor's required finish minus its duration. One sweep in reverse topological
+        order over a CPM result; `due` is in hours from now, so completed tasks count as zero
+        remaining work on both passes. Lateness is remaining EF minus required finish; tasks
+        with no slack against any deadline are deadline-critical, latest first.
+        """
+        order, adj = cpm["order"], cpm["adj"]
+        done = {t.id for t in tasks if t.status}
+        remaining = {t.id: 0.0 if t.id in done else t.estimated_hours for t in tasks}
+        ef = GraphEngine.remaining_finish(tasks, cpm)
+
+        inf = float("inf")
+        required: Dict[int, float] = {}
+        for u in reversed(order):
+            r = due.get(u, inf)
+            for v in adj[u]:
+                r = min(r, required[v] - remaining[v])
+            required[u] = r
+
+        lateness = {u: ef[u] - required[u] for u in order if required[u] != inf and u not in done}
+        deadline_critical = sorted((u for u, late in lateness.items() if late > -0.001), key=lambda u: -lateness[u])
+        return {
+            "required_finish": {u: r for u, r in required.items() if r != inf},
+            "lateness": lateness,
+            "deadline_critical": deadline_critical,
+        }
+
+    @staticmethod
+    def pert_duration(task: Task) -> Tuple[float, float]:
+        """Mean and variance of a task's duration: (o + 4m + p) / 6 and ((p - o) / 6)^2, or estimated_hours with no spread."""
+        o, m, p = task.optimistic_hours, task.most_likely_hours, task.pessimistic_hours
+        if o is None or m is None or p is None:
+            return task.estimated_hours, 0.0
+        return (o + 4 * m + p) / 6, ((p - o) / 6) ** 2
+
+    @staticmethod
+    def pert_schedule(tasks: List[Task], cpm: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Mean and variance of every task's finish time over remaining work, in one forward
+        sweep over a CPM result's topological order. Durations are treated as independent
+        normals. A start waits for the latest predecessor, and that max is folded pairwise
+        with Clark's moment-matching approximation, so parallel near-critical paths raise
+        the expected finish rather than being ignored as in classic PERT. Completed tasks
+        finish at zero with no variance.
+        """
+        order, adj = cpm["order"], cpm["adj"]
+        duration = {t.id: (0.0, 0.0) if t.status else GraphEngine.pert_duration(t) for t in tasks}
+
+        start: Dict[int, Tuple[float, float]] = {}
+        finish: Dict[int, Tuple[float, float]] = {}
+        done = {t.id for t in tasks if t.status}
+        for u in order:
+            s_mean, s_var = start.get(u, (0.0, 0.0))
+            d_mean, d_var = duration[u]
+            finish[u] = (s_mean + d_mean, s_var + d_var)
+            # Completed predecessors finished at zero and impose nothing; folding in their
+            # point mass would only add the normal's tail below zero to the expected start
+            if u in done and u not in start:
+                continue
+            for v in adj[u]:
+                start[v] = _clark_max(start[v], finish[u]) if v in start else finish[u]
+
+        total = (0.0, 0.0)
+        ends = [finish[u] for u in order if not adj[u] and (u in start or u not in done)]
+        if ends:
+            total = ends[0]
+            for end in ends[1:]:
+                total = _clark_max(total, end)
+        return {
+            "mean": {u: f[0] for u, f in finish.items()},
+            "variance": {u: f[1] for u, f in finish.items()},
+            "total_mean": total[0],
+            "total_variance": total[1],
+        }
+
+    @staticmethod
+    def calculate_crashing_analysis(tasks: List[Task], dependencies: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """
+        For each task, how much project time one saved hour buys and how many hours can be
+        saved before another path becomes critical.
+
+        Every maximal path that avoids task v either ends at a sink before v (in topological
+        order), starts at a source after v, or jumps over v through an edge (u, w) with
+        pos(u) < pos(v) < pos(w). The longest of those is the duration v can be crashed down
+        to, so a single sweep over the topological order answers it for every task without
+        re-running CPM.
+        """
+        cpm = GraphEngine._cpm_passes(tasks, dependencies)
+        order, adj, rev_adj = cpm["order"], cpm["adj"], cpm["rev_adj"]
+        es, ef, lf = cpm["es"], cpm["ef"], cpm["lf"]
+        total = cpm["total_duration"]
+        task_dict = {t.id: t for t in tasks}
+        if len(order) != len(tasks):
+            # Cyclic graphs have no meaningful critical path
+            return []
+
+        pos = {tid: i for i, tid in enumerate(order)}
+        n = len(order)
+        # Longest path starting at a task (inclusive) and longest path through it
+        tail = {tid: total - (lf[tid] - task_dict[tid].estimated_hours) for tid in order}
+        through = {tid: ef[tid] + tail[tid] - task_dict[tid].estimated_hours for tid in order}
+
+        # Best path that lies entirely before / after each position
+        prefix_best = [0.0] * (n + 1)
+        for i, tid in enumerate(order):
+            prefix_best[i + 1] = max(prefix_best[i], ef[tid] if not adj[tid] else 0.0)
+        suffix_best = [0.0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            tid = order[i]
+            suffix_best[i] = max(suffix_best[i + 1], tail[tid] if not rev_adj[tid] else 0.0)
+
+        # Edges that jump over a position, grouped by where they open
+        opening = collections.defaultdict(list)
+        for u in order:
+            for w in adj[u]:
+                if pos[w] - pos[u] > 1:
+                    opening[pos[u] + 1].append((-(ef[u] + tail[w]), pos[w]))
+        heap: List[Tuple[float, int]] = []
+
+        results = []
+        for i, tid in enumerate(order):
+            for item in opening.get(i, []):
+                heapq.heappush(heap, item)
+            while heap and heap[0][1] <= i:
+                heapq.heappop(heap)
+            jump_best = -heap[0][0] if heap else 0.0
+            avoid = max(prefix_best[i], suffix_best[i + 1], jump_best)
+
+            duration = task_dict[tid].estimated_hours
+            is_critical = total - through[tid] <= 0.001
+            if is_critical:
+                break_even = max(0.0, min(duration, total - avoid))
+            else:
+                break_even = 0.0
+            results.append({
+                "task_id": tid,
+                "slack": round(total - through[tid], 4),
+                "marginal_reduction_per_hour": 1.0 if break_even > 0.001 else 0.0,
+                "break_even_hours": round(break_even, 4),
+                "duration_at_break_even": round(total - break_even, 4),
+            })
+
+        results.sort(key=lambda r: (-r["break_even_hours"], es[r["task_id"]]))
+        return results
+
+    @staticmethod
+    def k_longest_paths(tasks: List[Task], dependencies: List[Tuple[int, int]], k: int = 5, within_hours: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k longest source-to-sink paths, longest first.
+
+        Best-first search over path prefixes, prioritised by prefix length plus the exact
+        longest continuation (the backward-pass tail). Because that bound is exact, paths
+        come off the heap in order of length, so the work is proportional to k times path
+        depth rather than to the (possibly exponential) number of paths. `within_hours`
+        restricts the result to near-critical paths with at most that much slack.
+        """
+        if k <= 0:
+            return []
+        cpm = GraphEngine._cpm_passes(tasks, dependencies)
+        order, adj, rev_adj, lf = cpm["order"], cpm["adj"], cpm["rev_adj"], cpm["lf"]
+        total = cpm["total_duration"]
+        if len(order) != len(tasks):
+            return []
+        duration = {t.id: t.estimated_hours for t in tasks}
+        tail = {tid: total - lf[tid] + duration[tid] for tid in order}
+        floor = total - within_hours if within_hours is not None else float("-inf")
+
+        # Heap entries: (-bound, -prefix length, -push order, prefix length, prefix), where
+        # prefix is a (task_id, parent_prefix) chain so extending a path never copies it.
+        # Equal bounds go to the longest, then newest, prefix: with tied paths the search
+        # runs depth-first to a sink instead of expanding every tied prefix level by level.
+        heap = []
+        counter = 0
+        for tid in order:
+            if not rev_adj[tid]:
+                heapq.heappush(heap, (-tail[tid], -duration[tid], -counter, duration[tid], (tid, None)))
+                counter += 1
+
+        paths = []
+        while heap and len(paths) < k:
+            neg_bound, _, _, length, prefix = heapq.heappop(heap)
+            if -neg_bound < floor - 0.001:
+                break
+            u = prefix[0]
+            if not adj[u]:
+                chain = []
+                while prefix is not None:
+                    chain.append(prefix[0])
+                    prefix = prefix[1]
+                chain.reverse()
+                paths.append({
+                    "tasks": chain,
+                    "length": float(length),
+                    "slack": round(total - length, 4),
+                })
+                continue
+            for v in adj[u]:
+                heapq.heappush(heap, (-(length + tail[v]), -(length + duration[v]), -counter, length + duration[v], (v, prefix)))
+                counter += 1
+
+        return paths
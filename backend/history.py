@@ -0,0 +1,192 @@
+"""
+Change log for tasks, milestones and dependencies.
+
+An after_flush hook appends one ChangeEvent per ORM-level insert, update or delete, and a
+HistorySnapshot every SNAPSHOT_EVERY events, so state_at() can rebuild a project as it was
+at any time. Only writes made through a Session on mapped objects are seen: Core
+statements (session.exec(delete(...)), insert(), update(), raw SQL) bypass the hook and
+leave no history, and neither do graph_version() or the caches keyed on it notice them.
+"""
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event, func, insert, inspect
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+from models import Project, Task, Milestone, TaskDependency, ChangeEvent, HistorySnapshot
+from records import TaskRecord
+from graph_engine import GraphEngine
+from forecasting import ForecastingModule
+from logger import logger
+
+# A snapshot is written once this many events have accumulated since the last one, so a
+# point-in-time query never replays more than SNAPSHOT_EVERY events.
+SNAPSHOT_EVERY = 200
+
+ENTITIES = {Task: "task", Milestone: "milestone", TaskDependency: "dependency"}
+DATETIME_FIELDS = ("deadline", "completed_at", "created_at", "target_date")
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+def _row(obj) -> Dict[str, Any]:
+    return {c.name: getattr(obj, c.name) for c in type(obj).__table__.columns}
+
+def _decode(row: Dict[str, Any]) -> Dict[str, Any]:
+    for key in DATETIME_FIELDS:
+        if isinstance(row.get(key), str):
+            row[key] = datetime.fromisoformat(row[key])
+    return row
+
+def _project_of(session: OrmSession, conn, obj) -> Optional[int]:
+    if not isinstance(obj, TaskDependency):
+        return obj.project_id
+    # The task may be deleted in this same flush, so its row is already gone; the object
+    # is still in the session (in session.deleted and the identity map) until the flush ends.
+    task = session.identity_map.get(inspect(Task).identity_key_from_primary_key([obj.task_id]))
+    if task is not None:
+        project_id = inspect(task).dict.get("project_id")
+        if project_id is not None:
+            return project_id
+    return conn.execute(select(Task.project_id).where(Task.id == obj.task_id)).scalar()
+
+def _record_changes(session: OrmSession, flush_context):
+    """after_flush hook: append one ChangeEvent per mutated Task, Milestone or TaskDependency."""
+    changes = []
+    for obj in session.new:
+        if type(obj) in ENTITIES:
+            changes.append(("upsert", obj))
+    for obj in session.dirty:
+        if type(obj) in ENTITIES and session.is_modified(obj, include_collections=False):
+            changes.append(("upsert", obj))
+    for obj in session.deleted:
+        if type(obj) in ENTITIES:
+            changes.append(("delete", obj))
+    if not changes:
+        return
+
+    conn = session.connection()
+    now = datetime.utcnow()
+    rows = []
+    for op, obj in changes:
+        entity = ENTITIES[type(obj)]
+        project_id = _project_of(session, conn, obj)
+        if project_id is None:
+            continue
+        payload = json.dumps(_row(obj), default=_encode) if op == "upsert" else None
+        rows.append({"project_id": project_id, "entity": entity, "entity_id": obj.id, "op": op, "payload": payload, "timestamp": now})
+        # A task or milestone moved between projects leaves its old project's history
+        if op == "upsert" and not isinstance(obj, TaskDependency):
+            moved_from = inspect(obj).attrs.project_id.history.deleted
+            if moved_from and moved_from[0] is not None and moved_from[0] != project_id:
+                rows.append({"project_id": moved_from[0], "entity": entity, "entity_id": obj.id, "op": "delete", "payload": None, "timestamp": now})
+    if not rows:
+        return
+    conn.execute(insert(ChangeEvent.__table__), rows)
+
+    for project_id in {r["project_id"] for r in rows}:
+        last = conn.execute(select(func.max(HistorySnapshot.event_id)).where(HistorySnapshot.project_id == project_id)).scalar() or 0
+        pending = conn.execute(select(func.count()).select_from(ChangeEvent).where(ChangeEvent.project_id == project_id, ChangeEvent.id > last)).scalar()
+        if pending >= SNAPSHOT_EVERY:
+            write_snapshot(conn, project_id, now)
+
+event.listen(OrmSession, "after_flush", _record_changes)
+
+def write_snapshot(conn, project_id: int, timestamp: Optional[datetime] = None) -> int:
+    """Store the project's current state, labelled with its latest ChangeEvent id."""
+    event_id = conn.execute(select(func.max(ChangeEvent.id)).where(ChangeEvent.project_id == project_id)).scalar() or 0
+    tasks = conn.execute(select(Task.__table__).where(Task.project_id == project_id)).mappings().all()
+    milestones = conn.execute(select(Milestone.__table__).where(Milestone.project_id == project_id)).mappings().all()
+    dependencies = conn.execute(
+        select(TaskDependency.__table__).join(Task, Task.id == TaskDependency.task_id).where(Task.project_id == project_id)
+    ).mappings().all()
+    payload = json.dumps({
+        "task": [dict(r) for r in tasks],
+        "milestone": [dict(r) for r in milestones],
+        "dependency": [dict(r) for r in dependencies],
+    }, default=_encode)
+    conn.execute(insert(HistorySnapshot.__table__).values(
+        project_id=project_id, event_id=event_id, timestamp=timestamp or datetime.utcnow(), payload=payload,
+    ))
+    return event_id
+
+@dataclass
+class HistoricalState:
+    """A project's tasks, milestones and dependencies as they were at `at`."""
+    project_id: int
+    at: datetime
+    event_id: int = 0
+    replayed: int = 0
+    task: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    milestone: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    dependency: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+
+    def task_records(self) -> List[TaskRecord]:
+        return [TaskRecord.from_row(row) for row in self.task.values()]
+
+    def dependency_pairs(self) -> List[Tuple[int, int]]:
+        return [(row["task_id"], row["depends_on_id"]) for row in self.dependency.values()]
+
+def state_at(session: Session, project_id: int, at: Optional[datetime] = None) -> HistoricalState:
+    """Load the nearest snapshot taken at or before `at` and replay only the events after it."""
+    at = at or datetime.utcnow()
+    state = HistoricalState(project_id=project_id, at=at)
+    snapshot = session.exec(
+        select(HistorySnapshot)
+        .where(HistorySnapshot.project_id == project_id, HistorySnapshot.timestamp <= at)
+        .order_by(HistorySnapshot.event_id.desc())
+        .limit(1)
+    ).first()
+    if snapshot:
+        state.event_id = snapshot.event_id
+        for entity, rows in json.loads(snapshot.payload).items():
+            getattr(state, entity).update((row["id"], _decode(row)) for row in rows)
+
+    events = session.execute(
+        select(ChangeEvent.id, ChangeEvent.entity, ChangeEvent.entity_id, ChangeEvent.op, ChangeEvent.payload)
+        .where(ChangeEvent.project_id == project_id, ChangeEvent.id > state.event_id, ChangeEvent.timestamp <= at)
+        .order_by(ChangeEvent.id)
+    ).all()
+    for event_id, entity, entity_id, op, payload in events:
+        rows = getattr(state, entity)
+        if op == "delete":
+            rows.pop(entity_id, None)
+        else:
+            rows[entity_id] = _decode(json.loads(payload))
+        state.event_id = event_id
+    state.replayed = len(events)
+    return state
+
+def historical_stats(session: Session, project: Project, at: datetime) -> Dict[str, Any]:
+    """
+    CPM and forecast over the project as it stood at `at`. Project dates and velocity are
+    not versioned, so the forecast uses the current start date and deadline.
+    """
+    start_time = time.time()
+    state = state_at(session, project.id, at)
+    records = state.task_records()
+    pending = [t for t in records if not t.status]
+    pending_ids = {t.id for t in pending}
+    dependencies = [(a, b) for a, b in state.dependency_pairs() if a in pending_ids and b in pending_ids]
+
+    critical_path, cp_hours, _ = GraphEngine.calculate_critical_path(pending, dependencies)
+    forecast = ForecastingModule.calculate_forecast(project, cp_hours, tasks=records, now=at)
+
+    execution_time = (time.time() - start_time) * 1000
+    logger.info(f"History: project={project.id}, at={at.isoformat()}, replayed={state.replayed}, time={execution_time:.2f}ms")
+    return {
+        "at": at,
+        "event_id": state.event_id,
+        "total_tasks": len(records),
+        "completed_tasks": len(records) - len(pending),
+        "milestones": len(state.milestone),
+        "critical_path": critical_path,
+        "critical_path_hours": cp_hours,
+        "estimated_completion": forecast["estimated_completion"],
+        "delay_probability": forecast["delay_probability"],
+        "confidence_score": forecast["confidence_score"],
+    }
@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, List, Optional
+from sqlalchemy import insert
+from models import BehaviorLog, BehaviorEvent
+from rollups import log_deltas, apply_deltas
+import velocity
+from database import engine
+from logger import logger
+from metrics import metrics
+
+# "buffered": acknowledge once queued; "committed": acknowledge after the group commit
+DEFAULT_ACK = os.getenv("PDE_INGEST_ACK", "buffered")
+ACK_MODES = ("buffered", "committed")
+# Queued events above which submit() waits for a flush, then gives up
+MAX_PENDING = int(os.getenv("PDE_INGEST_MAX_PENDING", "50000"))
+
+class IngestBackpressure(Exception):
+    """The buffer stayed above its high-water mark for the whole backpressure wait."""
+
+class _Generation:
+    """Events that will be written by the same group commit."""
+    def __init__(self):
+        self.rows: List[dict] = []
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+class BehaviorIngestor:
+    """
+    Buffers BehaviorLog events in memory and writes them with one executemany INSERT
+    (plus one rollup upsert) per flush. A flush happens when `max_batch` events are
+    queued or `flush_interval` seconds after the first event of a batch, whichever
+    comes first.
+
+    At most `max_pending` events are queued. A submit that would exceed it waits up to
+    `backpressure_timeout` seconds for a flush to make room, then raises
+    IngestBackpressure. A single submit larger than the limit is accepted into an empty
+    buffer.
+    """
+    def __init__(self, engine, max_batch: int = 5000, flush_interval: float = 0.05, max_pending: int = MAX_PENDING, backpressure_timeout: float = 1.0):
+        self._engine = engine
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.backpressure_timeout = backpressure_timeout
+        self._cond = threading.Condition()
+        self._current = _Generation()
+        self._first_event_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # Serialises writers so manual flush() and the background thread never overlap
+        self._write_lock = threading.Lock()
+        self._listeners: List[Callable[[int], None]] = []
+
+    def add_listener(self, callback: Callable[[int], None]):
+        """Call `callback(project_id)` for each project touched by a committed flush."""
+        self._listeners.append(callback)
+
+    def submit(self, project_id: int, events: List[BehaviorEvent], wait: bool = False, timeout: Optional[float] = None) -> int:
+        now = datetime.utcnow()
+        rows = [
+            {
+                "project_id": project_id,
+                "task_id": e.task_id,
+                "action_type": e.action_type,
+                "timestamp": e.timestamp.replace(tzinfo=None) if e.timestamp else now,
+                "duration_minutes": e.duration_minutes,
+            }
+            for e in events
+        ]
+        if not rows:
+            return 0
+        with self._cond:
+            deadline = time.monotonic() + self.backpressure_timeout
+            while self._current.rows and len(self._current.rows) + len(rows) > self.max_pending:
+                self._ensure_thread()
+                self._cond.notify_all()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise IngestBackpressure(f"{len(self._current.rows)} events already queued")
+                self._cond.wait(remaining)
+            generation = self._current
+            generation.rows.extend(rows)
+            if self._first_event_at is None:
+                self._first_event_at = time.monotonic()
+            if len(generation.rows) >= self.max_batch:
+                self._cond.notify_all()
+            self._ensure_thread()
+        metrics.increment("events_ingested", len(rows))
+
+        if wait:
+            if not generation.done.wait(timeout):
+                raise TimeoutError("Timed out waiting for group commit")
+            if generation.error:
+                raise generation.error
+        return len(rows)
+
+    def flush(self):
+        """Write everything queued so far on the calling thread."""
+        with self._cond:
+            generation = self._swap()
+        self._write(generation)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self._stopping = False
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._current.rows)
+
+    def _ensure_thread(self):
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(target=self._run, name="behavior-ingestor", daemon=True)
+            self._thread.start()
+
+    def _swap(self) -> _Generation:
+        generation = self._current
+        self._current = _Generation()
+        self._first_event_at = None
+        # Wake submitters waiting for room under the high-water mark
+        self._cond.notify_all()
+        return generation
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    queued = len(self._current.rows)
+                    if queued >= self.max_batch:
+                        break
+                    if queued:
+                        remaining = self.flush_interval - (time.monotonic() - self._first_event_at)
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._stopping:
+                    return
+                generation = self._swap()
+            self._write(generation)
+
+    def _write(self, generation: _Generation):
+        if not generation.rows:
+            generation.done.set()
+            return
+        start_time = time.time()
+        try:
+            with self._write_lock, self._engine.begin() as conn:
+                conn.execute(insert(BehaviorLog.__table__), generation.rows)
+                apply_deltas(conn, log_deltas(SimpleNamespace(**row) for row in generation.rows))
+                velocity.apply_events(conn, generation.rows)
+            metrics.increment("ingest_flushes")
+            execution_time = (time.time() - start_time) * 1000
+            logger.info(f"Ingest flush: events={len(generation.rows)}, time={execution_time:.2f}ms")
+            for project_id in {row["project_id"] for row in generation.rows}:
+                for callback in self._listeners:
+                    callback(project_id)
+        except Exception as e:
+            generation.error = e
+            logger.error(f"Ingest flush failed: events={len(generation.rows)}, error={e}")
+        finally:
+            generation.done.set()
+
+ingestor = BehaviorIngestor(engine)
+
+def get_ingestor() -> BehaviorIngestor:
+    return ingestor
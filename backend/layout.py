@@ -0,0 +1,180 @@
+import collections
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from graph_engine import GraphEngine
+from logger import logger
+
+COLLAPSE_MODES = ("none", "milestone", "chains")
+
+def _cluster_milestones(tasks, dependencies) -> Tuple[Dict[int, Hashable], Dict[Hashable, int]]:
+    """Map each task to a node: its milestone's cluster, or itself when it has no milestone."""
+    node_of = {t.id: (f"m{t.milestone_id}" if t.milestone_id else t.id) for t in tasks}
+    return node_of, collections.Counter(node_of.values())
+
+def _cluster_chains(tasks, dependencies, critical: Set[int]) -> Tuple[Dict[int, Hashable], Dict[Hashable, int]]:
+    """Collapse maximal runs u -> v of non-critical tasks where u has one successor and v one predecessor."""
+    succ = collections.defaultdict(list)
+    pred = collections.defaultdict(list)
+    known = {t.id for t in tasks}
+    for task_id, depends_on_id in dependencies:
+        if task_id in known and depends_on_id in known:
+            succ[depends_on_id].append(task_id)
+            pred[task_id].append(depends_on_id)
+
+    def links(u):
+        if u in critical or len(succ[u]) != 1:
+            return None
+        v = succ[u][0]
+        return v if v not in critical and len(pred[v]) == 1 else None
+
+    node_of = {}
+    sizes = collections.Counter()
+    for t in tasks:
+        if t.id in node_of:
+            continue
+        # Only start from the head of a chain
+        if len(pred[t.id]) == 1 and links(pred[t.id][0]) == t.id:
+            continue
+        chain = [t.id]
+        nxt = links(t.id)
+        while nxt is not None and nxt not in node_of:
+            chain.append(nxt)
+            nxt = links(nxt)
+        node = chain[0] if len(chain) == 1 else f"c{chain[0]}-{chain[-1]}"
+        for tid in chain:
+            node_of[tid] = node
+        sizes[node] = len(chain)
+    return node_of, sizes
+
+def layered_layout(tasks, dependencies: List[Tuple[int, int]], collapse: str = "none", sweeps: int = 4) -> Dict[str, Any]:
+    """
+    Sugiyama-style layout of the task DAG.
+
+    1. Layers: longest-path layering along GraphEngine's topological order.
+    2. Level of detail: tasks may be merged into milestone clusters or off-critical chains;
+       a cluster sits on the first layer of its members and edges inside it disappear.
+    3. Long edges are split into dummy nodes so every edge joins adjacent layers.
+    4. Crossings are reduced with alternating down/up barycenter sweeps.
+    5. x is the node's slot in its layer, centred on 0; y is the layer.
+
+    Returns {"nodes": [[id, layer, x, size, critical]], "edges": [[src, dst, [x per
+    intermediate layer, from src to dst], reversed]], "layers": n}. Edges keep their real
+    direction; `reversed` marks those whose src sits below dst, which clustering can cause.
+    """
+    cpm = GraphEngine._cpm_passes(tasks, dependencies)
+    order, adj = cpm["order"], cpm["adj"]
+    if len(order) != len(tasks):
+        raise ValueError("Dependency graph contains a cycle")
+    critical = {tid for tid in order if cpm["ls"][tid] - cpm["es"][tid] <= 0.001}
+
+    task_layer = {}
+    for u in order:
+        task_layer.setdefault(u, 0)
+        for v in adj[u]:
+            task_layer[v] = max(task_layer.get(v, 0), task_layer[u] + 1)
+
+    if collapse == "milestone":
+        node_of, sizes = _cluster_milestones(tasks, dependencies)
+    elif collapse == "chains":
+        node_of, sizes = _cluster_chains(tasks, dependencies, critical)
+    else:
+        node_of, sizes = {t.id: t.id for t in tasks}, collections.Counter({t.id: 1 for t in tasks})
+
+    layer: Dict[Hashable, int] = {}
+    node_critical: Dict[Hashable, bool] = {}
+    for tid in order:
+        node = node_of[tid]
+        layer[node] = min(layer.get(node, task_layer[tid]), task_layer[tid])
+        node_critical[node] = node_critical.get(node, False) or tid in critical
+
+    # Edges between distinct nodes, in their real direction; same-layer edges (possible
+    # after clustering) are drawn but take no part in layering.
+    edges = set()
+    for u in order:
+        for v in adj[u]:
+            a, b = node_of[u], node_of[v]
+            if a != b:
+                edges.add((a, b))
+    edges = sorted(edges, key=str)
+
+    num_layers = max(layer.values()) + 1 if layer else 0
+    rows: List[List[Hashable]] = [[] for _ in range(num_layers)]
+    for node in sorted(layer, key=lambda n: (layer[n], str(n))):
+        rows[layer[node]].append(node)
+
+    up = collections.defaultdict(list)
+    down = collections.defaultdict(list)
+    routes = []
+    for a, b in edges:
+        # Route from the upper end down; an edge and its opposite get separate dummies
+        top, bottom = (b, a) if layer[a] > layer[b] else (a, b)
+        path = [top]
+        for l in range(layer[top] + 1, layer[bottom]):
+            dummy = ("d", a, b, l)
+            rows[l].append(dummy)
+            path.append(dummy)
+        path.append(bottom)
+        for s, t in zip(path, path[1:]):
+            down[s].append(t)
+            up[t].append(s)
+        routes.append((a, b, path))
+
+    for sweep in range(sweeps):
+        if sweep % 2 == 0:
+            for l in range(1, num_layers):
+                _reorder(rows[l], rows[l - 1], up)
+        else:
+            for l in range(num_layers - 2, -1, -1):
+                _reorder(rows[l], rows[l + 1], down)
+
+    x = {}
+    for row in rows:
+        offset = (len(row) - 1) / 2
+        for i, node in enumerate(row):
+            x[node] = i - offset
+
+    return {
+        "layers": num_layers,
+        "nodes": [[node, layer[node], x[node], sizes[node], node_critical[node]] for node in layer],
+        "edges": [
+            [a, b, [x[d] for d in (path[1:-1] if path[0] == a else path[-2:0:-1])], path[0] != a]
+            for a, b, path in routes
+        ],
+    }
+
+def _reorder(row: List[Hashable], fixed: List[Hashable], neighbours: Dict[Hashable, List[Hashable]]):
+    """Sort `row` in place by the mean position of each node's neighbours in `fixed`."""
+    position = {node: i for i, node in enumerate(fixed)}
+    def barycenter(item):
+        i, node = item
+        ps = [position[n] for n in neighbours.get(node, ()) if n in position]
+        return sum(ps) / len(ps) if ps else i * len(fixed) / max(1, len(row))
+    row[:] = [node for _, node in sorted(enumerate(row), key=barycenter)]
+
+class LayoutCache:
+    """Small LRU of computed layouts keyed by (project, data version, collapse mode)."""
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "collections.OrderedDict[Hashable, Dict[str, Any]]" = collections.OrderedDict()
+
+    def get_or_compute(self, key: Hashable, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        start_time = time.time()
+        result = fn()
+        execution_time = (time.time() - start_time) * 1000
+        logger.info(f"Layout: key={key}, nodes={len(result['nodes'])}, time={execution_time:.2f}ms")
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+layout_cache = LayoutCache()
+
+def get_layout_cache() -> LayoutCache:
+    return layout_cache
@@ -1,17 +1,60 @@
 from datetime import datetime, timezone
-from typing import List
-from models import Task, Project, ProjectDetail, TaskRead, MilestoneRead
+from typing import Any, Dict, List, Tuple
+import collections
+from sqlmodel import select
+from models import Task, Project, ProjectDetail, TaskRead, MilestoneRead, TaskDependency
 
 from services import calculate_risk_model, score_task_v2
 from graph_engine import GraphEngine
 from forecasting import ForecastingModule
+from velocity import load_estimate, DEFAULT_HOURS_PER_DAY
+from records import TaskRecord, load_task_records, load_task_rows
 from logger import logger
 from metrics import metrics
+from query_stats import note_tasks
+from memtrace import stage, trace_memory
+
+def load_dependencies(session, task_ids: List[int]) -> List[Tuple[int, int]]:
+    """(task_id, depends_on_id) pairs for the given tasks."""
+    if not task_ids:
+        return []
+    rows = session.exec(select(TaskDependency.task_id, TaskDependency.depends_on_id).where(TaskDependency.task_id.in_(task_ids))).all()
+    return [(task_id, depends_on_id) for task_id, depends_on_id in rows]
+
+def load_pending_graph(project: Project, session) -> Tuple[List[TaskRecord], List[Tuple[int, int]]]:
+    """Pending tasks of a project and the dependencies between them (remaining work only)."""
+    pending = load_task_records(session, project.id, pending_only=True)
+    pending_ids = {t.id for t in pending}
+    dependencies = load_dependencies(session, list(pending_ids))
+    return pending, [(a, b) for a, b in dependencies if b in pending_ids]
 
 def calculate_project_stats(project: Project, session=None) -> ProjectDetail:
     now = datetime.utcnow()
-    total_tasks = len(project.tasks)
-    completed_tasks = [t for t in project.tasks if t.status]
+    
+    # Stages are no-ops unless a memory trace is active (see memtrace.py)
+    with stage("load"):
+        # Engines run on compact records; with a session they come straight from SQL rows
+        # and no Task objects are materialised at all.
+        if session:
+            task_rows = load_task_rows(session, project.id)
+            tasks = [TaskRecord.from_row(r) for r in task_rows]
+        else:
+            task_rows = [t.dict() for t in project.tasks]
+            tasks = [TaskRecord.from_task(t) for t in project.tasks]
+        
+        # Recent work rate from BehaviorLog, if the project has enough history
+        velocity = load_estimate(session, project.id) if session else None
+        
+        # Phase 3: Dependency & Critical Path
+        # Fetch dependencies from DB if session is available
+        dependencies = []
+        if session:
+            dependencies = load_dependencies(session, [t.id for t in tasks])
+        milestones = project.milestones
+    
+    total_tasks = len(tasks)
+    note_tasks(total_tasks)
+    completed_tasks = [t for t in tasks if t.status]
     num_completed = len(completed_tasks)
     
     completion_percentage = (num_completed / total_tasks * 100) if total_tasks > 0 else 0
@@ -19,64 +62,98 @@ def calculate_project_stats(project: Project, session=None) -> ProjectDetail:
     days_left = (project.deadline.replace(tzinfo=None) - now).days
     days_passed = max(1, (now - project.start_date.replace(tzinfo=None)).days)
     avg_tasks_per_day = num_completed / days_passed
-    
-    # Risk calculation
-    risk_score, risk_level = calculate_risk_model(project)
-    
-    # Phase 3: Dependency & Critical Path
-    # Fetch dependencies from DB if session is available
-    dependencies = []
-    if session:
-        from models import TaskDependency
-        from sqlmodel import select
-        # Extract task IDs
-        tids = [t.id for t in project.tasks]
-        if tids:
-            deps_data = session.exec(select(TaskDependency).where(TaskDependency.task_id.in_(tids))).all()
-            dependencies = [(d.task_id, d.depends_on_id) for d in deps_data]
 
-    critical_path, cp_duration, slack = GraphEngine.calculate_critical_path(project.tasks, dependencies)
-    
-    # Phase 3: Forecasting
-    forecast = ForecastingModule.calculate_forecast(project, cp_duration)
+    with stage("cpm"):
+        schedule = GraphEngine.calculate_schedule(tasks, dependencies)
+        critical_path, cp_duration, slack = schedule["critical_path"], schedule["total_duration"], schedule["slack"]
     
-    # Phase 3: Bottlenecks
-    bottlenecks = ForecastingModule.detect_bottlenecks(project.tasks, dependencies, slack)
+    with stage("forecast"):
+        # Risk calculation
+        risk_score, risk_level = calculate_risk_model(project, velocity, tasks=tasks)
+        
+        # Phase 3: Forecasting
+        forecast = ForecastingModule.calculate_forecast(project, cp_duration, velocity, tasks=tasks)
+        
+        hours_per_day = velocity.hours_per_day if velocity else DEFAULT_HOURS_PER_DAY
+        milestone_rollups = ForecastingModule.rollup_milestones(tasks, milestones, schedule, hours_per_day, now=now)
+        
+        # Own and downstream deadlines pushed back through the DAG
+        deadlines = GraphEngine.propagate_deadlines(tasks, schedule, ForecastingModule.deadline_hours(tasks, hours_per_day, now=now))
+        lateness = deadlines["lateness"]
+        
+        # Completion spread from three-point estimates, in closed form
+        pert = GraphEngine.pert_schedule(tasks, schedule)
+        pert_forecast = ForecastingModule.pert_forecast(project, pert, tasks, hours_per_day, now=now)
+        
+        # Phase 3: Bottlenecks
+        bottlenecks = ForecastingModule.detect_bottlenecks(tasks, dependencies, slack, milestone_rollups, deadlines)
     
     pace_status = "On Track"
     if risk_level == "High" or forecast["delay_probability"] > 50: pace_status = "Behind"
     elif risk_score < 20 and forecast["delay_probability"] < 10: pace_status = "Ahead"
 
-    # Log top ranked tasks (Strategy Advisor hint)
-    scored_tasks = []
-    for t in project.tasks:
-        if not t.status:
-            metrics.increment("tasks_scored")
-            score, _ = score_task_v2(t, project, available_hours=4.0) # Default 4h for logging
-            scored_tasks.append((t.title, score))
-    
-    if scored_tasks:
-        scored_tasks.sort(key=lambda x: x[1], reverse=True)
-        top_task, top_score = scored_tasks[0]
-        logger.info(f"Strategy: project={project.title}, top_task='{top_task}', score={top_score:.1f}")
+    with stage("scoring"):
+        # Log top ranked tasks (Strategy Advisor hint)
+        scored_tasks = []
+        milestone_map = {m.id: m for m in milestones}
+        for t in tasks:
+            if not t.status:
+                metrics.increment("tasks_scored")
+                deadline_slack = -lateness[t.id] / hours_per_day if t.id in lateness else None
+                score, _ = score_task_v2(t, project, available_hours=4.0, velocity=velocity, risk_score=risk_score, milestones=milestone_map, deadline_slack_days=deadline_slack) # Default 4h for logging
+                scored_tasks.append((t.id, score))
+        
+        if scored_tasks:
+            scored_tasks.sort(key=lambda x: x[1], reverse=True)
+            top_task, top_score = scored_tasks[0]
+            logger.info(f"Strategy: project={project.title}, top_task={top_task}, score={top_score:.1f}")
+
+    with stage("serialization"):
+        dependency_ids = collections.defaultdict(list)
+        for task_id, depends_on_id in dependencies:
+            dependency_ids[task_id].append(depends_on_id)
+
+        return ProjectDetail(
+            **project.dict(),
+            tasks=[TaskRead(**r, dependency_ids=dependency_ids[r["id"]]) for r in task_rows],
+            milestones=[MilestoneRead(**m.dict()) for m in milestones],
+            total_tasks=total_tasks,
+            completed_tasks=num_completed,
+            completion_percentage=round(completion_percentage, 2),
+            days_left=max(0, days_left),
+            pace_status=pace_status,
+            avg_tasks_per_day=round(avg_tasks_per_day, 2),
+            risk_level=risk_level,
+            risk_score=risk_score,
+            critical_path=critical_path,
+            forecast_completion=forecast["estimated_completion"],
+            delay_prob=forecast["delay_probability"],
+            bottlenecks=bottlenecks,
+            milestone_rollups=milestone_rollups,
+            deadline_risks=[
+                {"task_id": tid, "lateness_hours": round(lateness[tid], 2), "required_finish_hours": round(deadlines["required_finish"][tid], 2)}
+                for tid in deadlines["deadline_critical"]
+            ],
+            pert_forecast=pert_forecast,
+        )
 
-    return ProjectDetail(
-        **project.dict(),
-        tasks=[TaskRead(**t.dict(), dependency_ids=[d[1] for d in dependencies if d[0] == t.id]) for t in project.tasks],
-        milestones=[MilestoneRead(**m.dict()) for m in project.milestones],
-        total_tasks=total_tasks,
-        completed_tasks=num_completed,
-        completion_percentage=round(completion_percentage, 2),
-        days_left=max(0, days_left),
-        pace_status=pace_status,
-        avg_tasks_per_day=round(avg_tasks_per_day, 2),
-        risk_level=risk_level,
-        risk_score=risk_score,
-        critical_path=critical_path,
-        forecast_completion=forecast["estimated_completion"],
-        delay_prob=forecast["delay_probability"],
-        bottlenecks=bottlenecks
-    )
+def memory_report(project: Project, session) -> Dict[str, Any]:
+    """
+    Peak and retained allocations per stage of calculate_project_stats, plus JSON encoding
+    of the result. tracemalloc slows the run several-fold and is process-wide, so this is
+    for diagnostics and benchmarks, not the request path.
+    """
+    with trace_memory() as trace:
+        detail = calculate_project_stats(project, session=session)
+        with stage("encode"):
+            detail.model_dump_json()
+    return {
+        "project_id": project.id,
+        "tasks": detail.total_tasks,
+        "peak_bytes": trace.peak_bytes,
+        "bytes_per_task": trace.peak_bytes // max(1, detail.total_tasks),
+        "stages": trace.stages,
+    }
 
 def score_task(task: Task, available_hours: float) -> float:
     # Weights
@@ -1,21 +1,44 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import SQLModel, Session, select
 from datetime import datetime
-from typing import List, Optional
+import time
+from typing import List, Optional, Union
 
 from database import engine, create_db_and_tables, get_session
-from models import Project, ProjectBase, ProjectRead, Task, TaskBase, TaskRead, ProjectDetail, Milestone, MilestoneBase, MilestoneRead, BehaviorLog, TaskDependency
-from logic import calculate_project_stats
-from services import calculate_analytics, calculate_risk_model, score_task_v2
+from models import Project, ProjectBase, ProjectRead, ProjectSummary, Task, TaskBase, TaskRead, ProjectDetail, Milestone, MilestoneBase, MilestoneRead, BehaviorLog, BehaviorEvent, TaskDependency, ChangeEvent, ProjectBatch
+from logic import memory_report
+from memtrace import get_memory_diagnostics
+from services import calculate_analytics, calculate_risk_model, project_summaries, score_task_v2
+from graph_engine import GraphEngine
+from rollups import record_behavior_log, remove_behavior_logs
+from ingestion import BehaviorIngestor, IngestBackpressure, get_ingestor, DEFAULT_ACK, ACK_MODES
+from snapshots import RecomputeWorker, ProjectSnapshot, get_worker
+from portfolio import PortfolioPlanner, get_planner
+from batch import apply_batch
+from reduction import reduce_dependencies
+from search import search
+from history import historical_stats
+from graph_cache import GraphCache, get_graph_cache, graph_version, load_graph
+from layout import LayoutCache, COLLAPSE_MODES, layered_layout, get_layout_cache
 from metrics import metrics
+from profiling import Profiler, ProfilingMiddleware, get_profiler
+from query_stats import QueryStatsMiddleware
 
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
+    get_ingestor().add_listener(get_worker().mark_dirty)
+    get_worker().start()
     yield
+    get_ingestor().stop()
+    get_worker().stop()
+    if AIService.client:
+        await AIService.client.aclose()
 
 app = FastAPI(title="Project Discipline Engine API - Phase 3", lifespan=lifespan)
 
@@ -26,6 +49,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 # Projects
 @app.post("/projects", response_model=ProjectRead)
@@ -36,77 +61,296 @@ def create_project(project: ProjectBase, session: Session = Depends(get_session)
     session.refresh(db_project)
     return db_project
 
-@app.get("/projects", response_model=List[ProjectRead])
+@app.get("/projects", response_model=List[ProjectSummary])
 def read_projects(session: Session = Depends(get_session)):
-    projects = session.exec(select(Project)).all()
-    return projects
+    return project_summaries(session)
+
+def project_snapshot(project_id: int, session: Session, worker: RecomputeWorker, response: Optional[Response] = None, fresh: bool = False) -> ProjectSnapshot:
+    """
+    Latest precomputed stats for a project, computed inline only if there is none (or
+    `fresh` and it is stale). Concurrent inline computations of one version are shared.
+    A snapshot left behind by a write through another process queues a refresh here.
+    """
+    snapshot = worker.get_snapshot(project_id)
+    stale = snapshot is not None and worker.is_stale(snapshot, project_id, session)
+    if stale and snapshot.version >= worker.version(project_id):
+        worker.mark_dirty(project_id)
+    if snapshot is None or (fresh and stale):
+        snapshot = worker.compute(project_id, session)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        stale = False
+    if response is not None:
+        response.headers["X-Snapshot-Version"] = str(snapshot.version)
+        response.headers["X-Snapshot-Age"] = f"{time.time() - snapshot.computed_at:.3f}"
+        response.headers["X-Snapshot-Stale"] = "true" if stale else "false"
+    return snapshot
 
 @app.get("/projects/{project_id}", response_model=ProjectDetail)
-def read_project(project_id: int, session: Session = Depends(get_session)):
+def read_project(project_id: int, response: Response, fresh: bool = False, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    return project_snapshot(project_id, session, worker, response, fresh).detail
+
+@app.get("/projects/{project_id}/analytics")
+def read_analytics(project_id: int, window: int = Query(7, ge=1, le=365), session: Session = Depends(get_session)):
     project = session.get(Project, project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    return calculate_project_stats(project, session=session)
+    if not project: raise HTTPException(status_code=404)
+    return calculate_analytics(project, session, window_days=window)
+
+@app.post("/projects/{project_id}/events", status_code=202)
+def ingest_events(
+    project_id: int,
+    events: Union[BehaviorEvent, List[BehaviorEvent]],
+    ack: str = Query(DEFAULT_ACK),
+    session: Session = Depends(get_session),
+    ingestor: BehaviorIngestor = Depends(get_ingestor),
+):
+    if ack not in ACK_MODES:
+        raise HTTPException(status_code=422, detail=f"ack must be one of {ACK_MODES}")
+    # Unknown projects would only fail at flush time, taking the whole group commit with them
+    if not session.get(Project, project_id): raise HTTPException(status_code=404)
+    if isinstance(events, BehaviorEvent):
+        events = [events]
+    try:
+        accepted = ingestor.submit(project_id, events, wait=(ack == "committed"), timeout=10)
+    except IngestBackpressure as e:
+        raise HTTPException(status_code=429, detail=f"Event buffer full: {e}", headers={"Retry-After": "1"})
+    except TimeoutError:
+        raise HTTPException(status_code=503, detail="Event commit timed out")
+    except Exception:
+        raise HTTPException(status_code=500, detail="Event commit failed")
+    return {"accepted": accepted, "ack": ack}
+
+# Tasks
+@app.patch("/tasks/{task_id}/toggle", response_model=TaskRead)
+def toggle_task(task_id: int, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    task = session.get(Task, task_id)
+    if not task: raise HTTPException(status_code=404, detail="Task not found")
+    if not task.status:
+        task.status = True
+        task.completed_at = datetime.utcnow()
+        record_behavior_log(session, BehaviorLog(project_id=task.project_id, task_id=task.id, action_type="completion", timestamp=task.completed_at))
+    else:
+        # Undo: drop the completion from the log, the rollup and the velocity model
+        log = session.exec(
+            select(BehaviorLog)
+            .where(BehaviorLog.task_id == task.id, BehaviorLog.action_type == "completion")
+            .order_by(BehaviorLog.timestamp.desc())
+        ).first()
+        if log:
+            remove_behavior_logs(session, [log])
+        task.status = False
+        task.completed_at = None
+    session.add(task)
+    session.commit()
+    session.refresh(task)
+    worker.mark_dirty(task.project_id)
+    return task
+
+@app.post("/projects/{project_id}/batch", response_model=ProjectDetail)
+def batch_update(project_id: int, batch: ProjectBatch, response: Response, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    if not session.get(Project, project_id): raise HTTPException(status_code=404)
+    try:
+        apply_batch(session, project_id, batch)
+    except LookupError as e:
+        session.rollback()
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    session.commit()
+    worker.mark_dirty(project_id)
+    return project_snapshot(project_id, session, worker, response, fresh=True).detail
 
 # Phase 3: Dependencies
 @app.post("/tasks/{task_id}/dependencies")
-def add_dependency(task_id: int, depends_on_id: int, session: Session = Depends(get_session)):
+def add_dependency(task_id: int, depends_on_id: int, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    existing = session.exec(select(TaskDependency).where(TaskDependency.task_id == task_id, TaskDependency.depends_on_id == depends_on_id)).first()
+    if existing:
+        return {"status": "success"}
     dep = TaskDependency(task_id=task_id, depends_on_id=depends_on_id)
     session.add(dep)
     session.commit()
+    task = session.get(Task, task_id)
+    if task:
+        worker.mark_dirty(task.project_id)
     return {"status": "success"}
 
-@app.get("/projects/{project_id}/critical-path")
-def get_critical_path(project_id: int, session: Session = Depends(get_session)):
+@app.post("/projects/{project_id}/dependencies/reduce")
+def reduce_project_dependencies(project_id: int, apply: bool = False, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    """Report redundant dependencies (implied by other paths); with apply=true, delete them."""
     project = session.get(Project, project_id)
     if not project: raise HTTPException(status_code=404)
-    stats = calculate_project_stats(project, session=session)
+    try:
+        report = reduce_dependencies(session, project_id, apply=apply)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if apply and report["redundant_edges"]:
+        session.commit()
+        worker.mark_dirty(project_id)
+    return report
+
+@app.get("/projects/{project_id}/critical-path")
+def get_critical_path(project_id: int, response: Response, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    stats = project_snapshot(project_id, session, worker, response).detail
+    critical = set(stats.critical_path)
     return {
         "critical_path": stats.critical_path,
-        "tasks": [TaskRead(**t.dict()) for t in project.tasks if t.id in stats.critical_path]
+        "tasks": [t for t in stats.tasks if t.id in critical]
     }
 
-@app.get("/projects/{project_id}/forecast")
-def get_forecast(project_id: int, session: Session = Depends(get_session)):
+@app.get("/projects/{project_id}/crashing")
+def get_crashing_analysis(project_id: int, session: Session = Depends(get_session), graphs: GraphCache = Depends(get_graph_cache)):
+    project = session.get(Project, project_id)
+    if not project: raise HTTPException(status_code=404)
+    pending, dependencies = load_graph(session, project_id, graphs).pending_graph()
+    return GraphEngine.calculate_crashing_analysis(pending, dependencies)
+
+@app.get("/projects/{project_id}/paths")
+def get_longest_paths(project_id: int, k: int = Query(5, ge=1, le=100), within_hours: Optional[float] = Query(None, ge=0), session: Session = Depends(get_session), graphs: GraphCache = Depends(get_graph_cache)):
     project = session.get(Project, project_id)
     if not project: raise HTTPException(status_code=404)
-    stats = calculate_project_stats(project, session=session)
+    pending, dependencies = load_graph(session, project_id, graphs).pending_graph()
+    return GraphEngine.k_longest_paths(pending, dependencies, k=k, within_hours=within_hours)
+
+@app.get("/projects/{project_id}/layout")
+def get_layout(
+    project_id: int,
+    collapse: str = Query("none", pattern="^(" + "|".join(COLLAPSE_MODES) + ")$"),
+    session: Session = Depends(get_session),
+    cache: LayoutCache = Depends(get_layout_cache),
+    graphs: GraphCache = Depends(get_graph_cache),
+):
+    project = session.get(Project, project_id)
+    if not project: raise HTTPException(status_code=404)
+    def compute():
+        graph = load_graph(session, project_id, graphs)
+        return layered_layout(graph.records(), graph.dependencies(), collapse=collapse)
+    version = graph_version(session, project_id)
+    try:
+        layout = cache.get_or_compute((project_id, version, collapse), compute)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"version": version, "collapse": collapse, **layout}
+
+@app.get("/projects/{project_id}/diagnostics/memory")
+def diagnose_memory(project_id: int, session: Session = Depends(get_session), enabled: bool = Depends(get_memory_diagnostics)):
+    if not enabled: raise HTTPException(status_code=404)
+    project = session.get(Project, project_id)
+    if not project: raise HTTPException(status_code=404)
+    return memory_report(project, session)
+
+@app.get("/projects/{project_id}/history")
+def get_history(project_id: int, at: datetime, session: Session = Depends(get_session)):
+    project = session.get(Project, project_id)
+    if not project: raise HTTPException(status_code=404)
+    return historical_stats(session, project, at.replace(tzinfo=None))
+
+@app.get("/projects/{project_id}/history/events", response_model=List[ChangeEvent])
+def get_history_events(project_id: int, after_id: int = 0, limit: int = Query(100, ge=1, le=1000), session: Session = Depends(get_session)):
+    return session.exec(
+        select(ChangeEvent)
+        .where(ChangeEvent.project_id == project_id, ChangeEvent.id > after_id)
+        .order_by(ChangeEvent.id)
+        .limit(limit)
+    ).all()
+
+@app.get("/projects/{project_id}/forecast")
+def get_forecast(project_id: int, response: Response, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    stats = project_snapshot(project_id, session, worker, response).detail
     return {
         "estimated_completion": stats.forecast_completion,
-        "delay_probability": stats.delay_prob
+        "delay_probability": stats.delay_prob,
+        "pert": stats.pert_forecast,
     }
 
 @app.get("/projects/{project_id}/bottlenecks")
-def get_bottlenecks(project_id: int, session: Session = Depends(get_session)):
-    project = session.get(Project, project_id)
-    if not project: raise HTTPException(status_code=404)
-    stats = calculate_project_stats(project, session=session)
+def get_bottlenecks(project_id: int, response: Response, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    stats = project_snapshot(project_id, session, worker, response).detail
     return stats.bottlenecks
 
+@app.get("/projects/{project_id}/milestones/rollup")
+def get_milestone_rollup(project_id: int, response: Response, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    return project_snapshot(project_id, session, worker, response).detail.milestone_rollups
+
+# Search
+@app.get("/search")
+def search_tasks(
+    q: str = Query(..., min_length=1),
+    project_id: Optional[int] = None,
+    kind: Optional[str] = Query(None, pattern="^(task|milestone)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session),
+):
+    return search(session.connection(), q, project_id=project_id, kind=kind, limit=limit, offset=offset)
+
+# Portfolio
+@app.get("/portfolio/schedule")
+def get_portfolio_schedule(
+    project_ids: Optional[List[int]] = Query(None),
+    expand: Optional[List[int]] = Query(None),
+    session: Session = Depends(get_session),
+    planner: PortfolioPlanner = Depends(get_planner),
+):
+    try:
+        return planner.schedule(session, project_ids, expand)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 # Phase 3: AI Integration
 from ai_integration import AIService
+from ai_client import AIClientError
 
 class PlanInput(SQLModel):
     text: str
 
+# AI endpoints are async so slow model calls wait on the event loop, not in the thread pool;
+# only the database work is handed to worker threads.
 @app.post("/projects/{project_id}/auto-structure-plan")
-def auto_structure_plan(project_id: int, plan: PlanInput, session: Session = Depends(get_session)):
-    project = session.get(Project, project_id)
+async def auto_structure_plan(project_id: int, plan: PlanInput, session: Session = Depends(get_session)):
+    project = await run_in_threadpool(session.get, Project, project_id)
     if not project: raise HTTPException(status_code=404)
-    structured_data = AIService.structure_plan(project_id, plan.text)
+    try:
+        structured_data = await AIService.structure_plan_async(project_id, plan.text)
+    except AIClientError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return structured_data
 
 @app.post("/projects/{project_id}/advisor")
-def get_ai_advice(project_id: int, available_hours: float, session: Session = Depends(get_session)):
-    project = session.get(Project, project_id)
-    if not project: raise HTTPException(status_code=404)
-    stats = calculate_project_stats(project, session=session)
-    advice = AIService.get_advice(stats.dict(), available_hours)
+async def get_ai_advice(project_id: int, available_hours: float, response: Response, session: Session = Depends(get_session), worker: RecomputeWorker = Depends(get_worker)):
+    stats = (await run_in_threadpool(project_snapshot, project_id, session, worker, response)).detail
+    try:
+        advice = await AIService.get_advice_async(stats.dict(), available_hours)
+    except AIClientError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return advice
 
 @app.get("/metrics")
 def read_metrics():
-    return metrics.get_metrics()
+    return {**metrics.get_metrics(), "histograms": metrics.get_histograms()}
+
+# Profiles of requests sent with X-Profile or sampled via PDE_PROFILE_SAMPLE_RATE
+def profiles_access(profiler: Profiler = Depends(get_profiler), x_profile: Optional[str] = Header(None)) -> Profiler:
+    """Profiles expose paths and query strings: served only with PDE_PROFILING on, and the token if one is set."""
+    if not profiler.enabled or (profiler.token is not None and x_profile != profiler.token):
+        raise HTTPException(status_code=404)
+    return profiler
+
+@app.get("/profiles")
+def list_profiles(profiler: Profiler = Depends(profiles_access)):
+    return profiler.store.list()
+
+@app.get("/profiles/{profile_id}")
+def read_profile(profile_id: str, profiler: Profiler = Depends(profiles_access)):
+    meta = profiler.store.get(profile_id)
+    if meta is None: raise HTTPException(status_code=404, detail="Profile not found")
+    return meta
+
+@app.get("/profiles/{profile_id}/download")
+def download_profile(profile_id: str, profiler: Profiler = Depends(profiles_access)):
+    path = profiler.store.path(profile_id)
+    if path is None: raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
 
 if __name__ == "__main__":
     import uvicorn
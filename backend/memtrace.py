@@ -0,0 +1,80 @@
+import contextvars
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+# tracemalloc slows every thread while a trace runs, so the memory diagnostic endpoint is
+# served only where it has been switched on; benchmark.py calls memory_report() directly
+MEMORY_DIAGNOSTICS = os.getenv("PDE_MEMORY_DIAGNOSTICS", "0") == "1"
+
+def get_memory_diagnostics() -> bool:
+    return MEMORY_DIAGNOSTICS
+
+@dataclass
+class MemoryTrace:
+    """Per-stage allocation figures collected inside one trace_memory() scope."""
+    stages: List[Dict[str, Any]] = field(default_factory=list)
+    # Highest traced memory above the level when tracing began
+    peak_bytes: int = 0
+    base: int = 0
+
+    def stage_map(self) -> Dict[str, Dict[str, Any]]:
+        return {s["stage"]: s for s in self.stages}
+
+_current: contextvars.ContextVar[Optional[MemoryTrace]] = contextvars.ContextVar("memory_trace", default=None)
+# tracemalloc is process-wide; overlapping traces would reset each other's peaks
+_lock = threading.Lock()
+
+@contextmanager
+def trace_memory() -> Iterator[MemoryTrace]:
+    """Trace allocations for stage() blocks run in this context. Starts tracemalloc if needed."""
+    with _lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        trace = MemoryTrace()
+        token = _current.set(trace)
+        trace.base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            yield trace
+        finally:
+            trace.peak_bytes = max(trace.peak_bytes, tracemalloc.get_traced_memory()[1] - trace.base)
+            _current.reset(token)
+            if started:
+                tracemalloc.stop()
+
+class stage:
+    """
+    Marks a pipeline stage. Outside trace_memory() this is a context-variable lookup;
+    inside it, records the stage's peak and retained allocation and wall time.
+    """
+    __slots__ = ("name", "trace", "before", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = _current.get()
+        if self.trace is not None:
+            self.before, peak = tracemalloc.get_traced_memory()
+            self.trace.peak_bytes = max(self.trace.peak_bytes, peak - self.trace.base)
+            tracemalloc.reset_peak()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            self.trace.peak_bytes = max(self.trace.peak_bytes, peak - self.trace.base)
+            self.trace.stages.append({
+                "stage": self.name,
+                "peak_bytes": peak - self.before,
+                "retained_bytes": current - self.before,
+                "ms": round((time.perf_counter() - self.start) * 1000, 2),
+            })
+        return False
@@ -1,22 +1,184 @@
+import bisect
+import fcntl
+import mmap
+import os
+import weakref
 from threading import Lock
-from typing import Dict
+from typing import Any, Dict, List, Optional
+
+COUNTERS = [
+    "cpm_runs",
+    "tasks_scored",
+    "risk_evaluations",
+    "events_ingested",
+    "ingest_flushes",
+    "snapshot_refreshes",
+    "ai_cache_hits",
+    "ai_cache_misses",
+    "ai_batches",
+    "n_plus_one_requests",
+    "graph_cache_hits",
+    "graph_cache_misses",
+]
+
+# Upper bucket bounds; values above the last bound land in a final overflow bucket
+HISTOGRAMS = {
+    "sql_statements_per_request": [1, 2, 5, 10, 20, 50, 100, 500],
+    "sql_ms_per_request": [1, 5, 10, 25, 50, 100, 250, 1000],
+}
+
+METRICS_FILE = os.getenv("PDE_METRICS_FILE")
+METRICS_SLOTS = int(os.getenv("PDE_METRICS_SLOTS", "64"))
+
+# Linux upper bound on pids; larger cell values cannot be slot owners
+_PID_MAX = 1 << 22
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _owners(fd: int, slots: int, slot_cells: int) -> List[int]:
+    """
+    Live pids in a metrics file written with a different layout: the same slot count with
+    a different set of metrics, or the same metrics with a different slot count.
+    """
+    data = os.pread(fd, os.fstat(fd).st_size, 0)
+    cells = memoryview(data[:len(data) - len(data) % 8]).cast("q")
+    layouts = []
+    if not cells:
+        return []
+    if len(cells) % slots == 0:
+        layouts.append((slots, len(cells) // slots))
+    if len(cells) % slot_cells == 0:
+        layouts.append((len(cells) // slot_cells, slot_cells))
+    pids = {cells[s * width] for count, width in layouts for s in range(count)}
+    return sorted(pid for pid in pids if 0 < pid <= _PID_MAX and pid != os.getpid() and _alive(pid))
 
 class MetricsTracker:
-    def __init__(self):
-        self._metrics = {
-            "cpm_runs": 0,
-            "tasks_scored": 0,
-            "risk_evaluations": 0
-        }
+    """
+    Counters and histograms stored as 8-byte cells. Each process writes only its own slot,
+    under a process-local lock, and readers sum every slot.
+
+    Without `path` there is a single in-memory slot. With `path`, slots live in a shared
+    memory-mapped file, so all uvicorn workers report the same totals. A process claims a
+    slot on first use, under a file lock. It takes a free slot, or the slot of a dead
+    process, keeping that slot's counts. The file is zeroed when no slot belongs to a live
+    process, which happens on a fresh start. A file sized for another layout (a deploy
+    that changed the metrics or PDE_METRICS_SLOTS) is only reset once its owners are gone;
+    while they run, attaching raises RuntimeError.
+
+    Slot layout: [pid, counters..., per histogram: bucket counts..., count, sum (float64)].
+    """
+    def __init__(self, path: Optional[str] = None, slots: int = METRICS_SLOTS):
+        self._path = path
+        self._slots = slots if path else 1
+        self._counter_index = {name: 1 + i for i, name in enumerate(COUNTERS)}
+        self._histogram_index = {}
+        cell = 1 + len(COUNTERS)
+        for name, bounds in HISTOGRAMS.items():
+            self._histogram_index[name] = cell
+            cell += len(bounds) + 3
+        self._slot_cells = cell
         self._lock = Lock()
+        self._cells = None
+        self._floats = None
+        self._base = 0
+        # A forked child must not keep writing into its parent's slot
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() and ref()._detach())
+
+    def _detach(self):
+        self._lock = Lock()
+        self._cells = None
+
+    def _attach(self):
+        if self._path is None:
+            buffer = bytearray(self._slot_cells * 8)
+            self._base = 0
+        else:
+            size = self._slots * self._slot_cells * 8
+            fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_size != size:
+                    owners = _owners(fd, self._slots, self._slot_cells)
+                    if owners:
+                        raise RuntimeError(
+                            f"{self._path} holds metrics in another layout for running processes {owners}; "
+                            "stop them or point PDE_METRICS_FILE at a new file"
+                        )
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                buffer = mmap.mmap(fd, size)
+                cells = memoryview(buffer).cast("q")
+                pids = [cells[s * self._slot_cells] for s in range(self._slots)]
+                if not any(pid and _alive(pid) for pid in pids):
+                    buffer[:] = bytes(size)
+                    pids = [0] * self._slots
+                free = [s for s, pid in enumerate(pids) if pid == 0] or [s for s, pid in enumerate(pids) if not _alive(pid)]
+                if not free:
+                    raise RuntimeError(f"All {self._slots} metrics slots in {self._path} are in use")
+                self._base = free[0] * self._slot_cells
+                cells[self._base] = os.getpid()
+                cells.release()
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+        self._floats = memoryview(buffer).cast("d")
+        self._cells = memoryview(buffer).cast("q")
+        if self._path is None:
+            self._cells[0] = os.getpid()
 
     def increment(self, metric_name: str, amount: int = 1):
+        index = self._counter_index.get(metric_name)
+        if index is None:
+            return
         with self._lock:
-            if metric_name in self._metrics:
-                self._metrics[metric_name] += amount
+            if self._cells is None:
+                self._attach()
+            self._cells[self._base + index] += amount
 
-    def get_metrics(self) -> Dict[str, int]:
+    def observe(self, histogram_name: str, value: float):
+        start = self._histogram_index.get(histogram_name)
+        if start is None:
+            return
+        bounds = HISTOGRAMS[histogram_name]
         with self._lock:
-            return self._metrics.copy()
+            if self._cells is None:
+                self._attach()
+            cell = self._base + start
+            self._cells[cell + bisect.bisect_left(bounds, value)] += 1
+            self._cells[cell + len(bounds) + 1] += 1
+            self._floats[cell + len(bounds) + 2] += value
+
+    def _occupied(self) -> List[int]:
+        if self._cells is None:
+            with self._lock:
+                if self._cells is None:
+                    self._attach()
+        return [s * self._slot_cells for s in range(self._slots) if self._cells[s * self._slot_cells]]
+
+    def get_metrics(self) -> Dict[str, int]:
+        bases = self._occupied()
+        return {name: sum(self._cells[b + i] for b in bases) for name, i in self._counter_index.items()}
+
+    def get_histograms(self) -> Dict[str, Dict[str, Any]]:
+        bases = self._occupied()
+        result = {}
+        for name, start in self._histogram_index.items():
+            bounds = HISTOGRAMS[name]
+            n = len(bounds)
+            result[name] = {
+                "bounds": bounds,
+                "counts": [sum(self._cells[b + start + k] for b in bases) for k in range(n + 1)],
+                "count": sum(self._cells[b + start + n + 1] for b in bases),
+                "sum": sum(self._floats[b + start + n + 2] for b in bases),
+            }
+        return result
 
-metrics = MetricsTracker()
+metrics = MetricsTracker(METRICS_FILE)
@@ -0,0 +1,25 @@
+from sqlmodel import Session, SQLModel, select
+from database import engine
+from models import Project, DailyRollup, ProjectVelocity
+from rollups import rebuild_project_rollup
+from velocity import rebuild_project_velocity
+
+def migrate():
+    print("Starting Phase 4 migration...")
+    
+    # Create DailyRollup and ProjectVelocity tables
+    SQLModel.metadata.create_all(engine, tables=[DailyRollup.__table__, ProjectVelocity.__table__])
+    
+    # Backfill rollups and velocity models from existing logs and completed tasks
+    with Session(engine) as session:
+        project_ids = session.exec(select(Project.id)).all()
+        for project_id in project_ids:
+            rebuild_project_rollup(session, project_id)
+            rebuild_project_velocity(session, project_id)
+        session.commit()
+        print(f"Rebuilt rollups for {len(project_ids)} projects.")
+    
+    print("Phase 4 migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,29 @@
+from sqlmodel import Session, SQLModel, select
+from database import engine
+from models import Project, ChangeEvent, HistorySnapshot
+from history import write_snapshot
+from migrate_phase7 import add_pert_columns
+
+def migrate():
+    print("Starting Phase 5 migration...")
+    
+    # Create ChangeEvent and HistorySnapshot tables
+    SQLModel.metadata.create_all(engine, tables=[ChangeEvent.__table__, HistorySnapshot.__table__])
+    
+    # Snapshots store full task rows, so the task table needs every column the model
+    # declares; on a database from before phase 7 add them now (phase 7 is then a no-op)
+    with engine.begin() as conn:
+        add_pert_columns(conn.connection.cursor())
+    
+    # Baseline snapshot per project; history before this point is not available
+    with Session(engine) as session:
+        project_ids = session.exec(select(Project.id)).all()
+        for project_id in project_ids:
+            write_snapshot(session.connection(), project_id)
+        session.commit()
+        print(f"Wrote baseline snapshots for {len(project_ids)} projects.")
+    
+    print("Phase 5 migration complete!")
+
+if __name__ == "__main__":
+    migrate()
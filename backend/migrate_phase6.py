@@ -0,0 +1,18 @@
+from sqlmodel import Session
+from database import engine
+from search import install_search_index, rebuild_search_index
+
+def migrate():
+    print("Starting Phase 6 migration...")
+    
+    # Create the FTS5 search index and its triggers, then index existing rows
+    with Session(engine) as session:
+        conn = session.connection()
+        install_search_index(conn)
+        rebuild_search_index(conn)
+        session.commit()
+    
+    print("Phase 6 migration complete!")
+
+if __name__ == "__main__":
+    migrate()
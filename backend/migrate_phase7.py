@@ -0,0 +1,33 @@
+"""
+Phase 7: PERT three-point estimate columns on task.
+
+The Task model declares these columns, so anything that reads full task rows needs them
+first. migrate_phase5 (history snapshots) is the earliest such phase and calls
+add_pert_columns() itself, so running phases 2-7 in numeric order works on an older
+database; this phase is then a no-op.
+"""
+import sqlite3
+
+def add_pert_columns(cursor):
+    """Add the optional PERT estimate columns to task; columns already present are left alone."""
+    for column in ("optimistic_hours", "most_likely_hours", "pessimistic_hours"):
+        try:
+            cursor.execute(f"ALTER TABLE task ADD COLUMN {column} FLOAT")
+            print(f"Added task.{column}.")
+        except sqlite3.OperationalError:
+            print(f"task.{column} already exists.")
+
+def migrate():
+    conn = sqlite3.connect('discipline.db')
+    cursor = conn.cursor()
+    
+    print("Starting Phase 7 migration...")
+    
+    add_pert_columns(cursor)
+    
+    conn.commit()
+    conn.close()
+    print("Phase 7 migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -1,6 +1,13 @@
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional, List
-from sqlmodel import Field, SQLModel, Relationship
+from pydantic import model_validator
+from sqlmodel import Field, SQLModel, Relationship, UniqueConstraint
+
+def check_three_point(optimistic: Optional[float], most_likely: Optional[float], pessimistic: Optional[float]):
+    """Raise ValueError unless the given PERT estimates are ordered optimistic <= most likely <= pessimistic."""
+    given = [h for h in (optimistic, most_likely, pessimistic) if h is not None]
+    if given != sorted(given):
+        raise ValueError("PERT estimates must satisfy optimistic_hours <= most_likely_hours <= pessimistic_hours")
 
 class ProjectBase(SQLModel):
     title: str
@@ -43,6 +50,67 @@ class BehaviorLog(SQLModel, table=True):
 
     project: Project = Relationship(back_populates="behavior_logs")
 
+class BehaviorEvent(SQLModel):
+    """Inbound BehaviorLog event; project_id comes from the URL."""
+    task_id: Optional[int] = None
+    action_type: str = "completion"
+    timestamp: Optional[datetime] = None
+    duration_minutes: Optional[int] = Field(default=None, ge=0)
+
+class TaskPatch(SQLModel):
+    """Fields a batch may change on one task; unset fields are left alone."""
+    id: int
+    status: Optional[bool] = None
+    completed_at: Optional[datetime] = None
+    estimated_hours: Optional[float] = Field(default=None, gt=0)
+    milestone_id: Optional[int] = None
+    optimistic_hours: Optional[float] = Field(default=None, gt=0)
+    most_likely_hours: Optional[float] = Field(default=None, gt=0)
+    pessimistic_hours: Optional[float] = Field(default=None, gt=0)
+
+    @model_validator(mode="after")
+    def _ordered_estimates(self):
+        check_three_point(self.optimistic_hours, self.most_likely_hours, self.pessimistic_hours)
+        return self
+
+class MilestonePatch(SQLModel):
+    id: int
+    status: Optional[bool] = None
+    target_date: Optional[datetime] = None
+    weight: Optional[int] = Field(default=None, ge=1, le=5)
+
+class DependencyChange(SQLModel):
+    task_id: int
+    depends_on_id: int
+    remove: bool = False
+
+class ProjectBatch(SQLModel):
+    """Task, milestone and dependency changes applied to one project in a single transaction."""
+    tasks: List[TaskPatch] = []
+    milestones: List[MilestonePatch] = []
+    dependencies: List[DependencyChange] = []
+
+class DailyRollup(SQLModel, table=True):
+    """Per-project, per-day activity totals, maintained incrementally from BehaviorLog."""
+    __table_args__ = (UniqueConstraint("project_id", "day"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="project.id")
+    day: date
+    completions: int = 0
+    work_minutes: int = 0
+
+class ProjectVelocity(SQLModel, table=True):
+    """Exponentially weighted work rate per project; see velocity.py."""
+    project_id: int = Field(foreign_key="project.id", primary_key=True)
+    hours_per_day: Optional[float] = None
+    tasks_per_day: Optional[float] = None
+    settled_days: int = 0
+    # Totals of the most recent day, folded into the averages once a later day starts
+    open_day: Optional[date] = None
+    open_minutes: int = 0
+    open_completions: int = 0
+
 class TaskBase(SQLModel):
     title: str
     description: Optional[str] = None
@@ -54,6 +122,15 @@ class TaskBase(SQLModel):
     status: bool = Field(default=False)
     project_id: int = Field(foreign_key="project.id")
     milestone_id: Optional[int] = Field(default=None, foreign_key="milestone.id")
+    # Optional PERT three-point estimate; used instead of estimated_hours when all three are set
+    optimistic_hours: Optional[float] = Field(default=None, gt=0)
+    most_likely_hours: Optional[float] = Field(default=None, gt=0)
+    pessimistic_hours: Optional[float] = Field(default=None, gt=0)
+
+    @model_validator(mode="after")
+    def _ordered_estimates(self):
+        check_three_point(self.optimistic_hours, self.most_likely_hours, self.pessimistic_hours)
+        return self
 
 class TaskDependency(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -83,10 +160,46 @@ class ProjectForecast(SQLModel, table=True):
     risk_trend: str # increasing, decreasing, stable
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+class AICacheEntry(SQLModel, table=True):
+    """On-disk tier of the AI result cache; see ai_cache.py."""
+    key: str = Field(primary_key=True)
+    kind: str
+    payload: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
+class ChangeEvent(SQLModel, table=True):
+    """Append-only log of Task, Milestone and TaskDependency mutations; see history.py."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="project.id", index=True)
+    entity: str # task, milestone, dependency
+    entity_id: int
+    op: str # upsert, delete
+    payload: Optional[str] = None # JSON row state after the change
+    timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class HistorySnapshot(SQLModel, table=True):
+    """Full task/milestone/dependency state of a project as of a ChangeEvent id."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="project.id", index=True)
+    event_id: int
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    payload: str
+
 class ProjectRead(ProjectBase):
     id: int
     created_at: datetime
 
+class ProjectSummary(ProjectRead):
+    """Project list entry: task aggregates and risk computed in SQL, without loading tasks."""
+    total_tasks: int = 0
+    completed_tasks: int = 0
+    completion_percentage: float = 0
+    remaining_hours: float = 0
+    last_completed_at: Optional[datetime] = None
+    risk_level: str = "Low"
+    risk_score: int = 0
+
 class MilestoneRead(MilestoneBase):
     id: int
     created_at: datetime
@@ -113,3 +226,6 @@ class ProjectDetail(ProjectRead):
     forecast_completion: Optional[datetime] = None
     delay_prob: float = 0
     bottlenecks: List[dict] = []
+    milestone_rollups: List[dict] = []
+    deadline_risks: List[dict] = []
+    pert_forecast: Optional[dict] = None
@@ -0,0 +1,257 @@
+import collections
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+from models import Project, Task, TaskDependency
+from records import TaskRecord, load_task_records
+from logic import load_dependencies
+from graph_engine import GraphEngine
+from graph_cache import graph_version
+from logger import logger
+
+@dataclass
+class ProjectCondensation:
+    """
+    A project reduced to what the portfolio schedule needs: its standalone duration and
+    the longest internal paths touching its boundary tasks. Entries are tasks that depend
+    on another project's task; exits are tasks another project depends on.
+    """
+    project_id: int
+    duration: float
+    entries: List[int]
+    exits: List[int]
+    # exit -> longest internal path ending at it, from project start
+    head: Dict[int, float] = field(default_factory=dict)
+    # entry -> longest internal path starting at it (inclusive) to project end
+    tail: Dict[int, float] = field(default_factory=dict)
+    # (entry, exit) -> longest internal path from entry to exit, both inclusive
+    span: Dict[Tuple[int, int], float] = field(default_factory=dict)
+
+def condense_project(project_id: int, tasks: List[TaskRecord], dependencies: List[Tuple[int, int]], entries: Set[int], exits: Set[int]) -> ProjectCondensation:
+    """One CPM pass plus one forward sweep per entry task: O(entries * (V + E))."""
+    cpm = GraphEngine._cpm_passes(tasks, dependencies)
+    order, adj, ef, lf = cpm["order"], cpm["adj"], cpm["ef"], cpm["lf"]
+    total = cpm["total_duration"]
+    duration = {t.id: t.estimated_hours for t in tasks}
+    pos = {tid: i for i, tid in enumerate(order)}
+
+    condensed = ProjectCondensation(project_id=project_id, duration=total, entries=sorted(entries), exits=sorted(exits))
+    for x in condensed.exits:
+        condensed.head[x] = ef[x]
+    for e in condensed.entries:
+        condensed.tail[e] = total - lf[e] + duration[e]
+        # Longest path from e to everything after it in topological order
+        dist = {e: duration[e]}
+        for tid in order[pos[e]:]:
+            if tid not in dist:
+                continue
+            for v in adj[tid]:
+                candidate = dist[tid] + duration[v]
+                if candidate > dist.get(v, -1.0):
+                    dist[v] = candidate
+        for x in condensed.exits:
+            if x in dist:
+                condensed.span[(e, x)] = dist[x]
+    return condensed
+
+def schedule_condensed(condensations: Dict[int, ProjectCondensation], cross_edges: List[Tuple[int, int]], task_project: Dict[int, int]) -> Dict[str, Any]:
+    """
+    Longest-path schedule over the condensed graph. Nodes are boundary tasks; internal
+    edges carry span lengths, cross-project edges (task_id, depends_on_id) carry none.
+    Returns start times of entries, finish times of exits and each project's finish,
+    along with the predecessor that set each value so the critical chain can be traced.
+    """
+    succ = collections.defaultdict(list)
+    in_degree = collections.defaultdict(int)
+    nodes: Set[int] = set()
+    for c in condensations.values():
+        nodes.update(c.entries)
+        nodes.update(c.exits)
+        for (e, x) in c.span:
+            # A task that is both entry and exit is handled when it is popped
+            if e != x:
+                succ[e].append(x)
+                in_degree[x] += 1
+    for task_id, depends_on_id in cross_edges:
+        succ[depends_on_id].append(task_id)
+        in_degree[task_id] += 1
+
+    start: Dict[int, float] = {}
+    finish: Dict[int, float] = {}
+    start_via: Dict[int, int] = {}   # entry -> exit (other project) it waits for
+    finish_via: Dict[int, int] = {}  # exit -> entry (same project) its longest path comes from
+    for c in condensations.values():
+        for x in c.exits:
+            finish[x] = c.head[x]
+        for e in c.entries:
+            start[e] = 0.0
+
+    queue = collections.deque(n for n in nodes if in_degree[n] == 0)
+    seen = 0
+    while queue:
+        u = queue.popleft()
+        seen += 1
+        project = condensations[task_project[u]]
+        if (u, u) in project.span and start[u] + project.span[(u, u)] > finish[u]:
+            finish[u] = start[u] + project.span[(u, u)]
+            finish_via[u] = u
+        for v in succ[u]:
+            if task_project[v] == task_project[u]:
+                candidate = start[u] + project.span[(u, v)]
+                if candidate > finish[v]:
+                    finish[v] = candidate
+                    finish_via[v] = u
+            elif finish[u] > start[v]:
+                start[v] = finish[u]
+                start_via[v] = u
+            in_degree[v] -= 1
+            if in_degree[v] == 0:
+                queue.append(v)
+    if seen != len(nodes):
+        raise ValueError("Cross-project dependencies form a cycle")
+
+    project_finish = {}
+    project_via = {}
+    for pid, c in condensations.items():
+        best, best_entry = c.duration, None
+        for e in c.entries:
+            if start[e] + c.tail[e] > best:
+                best, best_entry = start[e] + c.tail[e], e
+        project_finish[pid] = best
+        project_via[pid] = best_entry
+    return {
+        "start": start,
+        "finish": finish,
+        "start_via": start_via,
+        "finish_via": finish_via,
+        "project_finish": project_finish,
+        "project_via": project_via,
+    }
+
+class PortfolioPlanner:
+    """
+    Portfolio-level CPM over condensed projects. Condensations are cached per project and
+    reused while the project's data version and boundary tasks are unchanged, so a request
+    only reloads projects that changed since the last one. `version_of(session, project_id)`
+    must be shared across processes (graph_version), or another worker's writes go unseen.
+    """
+    def __init__(self, version_of: Callable[[Session, int], int]):
+        self._version_of = version_of
+        self._lock = threading.Lock()
+        self._cache: Dict[int, Tuple[Any, ProjectCondensation]] = {}
+
+    def schedule(self, session: Session, project_ids: Optional[List[int]] = None, expand: Optional[List[int]] = None) -> Dict[str, Any]:
+        start_time = time.time()
+        if project_ids is None:
+            project_ids = list(session.exec(select(Project.id)).all())
+        wanted = set(project_ids)
+        cross_edges, task_project = load_cross_edges(session)
+        cross_edges = [(a, b) for a, b in cross_edges if task_project[a] in wanted and task_project[b] in wanted]
+
+        entries = collections.defaultdict(set)
+        exits = collections.defaultdict(set)
+        for task_id, depends_on_id in cross_edges:
+            entries[task_project[task_id]].add(task_id)
+            exits[task_project[depends_on_id]].add(depends_on_id)
+
+        condensations = {pid: self._condensation(session, pid, entries[pid], exits[pid]) for pid in project_ids}
+        result = schedule_condensed(condensations, cross_edges, task_project)
+        project_finish = result["project_finish"]
+        total = max(project_finish.values()) if project_finish else 0.0
+
+        response = {
+            "total_duration": total,
+            "critical_chain": self._trace(result, task_project),
+            "projects": [
+                {
+                    "project_id": pid,
+                    "standalone_duration": c.duration,
+                    "finish": project_finish[pid],
+                    "delay_from_dependencies": round(project_finish[pid] - c.duration, 4),
+                    "entries": c.entries,
+                    "exits": c.exits,
+                }
+                for pid, c in condensations.items()
+            ],
+            "expanded": {},
+        }
+        for pid in expand or []:
+            if pid in condensations:
+                response["expanded"][pid] = self.expand(session, pid, {e: result["start"][e] for e in condensations[pid].entries})
+
+        execution_time = (time.time() - start_time) * 1000
+        logger.info(f"Portfolio CPM: projects={len(project_ids)}, cross_edges={len(cross_edges)}, duration={total:.1f}h, time={execution_time:.2f}ms")
+        return response
+
+    @staticmethod
+    def expand(session: Session, project_id: int, release: Dict[int, float]) -> List[Dict[str, Any]]:
+        """Per-task schedule of one project, with entry tasks held back until their cross-project predecessors finish."""
+        tasks = load_task_records(session, project_id, pending_only=True)
+        dependencies = load_dependencies(session, [t.id for t in tasks])
+        cpm = GraphEngine._cpm_passes(tasks, dependencies, release=release)
+        return [
+            {"task_id": tid, "es": cpm["es"][tid], "ef": cpm["ef"][tid], "slack": round(cpm["ls"][tid] - cpm["es"][tid], 4)}
+            for tid in cpm["order"]
+        ]
+
+    def invalidate(self, project_id: int):
+        with self._lock:
+            self._cache.pop(project_id, None)
+
+    def _condensation(self, session: Session, project_id: int, entries: Set[int], exits: Set[int]) -> ProjectCondensation:
+        key = (self._version_of(session, project_id), frozenset(entries), frozenset(exits))
+        with self._lock:
+            cached = self._cache.get(project_id)
+        if cached and cached[0] == key:
+            return cached[1]
+        tasks = load_task_records(session, project_id, pending_only=True)
+        dependencies = load_dependencies(session, [t.id for t in tasks])
+        condensed = condense_project(project_id, tasks, dependencies, entries, exits)
+        with self._lock:
+            self._cache[project_id] = (key, condensed)
+        return condensed
+
+    @staticmethod
+    def _trace(result: Dict[str, Any], task_project: Dict[int, int]) -> List[Dict[str, Any]]:
+        """
+        Projects on the portfolio's critical chain, earliest first. Each step names the task
+        the chain enters the project through and the task it leaves by (None at the ends).
+        """
+        project_finish = result["project_finish"]
+        if not project_finish:
+            return []
+        pid = max(project_finish, key=project_finish.get)
+        entry = result["project_via"][pid]
+        chain = [{"project_id": pid, "entry": entry, "exit": None}]
+        while entry is not None and entry in result["start_via"]:
+            exit_task = result["start_via"][entry]
+            entry = result["finish_via"].get(exit_task)
+            chain.append({"project_id": task_project[exit_task], "entry": entry, "exit": exit_task})
+        chain.reverse()
+        return chain
+
+def load_cross_edges(session: Session) -> Tuple[List[Tuple[int, int]], Dict[int, int]]:
+    """Dependencies between pending tasks of different projects, plus the project of each endpoint."""
+    dependent = aliased(Task)
+    prerequisite = aliased(Task)
+    rows = session.exec(
+        select(TaskDependency.task_id, dependent.project_id, TaskDependency.depends_on_id, prerequisite.project_id)
+        .join(dependent, dependent.id == TaskDependency.task_id)
+        .join(prerequisite, prerequisite.id == TaskDependency.depends_on_id)
+        .where(dependent.project_id != prerequisite.project_id, dependent.status == False, prerequisite.status == False)
+    ).all()
+    edges = []
+    task_project = {}
+    for task_id, task_pid, depends_on_id, depends_pid in rows:
+        edges.append((task_id, depends_on_id))
+        task_project[task_id] = task_pid
+        task_project[depends_on_id] = depends_pid
+    return edges, task_project
+
+planner = PortfolioPlanner(graph_version)
+
+def get_planner() -> PortfolioPlanner:
+    return planner
@@ -0,0 +1,234 @@
+import collections
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from logger import logger, LOG_DIR
+
+# Off by default: no request is profiled and the /profiles routes answer 404
+PROFILING = os.getenv("PDE_PROFILING", "0") == "1"
+PROFILE_DIR = os.getenv("PDE_PROFILE_DIR", os.path.join(os.path.dirname(LOG_DIR), "profiles"))
+PROFILE_KEEP = int(os.getenv("PDE_PROFILE_KEEP", "50"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PDE_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PDE_PROFILE_INTERVAL", "0.001"))
+# When set, the X-Profile header must carry this value; otherwise any non-empty value works
+PROFILE_TOKEN = os.getenv("PDE_PROFILE_TOKEN")
+PROFILE_HEADER = b"x-profile"
+
+_PROFILE_ID = re.compile(r"^[0-9]+-[0-9]+$")
+# Leaf frames of threads parked waiting for work; their samples are not request time
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "base_events.py")
+# Long-lived background threads; their work never belongs to a request
+_BACKGROUND_THREADS = {"stack-sampler", "recompute-worker", "behavior-ingestor"}
+
+class StackSampler:
+    """
+    Samples the stacks of every thread at a fixed interval while running. Sync endpoints
+    execute on thread-pool workers, so per-thread profilers on the event loop would miss
+    them; wall-clock sampling sees the loop and the workers alike.
+
+    Which worker runs a request is not known up front, so only the app's own background
+    threads are left out: requests served concurrently land in the same profile. The
+    middleware records how many there were in the profile's `concurrent_requests`.
+    """
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Dict[str, int] = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            background = {t.ident for t in threading.enumerate() if t.name in _BACKGROUND_THREADS}
+            for ident, frame in sys._current_frames().items():
+                if ident in background or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    # co_qualname is new in 3.11
+                    name = getattr(code, "co_qualname", code.co_name)
+                    names.append(f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+
+    def summary(self, top: int = 20) -> Dict[str, List[List[Any]]]:
+        """Most frequent functions by self samples (leaf) and inclusive samples."""
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self.stacks.items():
+            names = stack.split(";")
+            own[names[-1]] += count
+            for name in set(names):
+                total[name] += count
+        return {
+            "self": [[name, count] for name, count in own.most_common(top)],
+            "total": [[name, count] for name, count in total.most_common(top)],
+        }
+
+class ProfileStore:
+    """Bounded on-disk ring of profiles: <id>.folded (flame graph input) plus <id>.json metadata."""
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def new_id(self) -> str:
+        with self._lock:
+            self._seq += 1
+            return f"{int(time.time() * 1000)}-{self._seq}"
+
+    def save(self, profile_id: str, meta: Dict[str, Any], sampler: StackSampler):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{profile_id}.folded"), "w") as f:
+            for stack, count in sorted(sampler.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        meta = dict(meta, id=profile_id, samples=sampler.samples, interval=sampler.interval, top=sampler.summary())
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump(meta, f)
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            ids = self._ids()
+            for profile_id in ids[:-self.keep] if self.keep else ids:
+                for ext in (".json", ".folded"):
+                    try:
+                        os.remove(os.path.join(self.directory, profile_id + ext))
+                    except FileNotFoundError:
+                        pass
+
+    def _ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        ids = [name[:-5] for name in os.listdir(self.directory) if name.endswith(".json")]
+        return sorted(ids, key=lambda i: tuple(int(p) for p in i.split("-")))
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of stored profiles, newest first, without the function summaries."""
+        items = []
+        for profile_id in reversed(self._ids()):
+            meta = self.get(profile_id)
+            if meta:
+                meta.pop("top", None)
+                items.append(meta)
+        return items
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        path = self.path(profile_id, ".json")
+        if path is None:
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def path(self, profile_id: str, ext: str = ".folded") -> Optional[str]:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, profile_id + ext)
+        return path if os.path.exists(path) else None
+
+class Profiler:
+    """Decides which requests to profile and runs one profile at a time."""
+    def __init__(self, store: ProfileStore, sample_rate: float = PROFILE_SAMPLE_RATE, interval: float = PROFILE_INTERVAL, token: Optional[str] = PROFILE_TOKEN, enabled: bool = PROFILING):
+        self.store = store
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.token = token
+        # Samples cover every thread, so overlapping profiles would count each other's work
+        self.busy = threading.Lock()
+        # Requests in flight, and the most seen while the current profile runs
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def trigger(self, scope) -> Optional[str]:
+        if not self.enabled or scope["path"].startswith("/profiles"):
+            return None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                if value and (self.token is None or value.decode() == self.token):
+                    return "header"
+                break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+class ProfilingMiddleware:
+    """ASGI middleware; requests not chosen by the profiler pass straight through."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profiler = get_profiler()
+        if not profiler.enabled:
+            return await self.app(scope, receive, send)
+        profiler.in_flight += 1
+        profiler.peak_in_flight = max(profiler.peak_in_flight, profiler.in_flight)
+        try:
+            await self._dispatch(profiler, scope, receive, send)
+        finally:
+            profiler.in_flight -= 1
+
+    async def _dispatch(self, profiler: Profiler, scope, receive, send):
+        trigger = profiler.trigger(scope)
+        if trigger is None or not profiler.busy.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+        profiler.peak_in_flight = profiler.in_flight
+
+        profile_id = profiler.store.new_id()
+        status = {}
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(profiler.interval)
+        started_at = time.time()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            duration_ms = (time.perf_counter() - start) * 1000
+            profiler.busy.release()
+            meta = {
+                "timestamp": started_at,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode(),
+                "status": status.get("code"),
+                "duration_ms": round(duration_ms, 2),
+                "trigger": trigger,
+                # Other requests whose samples may be mixed into this profile
+                "concurrent_requests": profiler.peak_in_flight - 1,
+            }
+            try:
+                # File writes and pruning stay off the event loop
+                await run_in_threadpool(profiler.store.save, profile_id, meta, sampler)
+                logger.info(f"Profile: id={profile_id}, {meta['method']} {meta['path']}, samples={sampler.samples}, time={duration_ms:.2f}ms")
+            except OSError as e:
+                logger.warning(f"Profile {profile_id} not saved: {e}")
+
+profiler = Profiler(ProfileStore())
+
+def get_profiler() -> Profiler:
+    return profiler
@@ -0,0 +1,107 @@
+import collections
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel
+from logger import logger
+from metrics import metrics
+
+# A request that runs one statement this many times is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("PDE_N_PLUS_ONE_THRESHOLD", "10"))
+# With a task count noted, a request is reported once its statements outgrow a fixed
+# budget plus this many per task; batched loads stay flat however many tasks there are
+N_PLUS_ONE_BASE = int(os.getenv("PDE_N_PLUS_ONE_BASE", "20"))
+N_PLUS_ONE_PER_TASK = float(os.getenv("PDE_N_PLUS_ONE_PER_TASK", "0.5"))
+
+@dataclass
+class QueryStats:
+    """SQL work done inside one track_queries() scope, usually one request."""
+    statements: int = 0
+    rows_affected: int = 0
+    objects_loaded: int = 0
+    sql_ms: float = 0.0
+    # Task count reported by the code under measurement, for N+1 reports
+    tasks: Optional[int] = None
+    by_statement: collections.Counter = field(default_factory=collections.Counter)
+
+    def top_statements(self, n: int = 5) -> List[Tuple[str, int]]:
+        return self.by_statement.most_common(n)
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        return [(sql, count) for sql, count in self.by_statement.most_common() if count >= threshold]
+
+    def n_plus_one(self, base: int = N_PLUS_ONE_BASE, per_task: float = N_PLUS_ONE_PER_TASK) -> bool:
+        """Whether statements scale with the noted task count; without one, whether any statement repeats."""
+        if self.tasks is None:
+            return bool(self.repeated())
+        return self.statements > base + per_task * self.tasks
+
+_current: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count statements in this context; copies of it (thread-pool calls) report into the same stats."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+def note_tasks(count: int):
+    """Record how many tasks the current request works on."""
+    stats = _current.get()
+    if stats is not None:
+        stats.tasks = count
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None or not conn.info.get("query_start"):
+        return
+    stats.sql_ms += (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    stats.statements += 1
+    stats.by_statement[statement] += 1
+    if cursor.rowcount > 0:
+        stats.rows_affected += cursor.rowcount
+
+@event.listens_for(SQLModel, "load", propagate=True)
+def _on_load(target, context):
+    stats = _current.get()
+    if stats is not None:
+        stats.objects_loaded += 1
+
+class QueryStatsMiddleware:
+    """Per-request SQL totals as X-SQL-* response headers and MetricsTracker histograms."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with track_queries() as stats:
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-sql-count", str(stats.statements).encode()),
+                        (b"x-sql-time-ms", f"{stats.sql_ms:.2f}".encode()),
+                        (b"x-sql-objects", str(stats.objects_loaded).encode()),
+                    ]
+                await send(message)
+            await self.app(scope, receive, send_with_stats)
+        metrics.observe("sql_statements_per_request", stats.statements)
+        metrics.observe("sql_ms_per_request", stats.sql_ms)
+        if stats.n_plus_one():
+            metrics.increment("n_plus_one_requests")
+            sql, count = stats.top_statements(1)[0]
+            logger.warning(f"Possible N+1: {scope['method']} {scope['path']}, tasks={stats.tasks}, statements={stats.statements}, repeated {count}x: {' '.join(sql.split())[:200]}")
@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Mapping, Optional
+from sqlmodel import Session, select
+from models import Task
+
+@dataclass(slots=True)
+class TaskRecord:
+    """
+    The task fields GraphEngine, ForecastingModule and scoring read, without ORM state.
+    Engines only use attribute access, so they accept either this or a Task.
+    """
+    id: int
+    estimated_hours: float
+    impact_score: int
+    effort_score: int
+    deadline: Optional[datetime]
+    status: bool
+    milestone_id: Optional[int]
+    completed_at: Optional[datetime]
+    optimistic_hours: Optional[float] = None
+    most_likely_hours: Optional[float] = None
+    pessimistic_hours: Optional[float] = None
+
+    @classmethod
+    def from_task(cls, task: Task) -> "TaskRecord":
+        return cls(
+            task.id, task.estimated_hours, task.impact_score, task.effort_score, task.deadline, task.status, task.milestone_id, task.completed_at,
+            task.optimistic_hours, task.most_likely_hours, task.pessimistic_hours,
+        )
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "TaskRecord":
+        # History payloads written before the PERT columns existed lack them
+        return cls(
+            row["id"], row["estimated_hours"], row["impact_score"], row["effort_score"], row["deadline"], row["status"], row["milestone_id"], row["completed_at"],
+            row.get("optimistic_hours"), row.get("most_likely_hours"), row.get("pessimistic_hours"),
+        )
+
+RECORD_COLUMNS = (
+    Task.id, Task.estimated_hours, Task.impact_score, Task.effort_score,
+    Task.deadline, Task.status, Task.milestone_id, Task.completed_at,
+    Task.optimistic_hours, Task.most_likely_hours, Task.pessimistic_hours,
+)
+
+def load_task_records(session: Session, project_id: int, pending_only: bool = False) -> List[TaskRecord]:
+    """Engine input for a project straight from SQL rows; no Task objects are created."""
+    stmt = select(*RECORD_COLUMNS).where(Task.project_id == project_id)
+    if pending_only:
+        stmt = stmt.where(Task.status == False)
+    return [TaskRecord(*row) for row in session.exec(stmt)]
+
+def load_task_rows(session: Session, project_id: int) -> List[Mapping[str, Any]]:
+    """All task columns as plain mappings, for building both records and TaskRead responses."""
+    return session.execute(select(Task.__table__).where(Task.project_id == project_id)).mappings().all()
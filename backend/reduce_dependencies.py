@@ -0,0 +1,55 @@
+"""
+Maintenance job: transitive reduction of every project's dependency graph.
+
+Reports how many TaskDependency rows are implied by other paths and can be dropped
+without changing any schedule. Dry run by default; --apply deletes them.
+
+    python reduce_dependencies.py
+    python reduce_dependencies.py --project 3 --apply
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+from sqlmodel import Session, select
+from database import engine
+from models import Project
+from reduction import reduce_dependencies
+import history  # records the deletes in the change log
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--project", type=int, action="append", help="project id, repeatable; all projects by default")
+    parser.add_argument("--apply", action="store_true", help="delete the redundant rows")
+    parser.add_argument("--json", action="store_true", help="print reports as JSON")
+    args = parser.parse_args(argv)
+
+    reports = []
+    failed = False
+    with Session(engine) as session:
+        project_ids = args.project or session.exec(select(Project.id).order_by(Project.id)).all()
+        for project_id in project_ids:
+            try:
+                report = reduce_dependencies(session, project_id, apply=args.apply)
+            except ValueError as e:
+                print(f"Project {project_id}: skipped - {e}", file=sys.stderr)
+                failed = True
+                continue
+            if args.apply:
+                session.commit()
+            reports.append(report)
+
+    if args.json:
+        print(json.dumps([{k: v for k, v in r.items() if k != "redundant"} for r in reports], indent=2))
+    else:
+        print(f"{'project':>8} {'tasks':>7} {'edges':>7} {'redundant':>10} {'saved':>7}")
+        for r in reports:
+            print(f"{r['project_id']:>8} {r['tasks']:>7} {r['edges']:>7} {r['redundant_edges']:>10} {r['savings_percentage']:>6.1f}%")
+        edges = sum(r["edges"] for r in reports)
+        redundant = sum(r["redundant_edges"] for r in reports)
+        verb = "Removed" if args.apply else "Would remove"
+        print(f"{verb} {redundant} of {edges} dependencies ({redundant / edges * 100 if edges else 0:.1f}%)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
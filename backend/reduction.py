@@ -0,0 +1,42 @@
+import time
+from typing import Any, Dict
+from sqlmodel import Session, select
+from models import TaskDependency
+from records import load_task_records
+from graph_engine import GraphEngine
+from logger import logger
+
+def reduce_dependencies(session: Session, project_id: int, apply: bool = False) -> Dict[str, Any]:
+    """
+    Find the project's redundant TaskDependency rows (see GraphEngine.redundant_dependencies)
+    and, with `apply`, delete them through the session without committing. Deletes go
+    through the ORM so they are recorded in the change history.
+
+    Only the pending subgraph is reduced. Pending views (load_pending_graph and the graph
+    cache) drop edges at completed tasks, so a shortcut implied only through a completed
+    task still carries an ordering those views need. Edges touching completed tasks are
+    never removed.
+    """
+    start_time = time.time()
+    tasks = load_task_records(session, project_id)
+    task_ids = [t.id for t in tasks]
+    rows = session.exec(select(TaskDependency).where(TaskDependency.task_id.in_(task_ids))).all() if task_ids else []
+    pending = [t for t in tasks if not t.status]
+    redundant = [rows[k] for k in GraphEngine.redundant_dependencies(pending, [(r.task_id, r.depends_on_id) for r in rows])]
+    if apply:
+        for row in redundant:
+            session.delete(row)
+
+    report = {
+        "project_id": project_id,
+        "tasks": len(tasks),
+        "edges": len(rows),
+        "redundant_edges": len(redundant),
+        "edges_after": len(rows) - len(redundant),
+        "savings_percentage": round(len(redundant) / len(rows) * 100, 2) if rows else 0,
+        "applied": apply,
+        "redundant": [{"id": r.id, "task_id": r.task_id, "depends_on_id": r.depends_on_id} for r in redundant],
+    }
+    execution_time = (time.time() - start_time) * 1000
+    logger.info(f"Reduction: project={project_id}, edges={len(rows)}, redundant={len(redundant)}, applied={apply}, time={execution_time:.2f}ms")
+    return report
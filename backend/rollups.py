@@ -0,0 +1,82 @@
+from datetime import date
+from typing import Dict, List, Iterable, Tuple, Union
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select, delete
+from models import Task, BehaviorLog, DailyRollup
+from logger import logger
+import velocity
+
+# (project_id, day) -> [completions, work_minutes]
+RollupDeltas = Dict[Tuple[int, date], List[int]]
+
+def log_deltas(logs: Iterable[BehaviorLog]) -> RollupDeltas:
+    """Aggregate BehaviorLog rows into rollup increments, one entry per (project, day)."""
+    deltas: RollupDeltas = {}
+    for log in logs:
+        key = (log.project_id, log.timestamp.date())
+        entry = deltas.setdefault(key, [0, 0])
+        if log.action_type == "completion":
+            entry[0] += 1
+        elif log.action_type == "work_session":
+            entry[1] += log.duration_minutes or 0
+    return deltas
+
+def apply_deltas(session: Union[Session, Connection], deltas: RollupDeltas):
+    """Upsert rollup increments on a session or connection. Does not commit; callers own the transaction."""
+    rows = [
+        {"project_id": project_id, "day": day, "completions": c, "work_minutes": m}
+        for (project_id, day), (c, m) in deltas.items()
+        if c or m
+    ]
+    if not rows:
+        return
+    stmt = insert(DailyRollup.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["project_id", "day"],
+        set_={
+            "completions": DailyRollup.__table__.c.completions + stmt.excluded.completions,
+            "work_minutes": DailyRollup.__table__.c.work_minutes + stmt.excluded.work_minutes,
+        },
+    )
+    session.execute(stmt, rows)
+
+def record_behavior_log(session: Session, log: BehaviorLog):
+    """Add a BehaviorLog row and fold it into the rollup and velocity model in the same transaction."""
+    record_behavior_logs(session, [log])
+
+def record_behavior_logs(session: Session, logs: List[BehaviorLog]):
+    """Bulk form of record_behavior_log: one rollup upsert and one velocity update for all rows."""
+    if not logs:
+        return
+    session.add_all(logs)
+    apply_deltas(session, log_deltas(logs))
+    velocity.apply_events(session, logs)
+
+def remove_behavior_logs(session: Session, logs: List[BehaviorLog]):
+    """Delete BehaviorLog rows and take them back out of the rollup and velocity model."""
+    if not logs:
+        return
+    rows = [log.model_dump() for log in logs]
+    for log in logs:
+        session.delete(log)
+    apply_deltas(session, {key: [-c, -m] for key, (c, m) in log_deltas(logs).items()})
+    velocity.retract_events(session, rows)
+
+def rebuild_project_rollup(session: Session, project_id: int):
+    """
+    Recompute a project's rollup from scratch. Completed tasks with no completion log
+    (data from before logs were written) are counted on their completed_at day.
+    """
+    session.exec(delete(DailyRollup).where(DailyRollup.project_id == project_id))
+    logs = session.exec(select(BehaviorLog).where(BehaviorLog.project_id == project_id)).all()
+    deltas = log_deltas(logs)
+    logged = {log.task_id for log in logs if log.action_type == "completion"}
+    completed = session.exec(
+        select(Task.id, Task.completed_at).where(Task.project_id == project_id, Task.status == True, Task.completed_at != None)
+    ).all()
+    for task_id, completed_at in completed:
+        if task_id not in logged:
+            deltas.setdefault((project_id, completed_at.date()), [0, 0])[0] += 1
+    apply_deltas(session, deltas)
+    logger.info(f"Rollup rebuilt: project={project_id}, days={len(deltas)}")
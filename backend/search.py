@@ -0,0 +1,149 @@
+import html
+import re
+import time
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event, inspect, text
+from sqlmodel import SQLModel
+from logger import logger
+
+# Tasks and milestones share one FTS5 table; rowid = 2 * id for tasks, 2 * id + 1 for
+# milestones, so triggers can address a row without a lookup. Title matches weigh 10x
+# body matches (description + guidance).
+INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        kind UNINDEXED, entity_id UNINDEXED, project_id UNINDEXED, title, body,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    "INSERT INTO search_index(search_index, rank) VALUES ('rank', 'bm25(0, 0, 0, 10.0, 1.0)')",
+    """
+    CREATE TRIGGER IF NOT EXISTS search_task_ai AFTER INSERT ON task BEGIN
+        INSERT INTO search_index(rowid, kind, entity_id, project_id, title, body)
+        VALUES (new.id * 2, 'task', new.id, new.project_id, new.title, coalesce(new.description, '') || ' ' || coalesce(new.guidance, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_task_au AFTER UPDATE OF title, description, guidance, project_id ON task BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+        INSERT INTO search_index(rowid, kind, entity_id, project_id, title, body)
+        VALUES (new.id * 2, 'task', new.id, new.project_id, new.title, coalesce(new.description, '') || ' ' || coalesce(new.guidance, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_task_ad AFTER DELETE ON task BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_milestone_ai AFTER INSERT ON milestone BEGIN
+        INSERT INTO search_index(rowid, kind, entity_id, project_id, title, body)
+        VALUES (new.id * 2 + 1, 'milestone', new.id, new.project_id, new.title, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_milestone_au AFTER UPDATE OF title, description, project_id ON milestone BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+        INSERT INTO search_index(rowid, kind, entity_id, project_id, title, body)
+        VALUES (new.id * 2 + 1, 'milestone', new.id, new.project_id, new.title, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_milestone_ad AFTER DELETE ON milestone BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+REBUILD_SQL = [
+    "DELETE FROM search_index",
+    """
+    INSERT INTO search_index(rowid, kind, entity_id, project_id, title, body)
+    SELECT id * 2, 'task', id, project_id, title, coalesce(description, '') || ' ' || coalesce(guidance, '') FROM task
+    """,
+    """
+    INSERT INTO search_index(rowid, kind, entity_id, project_id, title, body)
+    SELECT id * 2 + 1, 'milestone', id, project_id, title, coalesce(description, '') FROM milestone
+    """,
+    "INSERT INTO search_index(search_index) VALUES ('optimize')",
+]
+
+def install_search_index(conn):
+    """Create the FTS5 table and its sync triggers (idempotent)."""
+    for statement in INDEX_DDL:
+        conn.execute(text(statement))
+
+def rebuild_search_index(conn):
+    """Repopulate the index from the task and milestone tables (migrations and repair only)."""
+    for statement in REBUILD_SQL:
+        conn.execute(text(statement))
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _create_index(target, connection, **kw):
+    # Partial create_all calls (migrations) may run before the source tables exist
+    if inspect(connection).has_table("task") and inspect(connection).has_table("milestone"):
+        install_search_index(connection)
+
+@event.listens_for(SQLModel.metadata, "before_drop")
+def _drop_index(target, connection, **kw):
+    connection.execute(text("DROP TABLE IF EXISTS search_index"))
+
+_TERM = re.compile(r"\w+\*?", re.UNICODE)
+
+def build_match(query: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match, and a trailing * makes
+    that word a prefix. Operators and quotes in the input are treated as plain text.
+    """
+    terms = []
+    for term in _TERM.findall(query):
+        prefix = term.endswith("*")
+        word = term.rstrip("*")
+        terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return " ".join(terms)
+
+# highlight()/snippet() wrap matches in these private-use characters; the text is
+# HTML-escaped first and the markers become <mark> tags afterwards
+_OPEN, _CLOSE = "\ue000", "\ue001"
+
+def _markup(fragment: Optional[str]) -> Optional[str]:
+    if fragment is None:
+        return None
+    return html.escape(fragment).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+def search(conn, query: str, project_id: Optional[int] = None, kind: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Ranked matches with highlighted title and a body snippet, both HTML-escaped apart from
+    the <mark> tags. Scoping to a project reads the task and milestone tables by rowid, as
+    project_id in the index is UNINDEXED and would be checked row by row.
+    """
+    match = build_match(query)
+    if not match:
+        return []
+    start_time = time.time()
+    sql = """
+        SELECT kind, entity_id, project_id,
+               highlight(search_index, 3, :open, :close) AS title,
+               snippet(search_index, 4, :open, :close, '…', 12) AS snippet,
+               rank AS score
+        FROM search_index
+        WHERE search_index MATCH :match
+    """
+    params: Dict[str, Any] = {"match": match, "open": _OPEN, "close": _CLOSE, "limit": limit, "offset": offset}
+    if project_id is not None:
+        sql += """
+            AND search_index.rowid IN (
+                SELECT id * 2 FROM task WHERE project_id = :project_id
+                UNION ALL
+                SELECT id * 2 + 1 FROM milestone WHERE project_id = :project_id
+            )
+        """
+        params["project_id"] = project_id
+    if kind is not None:
+        sql += " AND kind = :kind"
+        params["kind"] = kind
+    sql += " ORDER BY rank LIMIT :limit OFFSET :offset"
+    rows = conn.execute(text(sql), params).mappings().all()
+    execution_time = (time.time() - start_time) * 1000
+    logger.info(f"Search: match={match!r}, project={project_id}, hits={len(rows)}, time={execution_time:.2f}ms")
+    return [{**row, "title": _markup(row["title"]), "snippet": _markup(row["snippet"])} for row in rows]
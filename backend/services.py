@@ -1,23 +1,39 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Tuple
-from models import Project, Task, Milestone, BehaviorLog
+from typing import List, Dict, Any, Tuple, Optional
+from sqlalchemy import Integer, case, cast, func
+from sqlmodel import Session, select
+from models import Project, ProjectSummary, ProjectVelocity, Task, Milestone, DailyRollup
+from velocity import VelocityEstimate, estimate
 
-def calculate_risk_model(project: Project) -> Tuple[int, str]:
-    now = datetime.utcnow()
-    total_tasks = len(project.tasks)
-    completed_tasks = [t for t in project.tasks if t.status]
-    num_completed = len(completed_tasks)
+def calculate_risk_model(project: Project, velocity: Optional[VelocityEstimate] = None, tasks: Optional[List[Task]] = None) -> Tuple[int, str]:
+    if tasks is None:
+        tasks = project.tasks
+    return risk_from_counts(
+        len(tasks),
+        sum(1 for t in tasks if t.status),
+        project.start_date,
+        project.deadline,
+        velocity.tasks_per_day if velocity else None,
+    )
+
+def risk_from_counts(total_tasks: int, num_completed: int, start_date: datetime, deadline: datetime, tasks_per_day: Optional[float] = None, now: Optional[datetime] = None) -> Tuple[int, str]:
+    """
+    Risk score and level from task counts alone, so callers holding SQL aggregates need no
+    Task rows. `tasks_per_day` is the recent velocity estimate, if the project has one.
+    """
+    now = now or datetime.utcnow()
     remaining_tasks = total_tasks - num_completed
     
     if total_tasks == 0:
         return 0, "Low"
     
-    days_left = (project.deadline.replace(tzinfo=None) - now).days
-    days_total = (project.deadline.replace(tzinfo=None) - project.start_date.replace(tzinfo=None)).days
-    days_passed = (now - project.start_date.replace(tzinfo=None)).days
+    days_left = (deadline.replace(tzinfo=None) - now).days
+    days_total = (deadline.replace(tzinfo=None) - start_date.replace(tzinfo=None)).days
+    days_passed = (now - start_date.replace(tzinfo=None)).days
     
     if days_passed <= 0: days_passed = 1
-    current_velocity = num_completed / days_passed # tasks per day
+    # Recent (exponentially weighted) pace when available, lifetime average otherwise
+    current_velocity = tasks_per_day if tasks_per_day is not None else num_completed / days_passed # tasks per day
     
     if days_left <= 0:
         return (100, "High") if remaining_tasks > 0 else (0, "Low")
@@ -42,33 +58,92 @@ def calculate_risk_model(project: Project) -> Tuple[int, str]:
         
     return risk_score, level
 
-def calculate_analytics(project: Project) -> Dict[str, Any]:
-    now = datetime.utcnow()
-    logs = project.behavior_logs
-    
-    # Velocity
-    days_passed = max(1, (now - project.start_date.replace(tzinfo=None)).days)
-    completed_tasks = [t for t in project.tasks if t.status]
-    velocity = len(completed_tasks) / days_passed
-    
-    # Consistency (Simple formula: Percentage of days with at least one completion)
-    completion_dates = {t.completed_at.date() for t in completed_tasks if t.completed_at}
-    consistency_score = int(min(100, (len(completion_dates) / days_passed) * 100))
-    
-    # Completion Trend (Last 7 days)
+def project_summaries(session: Session) -> List[ProjectSummary]:
+    """
+    Every project with task totals and risk, from one GROUP BY over task joined to project
+    (and the velocity model). No Task rows are loaded.
+    """
+    pending_hours = case((Task.status, 0.0), else_=Task.estimated_hours)
+    rows = session.exec(
+        select(
+            Project,
+            func.count(Task.id),
+            func.coalesce(func.sum(cast(Task.status, Integer)), 0),
+            func.coalesce(func.sum(pending_hours), 0.0),
+            func.max(Task.completed_at),
+            ProjectVelocity,
+        )
+        .outerjoin(Task, Task.project_id == Project.id)
+        .outerjoin(ProjectVelocity, ProjectVelocity.project_id == Project.id)
+        .group_by(Project.id)
+        .order_by(Project.id)
+    ).all()
+
+    today = datetime.utcnow().date()
+    summaries = []
+    for project, total, completed, remaining_hours, last_completed_at, velocity_state in rows:
+        velocity = estimate(velocity_state, today)
+        risk_score, risk_level = risk_from_counts(total, completed, project.start_date, project.deadline, velocity.tasks_per_day if velocity else None)
+        summaries.append(ProjectSummary(
+            **project.model_dump(),
+            total_tasks=total,
+            completed_tasks=completed,
+            completion_percentage=round(completed / total * 100, 2) if total else 0,
+            remaining_hours=round(remaining_hours, 2),
+            last_completed_at=last_completed_at,
+            risk_score=risk_score,
+            risk_level=risk_level,
+        ))
+    return summaries
+
+def calculate_analytics(project: Project, session: Session, window_days: int = 7, rolling_days: int = 7) -> Dict[str, Any]:
+    """
+    Velocity, consistency and trends for the last `window_days`, served from DailyRollup.
+    Reads at most window_days + rolling_days rows regardless of project history.
+    """
+    today = datetime.utcnow().date()
+    window_start = today - timedelta(days=window_days - 1)
+    read_start = window_start - timedelta(days=rolling_days - 1)
+    rows = session.exec(
+        select(DailyRollup.day, DailyRollup.completions, DailyRollup.work_minutes)
+        .where(DailyRollup.project_id == project.id, DailyRollup.day >= read_start, DailyRollup.day <= today)
+    ).all()
+    by_day = {day: (c, m) for day, c, m in rows}
+
+    span = (today - read_start).days + 1
+    completions = [by_day.get(read_start + timedelta(days=i), (0, 0))[0] for i in range(span)]
+    minutes = [by_day.get(read_start + timedelta(days=i), (0, 0))[1] for i in range(span)]
+
+    offset = rolling_days - 1
+    window_completions = completions[offset:]
+    window_minutes = minutes[offset:]
+
+    # Days before the project started do not count against consistency
+    project_start = project.start_date.replace(tzinfo=None).date()
+    eligible_days = max(1, min(window_days, (today - project_start).days + 1))
+    active_days = sum(1 for c, m in zip(window_completions, window_minutes) if c or m)
+
     trend = []
-    for i in range(7):
-        date = (now - timedelta(days=i)).date()
-        count = sum(1 for t in completed_tasks if t.completed_at and t.completed_at.date() == date)
-        trend.append({"date": str(date), "count": count})
-    
+    rolling = []
+    running = sum(completions[:offset])
+    for i in range(window_days):
+        day = window_start + timedelta(days=i)
+        running += completions[offset + i]
+        trend.append({"date": str(day), "count": window_completions[i], "work_minutes": window_minutes[i]})
+        rolling.append({"date": str(day), "velocity": round(running / rolling_days, 2)})
+        running -= completions[i]
+
     return {
-        "current_velocity": round(velocity, 2),
-        "consistency_score": consistency_score,
-        "completion_trend": trend[::-1]
+        "window_days": window_days,
+        "current_velocity": round(sum(window_completions) / eligible_days, 2),
+        "work_hours_per_day": round(sum(window_minutes) / 60 / eligible_days, 2),
+        "active_days": active_days,
+        "consistency_score": int(min(100, active_days / eligible_days * 100)),
+        "completion_trend": trend,
+        "rolling_velocity": rolling,
     }
 
-def score_task_v2(task: Task, project: Project, available_hours: float) -> Tuple[float, Dict[str, float]]:
+def score_task_v2(task: Task, project: Project, available_hours: float, velocity: Optional[VelocityEstimate] = None, risk_score: Optional[int] = None, milestones: Optional[Dict[int, Milestone]] = None, deadline_slack_days: Optional[float] = None) -> Tuple[float, Dict[str, float]]:
     now = datetime.utcnow()
     
     # Weights
@@ -86,15 +161,24 @@ def score_task_v2(task: Task, project: Project, available_hours: float) -> Tuple
     # Milestone Bonus
     milestone_bonus = 0
     if task.milestone_id:
-        milestone = next((m for m in project.milestones if m.id == task.milestone_id), None)
+        # Callers scoring many tasks pass a milestone map in rather than scanning per task
+        if milestones is None:
+            milestones = {m.id: m for m in project.milestones}
+        milestone = milestones.get(task.milestone_id)
         if milestone and not milestone.status:
             milestone_bonus = W_MILESTONE * milestone.weight
     score += milestone_bonus
             
     # Urgency Bonus (Hyperbolic)
+    # A far-off own deadline can still be urgent when a downstream deadline needs this task
+    # done first; deadline_slack_days is that inherited slack (see propagate_deadlines).
     urgency_bonus = 0
+    days_until = None
     if task.deadline:
         days_until = (task.deadline.replace(tzinfo=None) - now).days
+    if deadline_slack_days is not None:
+        days_until = deadline_slack_days if days_until is None else min(days_until, deadline_slack_days)
+    if days_until is not None:
         if days_until < 0: urgency_bonus = W_URGENCY * 5
         elif days_until <= 2: urgency_bonus = W_URGENCY * 3
         elif days_until <= 7: urgency_bonus = W_URGENCY * 1
@@ -105,7 +189,9 @@ def score_task_v2(task: Task, project: Project, available_hours: float) -> Tuple
     score += time_fit_bonus
     
     # Delay Penalty
-    risk_score, _ = calculate_risk_model(project)
+    # Callers scoring many tasks pass the project's risk score in rather than recomputing it
+    if risk_score is None:
+        risk_score, _ = calculate_risk_model(project, velocity)
     delay_penalty = (risk_score / 10) * 5
     score -= delay_penalty
 
@@ -0,0 +1,100 @@
+import asyncio
+import inspect
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        # Strong reference to an async flight, which outlives its leader if that is cancelled
+        self.task: Optional[asyncio.Future] = None
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while it is in
+    flight wait for and share its result (or exception). Nothing is cached once the call
+    finishes, so keys should carry a data version to avoid sharing across writes.
+    Thread-pool callers use do(), coroutines use do_async(); both join the same flights.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        call, leader = self._join(key)
+        if not leader:
+            call.done.wait()
+            return self._outcome(call)
+        self._run(key, call, fn)
+        return self._outcome(call)
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """`fn` may be a coroutine function (awaited on this loop) or a blocking one (run in a thread)."""
+        call, leader = self._join(key)
+        if not leader:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self._lock:
+                if call.done.is_set():
+                    return self._outcome(call)
+                call.waiters.append((loop, future))
+            await future
+            return self._outcome(call)
+
+        if inspect.iscoroutinefunction(fn):
+            call.task = asyncio.ensure_future(self._run_async(key, call, fn))
+        else:
+            call.task = asyncio.ensure_future(asyncio.to_thread(self._run, key, call, fn))
+        # The computation is shared: cancelling the leader cancels only its own wait
+        await asyncio.shield(call.task)
+        return self._outcome(call)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def _join(self, key: Hashable) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            return call, True
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]):
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+        self._finish(key, call)
+
+    async def _run_async(self, key: Hashable, call: _Call, fn: Callable[[], Any]):
+        try:
+            call.result = await fn()
+        except BaseException as e:
+            call.error = e
+        self._finish(key, call)
+
+    def _finish(self, key: Hashable, call: _Call):
+        with self._lock:
+            del self._calls[key]
+            call.done.set()
+            waiters, call.waiters = call.waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    @staticmethod
+    def _outcome(call: _Call) -> Any:
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
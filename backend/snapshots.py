@@ -0,0 +1,172 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from sqlmodel import Session
+from models import Project, ProjectDetail
+from logic import calculate_project_stats
+from graph_cache import graph_version
+from database import engine
+from logger import logger
+from metrics import metrics
+from singleflight import SingleFlight
+
+@dataclass
+class ProjectSnapshot:
+    detail: ProjectDetail
+    version: int
+    computed_at: float  # time.time()
+    data_version: int = 0  # graph_version() the snapshot was computed from
+
+class RecomputeWorker:
+    """
+    Precomputes ProjectDetail snapshots off the request path.
+
+    Write paths call mark_dirty(); repeated marks for a project within `debounce_seconds`
+    collapse into one recompute, and a steady stream of writes still triggers a refresh at
+    least every `max_delay_seconds`. Each project has a data version that mark_dirty bumps,
+    so readers can tell whether the snapshot they got is behind the latest write.
+
+    That version is per process: writes served by another worker process only show up
+    through the shared graph_version() (the ChangeEvent log), which is_stale() checks when
+    given a session. Writes that append no ChangeEvent (project edits, ingested behavior
+    logs) are only seen by the process that made them.
+
+    Days left, forecasts, risk and decayed velocity are relative to the current date, so a
+    snapshot computed on an earlier (UTC) day is stale even if no data changed.
+    """
+    def __init__(self, session_factory: Callable[[], Session], debounce_seconds: float = 0.5, max_delay_seconds: float = 2.0):
+        self._session_factory = session_factory
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self._cond = threading.Condition()
+        self._versions: Dict[int, int] = {}
+        self._first_dirty: Dict[int, float] = {}
+        self._due: Dict[int, float] = {}
+        self._snapshots: Dict[int, ProjectSnapshot] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._flights = SingleFlight()
+
+    def mark_dirty(self, project_id: int):
+        now = time.monotonic()
+        with self._cond:
+            self._versions[project_id] = self._versions.get(project_id, 0) + 1
+            first = self._first_dirty.setdefault(project_id, now)
+            self._due[project_id] = min(now + self.debounce_seconds, first + self.max_delay_seconds)
+            self._cond.notify_all()
+
+    def version(self, project_id: int) -> int:
+        with self._cond:
+            return self._versions.get(project_id, 0)
+
+    def get_snapshot(self, project_id: int) -> Optional[ProjectSnapshot]:
+        with self._cond:
+            return self._snapshots.get(project_id)
+
+    def is_stale(self, snapshot: ProjectSnapshot, project_id: int, session: Optional[Session] = None) -> bool:
+        """
+        Whether a write landed after the snapshot or its day has passed; with a session,
+        writes from any process count.
+        """
+        if snapshot.version < self.version(project_id):
+            return True
+        if datetime.utcfromtimestamp(snapshot.computed_at).date() < datetime.utcnow().date():
+            return True
+        return session is not None and graph_version(session, project_id) > snapshot.data_version
+
+    def store(self, project_id: int, detail: ProjectDetail, version: int, data_version: int = 0) -> ProjectSnapshot:
+        snapshot = ProjectSnapshot(detail=detail, version=version, computed_at=time.time(), data_version=data_version)
+        with self._cond:
+            current = self._snapshots.get(project_id)
+            # A slower, older computation must not overwrite a newer one
+            if current is None or current.version <= version:
+                self._snapshots[project_id] = snapshot
+            # An inline compute of the latest version settles any queued refresh for it
+            if version >= self._versions.get(project_id, 0):
+                self._due.pop(project_id, None)
+                self._first_dirty.pop(project_id, None)
+        return snapshot
+
+    def compute(self, project_id: int, session: Optional[Session] = None) -> Optional[ProjectSnapshot]:
+        """
+        Compute and store a snapshot of the current data version. Concurrent callers for the
+        same project and version share a single computation. Returns None if the project
+        does not exist.
+        """
+        version = self.version(project_id)
+        return self._flights.do(("project_stats", project_id, version), lambda: self._compute(project_id, version, session))
+
+    def refresh(self, project_id: int) -> Optional[ProjectSnapshot]:
+        """Recompute one project now, on the calling thread."""
+        return self.compute(project_id)
+
+    def _compute(self, project_id: int, version: int, session: Optional[Session]) -> Optional[ProjectSnapshot]:
+        if session is None:
+            with self._session_factory() as own_session:
+                return self._compute(project_id, version, own_session)
+        start_time = time.time()
+        project = session.get(Project, project_id)
+        if not project:
+            with self._cond:
+                self._snapshots.pop(project_id, None)
+            return None
+        # Read before computing, so a write racing the computation leaves the snapshot stale
+        data_version = graph_version(session, project_id)
+        detail = calculate_project_stats(project, session=session)
+        metrics.increment("snapshot_refreshes")
+        execution_time = (time.time() - start_time) * 1000
+        logger.info(f"Snapshot refresh: project={project_id}, version={version}, time={execution_time:.2f}ms")
+        return self.store(project_id, detail, version, data_version)
+
+    def run_pending(self) -> int:
+        """Refresh every project whose debounce window has closed. Returns how many ran."""
+        now = time.monotonic()
+        with self._cond:
+            ready = [pid for pid, due in self._due.items() if due <= now]
+            for pid in ready:
+                del self._due[pid]
+                del self._first_dirty[pid]
+        for pid in ready:
+            try:
+                self.refresh(pid)
+            except Exception as e:
+                logger.error(f"Snapshot refresh failed: project={pid}, error={e}")
+        return len(ready)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="recompute-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if self._due:
+                        remaining = min(self._due.values()) - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._stopping:
+                    return
+            self.run_pending()
+
+worker = RecomputeWorker(lambda: Session(engine))
+
+def get_worker() -> RecomputeWorker:
+    return worker
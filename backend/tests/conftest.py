@@ -1,8 +1,15 @@
 import pytest
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
 from sqlmodel import SQLModel, create_engine, Session, StaticPool
 from fastapi.testclient import TestClient
 from main import app
 from database import get_session
+from snapshots import RecomputeWorker, get_worker
+from graph_cache import GraphCache, get_graph_cache
+from contextlib import contextmanager
+from query_stats import track_queries
+from models import Project, Task, Milestone, TaskDependency
 
 # SQLite in-memory database for testing
 DATABASE_URL = "sqlite://"
@@ -23,12 +30,82 @@ def session_fixture(engine):
     with Session(engine) as session:
         yield session
 
+@pytest.fixture(name="worker")
+def worker_fixture(engine):
+    # Snapshots are per-worker state; never let them leak between tests
+    return RecomputeWorker(lambda: Session(engine), debounce_seconds=0)
+
+@pytest.fixture(name="graph_cache")
+def graph_cache_fixture(tmp_path):
+    # Graph versions restart with every test database, so segments must not be shared
+    return GraphCache(str(tmp_path / "graphs"))
+
 @pytest.fixture(name="client")
-def client_fixture(session):
+def client_fixture(session, worker, graph_cache):
     def get_session_override():
         return session
     
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_worker] = lambda: worker
+    app.dependency_overrides[get_graph_cache] = lambda: graph_cache
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
+
+@pytest.fixture(name="max_queries")
+def max_queries_fixture():
+    """
+    Context manager asserting a block runs at most `limit` SQL statements:
+
+        with max_queries(5):
+            calculate_project_stats(project, session)
+    """
+    @contextmanager
+    def assert_max_queries(limit: int):
+        with track_queries() as stats:
+            yield stats
+        assert stats.statements <= limit, f"{stats.statements} statements (limit {limit}); most repeated: {stats.top_statements(3)}"
+    return assert_max_queries
+
+class Factory:
+    """Committed test rows with neutral defaults; keyword arguments override any field."""
+    def __init__(self, session: Session):
+        self.session = session
+
+    def _add(self, *rows):
+        self.session.add_all(rows)
+        self.session.commit()
+        return rows
+
+    def project(self, title: str = "P", started_days_ago: float = 5, days_left: float = 20, **fields) -> Project:
+        now = datetime.utcnow()
+        fields.setdefault("start_date", now - timedelta(days=started_days_ago))
+        fields.setdefault("deadline", now + timedelta(days=days_left))
+        return self._add(Project(title=title, **fields))[0]
+
+    def milestone(self, project: Project, title: str = "M", **fields) -> Milestone:
+        return self._add(Milestone(title=title, project_id=project.id, **fields))[0]
+
+    def task(self, project: Project, hours: float = 2.0, title: str = "t", **fields) -> Task:
+        return self.tasks(project, [hours], title=title, **fields)[0]
+
+    def tasks(self, project: Project, hours: Iterable[float], title: Optional[str] = None, **fields) -> List[Task]:
+        """One task per entry of `hours`, titled t0, t1, ... unless `title` is given."""
+        fields.setdefault("impact_score", 3)
+        fields.setdefault("effort_score", 3)
+        return list(self._add(*(
+            Task(title=title or f"t{i}", estimated_hours=h, project_id=project.id, **fields)
+            for i, h in enumerate(hours)
+        )))
+
+    def depend(self, pairs: Iterable[Tuple[Task, Task]]) -> List[TaskDependency]:
+        """(task, depends_on) pairs."""
+        return list(self._add(*(TaskDependency(task_id=t.id, depends_on_id=u.id) for t, u in pairs)))
+
+    def chain(self, tasks: List[Task]) -> List[TaskDependency]:
+        """Each task depends on the one before it."""
+        return self.depend(zip(tasks[1:], tasks))
+
+@pytest.fixture(name="factory")
+def factory_fixture(session):
+    return Factory(session)
@@ -0,0 +1,79 @@
+import threading
+import time
+import pytest
+from ai_cache import AIResultCache, plan_key, advice_key
+from ai_integration import AIService
+
+def test_plan_key_normalises_whitespace():
+    assert plan_key("Design schema\n\n  Build API  \r\n") == plan_key("Design schema\nBuild API")
+    assert plan_key("Design schema\nBuild API") != plan_key("Build API\nDesign schema")
+
+def test_advice_key_tracks_project_state():
+    data = {"id": 1, "tasks": [{"id": 1, "status": False, "estimated_hours": 2}], "critical_path": [1], "delay_prob": 10}
+    changed = {**data, "tasks": [{"id": 1, "status": True, "estimated_hours": 2}]}
+    assert advice_key(data, 4) == advice_key(dict(data), 4.0)
+    assert advice_key(data, 4) != advice_key(data, 2)
+    assert advice_key(data, 4) != advice_key(changed, 4)
+
+def test_memory_and_disk_tiers(engine):
+    cache = AIResultCache(engine, max_entries=1)
+    calls = []
+    
+    def model():
+        calls.append(1)
+        return {"tasks": [{"title": "A"}]}
+    
+    first = cache.get_or_compute("plan", "k1", model)
+    first["tasks"].append("mutated")
+    assert cache.get_or_compute("plan", "k1", model) == {"tasks": [{"title": "A"}]}
+    
+    # Evicted from memory by k2, still served from SQLite
+    cache.get_or_compute("plan", "k2", model)
+    cache.clear_memory()
+    assert cache.get_or_compute("plan", "k1", model) == {"tasks": [{"title": "A"}]}
+    assert len(calls) == 2
+
+def test_ttl_expiry(engine):
+    cache = AIResultCache(engine, ttl_seconds=0.05)
+    calls = []
+    cache.get_or_compute("advice", "k", lambda: calls.append(1) or {"n": len(calls)})
+    time.sleep(0.1)
+    assert cache.purge_expired() == 1
+    assert cache.get_or_compute("advice", "k", lambda: calls.append(1) or {"n": len(calls)}) == {"n": 2}
+
+def test_concurrent_misses_call_model_once(engine):
+    cache = AIResultCache(engine)
+    calls = []
+    release = threading.Event()
+    
+    def slow_model():
+        calls.append(1)
+        release.wait(5)
+        return {"ok": True}
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("plan", "same", slow_model))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    while not calls:
+        time.sleep(0.001)
+    time.sleep(0.02)
+    release.set()
+    for t in threads:
+        t.join()
+    
+    assert len(calls) == 1
+    assert results == [{"ok": True}] * 6
+
+def test_ai_service_uses_cache(engine, monkeypatch):
+    monkeypatch.setattr(AIService, "cache", AIResultCache(engine))
+    calls = []
+    original = AIService._mock_ai_structure_plan
+    monkeypatch.setattr(AIService, "_mock_ai_structure_plan", staticmethod(lambda text: calls.append(text) or original(text)))
+    
+    first = AIService.structure_plan(1, "Step one\nStep two")
+    second = AIService.structure_plan(2, "  Step one\n\nStep two\n")
+    
+    assert first == second
+    assert len(first["tasks"]) == 2
+    assert len(calls) == 1
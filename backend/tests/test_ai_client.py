@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+from datetime import datetime
+from ai_client import AsyncAIClient, AIClientError
+from ai_stub_server import run_stub_server
+from ai_integration import AIService
+from ai_cache import AIResultCache
+
+def _project_data(pid):
+    return {
+        "id": pid,
+        "tasks": [{"id": 1, "status": False, "estimated_hours": 2.0}, {"id": 2, "status": False, "estimated_hours": 8.0}],
+        "critical_path": [2, 1],
+        "delay_prob": 12.5,
+        "forecast_completion": datetime(2026, 5, 1),
+    }
+
+def test_structure_plan_streams_from_stub():
+    tokens = []
+    
+    async def main(url):
+        client = AsyncAIClient(url)
+        try:
+            return await client.structure_plan("Design schema\nBuild API\nShip", on_token=tokens.append)
+        finally:
+            await client.aclose()
+    
+    with run_stub_server() as server:
+        plan = asyncio.run(main(server.url))
+    
+    assert plan == AIService._mock_ai_structure_plan("Design schema\nBuild API\nShip")
+    assert len(tokens) > 1
+
+def test_advice_requests_are_micro_batched():
+    async def main(url):
+        client = AsyncAIClient(url, batch_window=0.05, max_batch=8)
+        try:
+            return await asyncio.gather(*[client.get_advice(_project_data(pid), 4.0) for pid in range(5)])
+        finally:
+            await client.aclose()
+    
+    with run_stub_server() as server:
+        results = asyncio.run(main(server.url))
+        assert server.batch_sizes == [5]
+    
+    # Task 2 is first on the critical path but does not fit in 4h
+    assert [r["recommended_task_id"] for r in results] == [1] * 5
+
+def test_concurrency_limit_and_timeout():
+    async def bounded(url):
+        client = AsyncAIClient(url, max_concurrency=2)
+        try:
+            await asyncio.gather(*[client.structure_plan(f"Plan {i}") for i in range(6)])
+        finally:
+            await client.aclose()
+    
+    async def too_slow(url):
+        client = AsyncAIClient(url, timeout=0.05)
+        try:
+            await client.structure_plan("A\nB\nC")
+        finally:
+            await client.aclose()
+    
+    with run_stub_server(token_delay=0.02) as server:
+        asyncio.run(bounded(server.url))
+        assert server.request_count == 6
+        assert server.max_active <= 2
+        with pytest.raises(AIClientError):
+            asyncio.run(too_slow(server.url))
+
+def test_malformed_responses_raise_client_errors():
+    async def call(url, advice=False):
+        client = AsyncAIClient(url, batch_window=0.001)
+        try:
+            if advice:
+                return await client.get_advice(_project_data(1), 4.0)
+            return await client.structure_plan("A\nB")
+        finally:
+            await client.aclose()
+
+    with run_stub_server() as server:
+        server.reply = '{"tasks": [unquoted'
+        with pytest.raises(AIClientError):
+            asyncio.run(call(server.url))
+        server.reply = '{"answers": []}'
+        with pytest.raises(AIClientError):
+            asyncio.run(call(server.url, advice=True))
+
+def test_advisor_endpoint_uses_async_client(client, factory, engine, monkeypatch):
+    project = factory.project(title="AI", started_days_ago=2, days_left=10)
+    factory.task(project, title="Only")
+    monkeypatch.setattr(AIService, "cache", AIResultCache(engine))
+    
+    with run_stub_server() as server:
+        monkeypatch.setattr(AIService, "client", AsyncAIClient(server.url, batch_window=0.001))
+        first = client.post(f"/projects/{project.id}/advisor?available_hours=3")
+        second = client.post(f"/projects/{project.id}/advisor?available_hours=3")
+        assert server.request_count == 1
+    
+    assert first.status_code == 200
+    assert first.json() == second.json()
+    assert first.json()["recommended_task_id"] is not None
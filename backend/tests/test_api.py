@@ -1,6 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
-from models import ProjectRead
+from datetime import datetime, timedelta
+from models import ProjectRead, Project, Task
+from services import calculate_risk_model
 
 def test_create_project(client: TestClient):
     response = client.post(
@@ -30,6 +32,33 @@ def test_get_projects(client: TestClient):
     data = response.json()
     assert len(data) >= 1
 
+def test_project_list_aggregates(client: TestClient, session, max_queries):
+    now = datetime.utcnow()
+    busy = Project(title="Busy", start_date=now - timedelta(days=10), deadline=now + timedelta(days=5))
+    empty = Project(title="Empty", deadline=now + timedelta(days=5))
+    session.add_all([busy, empty])
+    session.commit()
+    done_at = now - timedelta(days=1)
+    session.add_all([
+        Task(title="a", estimated_hours=2, impact_score=3, effort_score=3, project_id=busy.id, status=True, completed_at=done_at),
+        Task(title="b", estimated_hours=3, impact_score=3, effort_score=3, project_id=busy.id),
+        Task(title="c", estimated_hours=1.5, impact_score=3, effort_score=3, project_id=busy.id),
+    ])
+    session.commit()
+
+    with max_queries(1):
+        data = {p["title"]: p for p in client.get("/projects").json()}
+    assert data["Busy"]["total_tasks"] == 3
+    assert data["Busy"]["completed_tasks"] == 1
+    assert data["Busy"]["remaining_hours"] == 4.5
+    assert data["Busy"]["last_completed_at"] == done_at.isoformat()
+    session.expire_all()
+    expected = calculate_risk_model(session.get(Project, busy.id))
+    assert (data["Busy"]["risk_score"], data["Busy"]["risk_level"]) == expected
+    assert data["Empty"]["total_tasks"] == 0
+    assert data["Empty"]["remaining_hours"] == 0
+    assert data["Empty"]["risk_level"] == "Low"
+
 def test_project_not_found(client: TestClient):
     response = client.get("/projects/999")
     assert response.status_code == 404
@@ -44,3 +73,18 @@ def test_metrics_endpoint(client: TestClient):
     assert "cpm_runs" in data
     assert "tasks_scored" in data
     assert "risk_evaluations" in data
+
+def test_milestone_rollup_endpoint(client: TestClient, session):
+    from models import Milestone, Task
+    project_id = client.post("/projects", json={"title": "P", "deadline": "2099-12-31T00:00:00"}).json()["id"]
+    milestone = Milestone(title="M", project_id=project_id)
+    session.add(milestone)
+    session.commit()
+    session.add(Task(title="t", estimated_hours=4, impact_score=3, effort_score=3, project_id=project_id, milestone_id=milestone.id))
+    session.commit()
+    
+    response = client.get(f"/projects/{project_id}/milestones/rollup")
+    assert response.status_code == 200
+    rollup = response.json()[0]
+    assert rollup["milestone_id"] == milestone.id
+    assert rollup["remaining_hours"] == 4 and rollup["slack_days"] is None
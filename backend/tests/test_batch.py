@@ -0,0 +1,81 @@
+from sqlmodel import select
+from metrics import metrics
+from models import TaskDependency, BehaviorLog, DailyRollup
+
+def _seed(factory):
+    project = factory.project(started_days_ago=0, days_left=30)
+    return project, factory.milestone(project), factory.tasks(project, [2] * 4)
+
+def test_batch_applies_everything_with_one_recompute(client, session, factory, worker):
+    project, milestone, (a, b, c, d) = _seed(factory)
+    dirty = []
+    worker_mark = worker.mark_dirty
+    worker.mark_dirty = lambda pid: (dirty.append(pid), worker_mark(pid))
+    
+    response = client.post(f"/projects/{project.id}/batch", json={
+        "tasks": [
+            {"id": a.id, "status": True},
+            {"id": b.id, "status": True},
+            {"id": c.id, "estimated_hours": 5, "milestone_id": milestone.id},
+        ],
+        "milestones": [{"id": milestone.id, "weight": 5}],
+        "dependencies": [{"task_id": d.id, "depends_on_id": c.id}],
+    })
+    assert response.status_code == 200
+    detail = response.json()
+    assert detail["completed_tasks"] == 2
+    assert detail["critical_path"] == [c.id, d.id]
+    assert response.headers["X-Snapshot-Stale"] == "false"
+    assert dirty == [project.id]
+    # The inline refresh covered the new version; nothing is left queued
+    before = metrics.get_metrics()["snapshot_refreshes"]
+    assert worker.run_pending() == 0
+    assert metrics.get_metrics()["snapshot_refreshes"] == before
+    
+    logs = session.exec(select(BehaviorLog)).all()
+    assert sorted(log.task_id for log in logs) == [a.id, b.id]
+    assert session.exec(select(DailyRollup)).one().completions == 2
+    session.refresh(c)
+    assert (c.estimated_hours, c.milestone_id) == (5, milestone.id)
+
+def test_batch_reopens_and_removes_dependencies(client, session, factory):
+    project, milestone, (a, b, c, d) = _seed(factory)
+    client.post(f"/projects/{project.id}/batch", json={
+        "tasks": [{"id": a.id, "status": True}],
+        "dependencies": [{"task_id": b.id, "depends_on_id": a.id}],
+    })
+    
+    detail = client.post(f"/projects/{project.id}/batch", json={
+        "tasks": [{"id": a.id, "status": False}],
+        "dependencies": [{"task_id": b.id, "depends_on_id": a.id, "remove": True}],
+    }).json()
+    assert detail["completed_tasks"] == 0
+    assert session.exec(select(BehaviorLog)).all() == []
+    assert session.exec(select(DailyRollup)).one().completions == 0
+    assert session.exec(select(TaskDependency)).all() == []
+
+def test_batch_rejects_cycles_and_foreign_rows(client, session, factory):
+    project, milestone, (a, b, c, d) = _seed(factory)
+    factory.depend([(b, a)])
+    
+    response = client.post(f"/projects/{project.id}/batch", json={
+        "tasks": [{"id": c.id, "status": True}],
+        "dependencies": [{"task_id": a.id, "depends_on_id": b.id}],
+    })
+    assert response.status_code == 409
+    session.refresh(c)
+    assert c.status is False
+    
+    assert client.post(f"/projects/{project.id}/batch", json={"tasks": [{"id": 999, "status": True}]}).status_code == 404
+    assert client.post(f"/projects/{project.id}/batch", json={"tasks": [{"id": a.id, "milestone_id": 999}]}).status_code == 404
+
+def test_batch_rejects_unordered_pert_estimates(client, session, factory):
+    project, milestone, (a, b, c, d) = _seed(factory)
+    url = f"/projects/{project.id}/batch"
+    assert client.post(url, json={"tasks": [{"id": a.id, "optimistic_hours": 5, "most_likely_hours": 3, "pessimistic_hours": 8}]}).status_code == 422
+
+    assert client.post(url, json={"tasks": [{"id": a.id, "optimistic_hours": 2, "most_likely_hours": 3, "pessimistic_hours": 8}]}).status_code == 200
+    # Ordered on its own, but not against the stored pessimistic estimate
+    assert client.post(url, json={"tasks": [{"id": a.id, "most_likely_hours": 9}]}).status_code == 409
+    session.refresh(a)
+    assert (a.optimistic_hours, a.most_likely_hours, a.pessimistic_hours) == (2, 3, 8)
@@ -36,3 +36,66 @@ def test_detect_bottlenecks():
     assert len(bottlenecks) >= 1
     assert bottlenecks[0]["task_id"] == 1
     assert "Blocking 3 downstream tasks" in bottlenecks[0]["reason"]
+
+def test_rollup_milestones():
+    from graph_engine import GraphEngine
+    from models import Milestone
+    now = datetime.utcnow()
+    late = Milestone(id=10, title="Late", weight=5, project_id=1, target_date=now + timedelta(days=1))
+    loose = Milestone(id=20, title="Loose", weight=2, project_id=1, target_date=now + timedelta(days=30))
+    tasks = [
+        Task(id=1, title="a", estimated_hours=6, milestone_id=10),
+        Task(id=2, title="b", estimated_hours=12, milestone_id=10),
+        Task(id=3, title="c", estimated_hours=3, milestone_id=20, status=True),
+        Task(id=4, title="d", estimated_hours=3, milestone_id=20),
+    ]
+    schedule = GraphEngine.calculate_schedule(tasks, [(2, 1)])
+    
+    rollups = {r["milestone_id"]: r for r in ForecastingModule.rollup_milestones(tasks, [late, loose], schedule, hours_per_day=6, now=now)}
+    
+    # 6h + 12h on the critical path at 6h/day: projected 3 days out, 2 days late
+    assert rollups[10]["remaining_hours"] == 18 and rollups[10]["critical_hours"] == 18
+    assert rollups[10]["projected_date"] == now + timedelta(days=3)
+    assert rollups[10]["slack_days"] == -2.0
+    assert rollups[10]["criticality"] == 100
+    assert rollups[20]["completion_percentage"] == 50
+    assert rollups[20]["criticality"] < 10
+    
+    bottlenecks = ForecastingModule.detect_bottlenecks(tasks, [(2, 1)], schedule["slack"], list(rollups.values()))
+    assert {b["task_id"]: b["impact_severity"] for b in bottlenecks} == {1: 100, 2: 100}
+    assert "past its target" in bottlenecks[0]["reason"]
+
+def test_rollup_ignores_hours_of_completed_predecessors():
+    from graph_engine import GraphEngine
+    from models import Milestone
+    now = datetime.utcnow()
+    milestone = Milestone(id=10, title="M", weight=3, project_id=1, target_date=now + timedelta(days=5))
+    done = Task(id=1, title="done", estimated_hours=30, status=True)
+    tasks = [done, Task(id=2, title="next", estimated_hours=6, milestone_id=10)]
+    schedule = GraphEngine.calculate_schedule(tasks, [(2, 1)])
+    
+    rollup = ForecastingModule.rollup_milestones(tasks, [milestone], schedule, hours_per_day=6, now=now)[0]
+    assert rollup["projected_date"] == now + timedelta(days=1)
+    assert rollup["slack_days"] == 4.0
+
+def test_pert_forecast_deadline_probability():
+    now = datetime(2026, 5, 1)
+    project = Project(id=1, title="P", start_date=now - timedelta(days=5), deadline=now + timedelta(days=2))
+    tasks = [Task(id=1, title="T", estimated_hours=12.0, optimistic_hours=6.0, most_likely_hours=12.0, pessimistic_hours=18.0)]
+    
+    # Mean finish is exactly the 12 working hours left before the deadline at 6h/day
+    pert = {"total_mean": 12.0, "total_variance": 4.0}
+    forecast = ForecastingModule.pert_forecast(project, pert, tasks, hours_per_day=6.0, now=now)
+    
+    assert forecast["expected_completion"] == now + timedelta(days=2)
+    assert forecast["deadline_probability"] == 50.0
+    assert forecast["std_dev_days"] == round(2 / 6, 2)
+    assert forecast["estimated_tasks"] == 1
+    eighty, ninety_five = forecast["confidence_intervals"]
+    assert eighty["level"] == 80 and ninety_five["level"] == 95
+    assert ninety_five["earliest"] < eighty["earliest"] < forecast["expected_completion"] < eighty["latest"] < ninety_five["latest"]
+    
+    late = ForecastingModule.pert_forecast(project, {"total_mean": 16.0, "total_variance": 4.0}, tasks, hours_per_day=6.0, now=now)
+    assert late["deadline_probability"] == pytest.approx(2.3, abs=0.1)
+    certain = ForecastingModule.pert_forecast(project, {"total_mean": 6.0, "total_variance": 0.0}, tasks, hours_per_day=6.0, now=now)
+    assert certain["deadline_probability"] == 100.0
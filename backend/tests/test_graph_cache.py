@@ -0,0 +1,107 @@
+import fcntl
+import os
+import threading
+from datetime import datetime, timedelta
+from models import Task
+from records import load_task_records
+from logic import load_dependencies, load_pending_graph
+from graph_cache import GraphCache, encode_graph, graph_version, load_graph
+from metrics import metrics
+
+def _project(factory, n_tasks=6):
+    now = datetime(2026, 3, 1, 9, 30, 0, 123456)
+    project = factory.project(title="Graph", deadline=now + timedelta(days=30))
+    tasks = factory.tasks(project, [i + 0.5 for i in range(n_tasks)], effort_score=2)
+    tasks[1].status, tasks[1].completed_at = True, now
+    for i, task in enumerate(tasks):
+        task.deadline = now + timedelta(days=i) if i % 2 else None
+    factory.chain(tasks)
+    factory.depend([(tasks[-1], tasks[0])])
+    return project
+
+def test_segment_round_trip(session, factory, graph_cache):
+    project = _project(factory)
+    tasks = load_task_records(session, project.id)
+    dependencies = load_dependencies(session, [t.id for t in tasks])
+
+    graph = load_graph(session, project.id, graph_cache)
+    assert graph.records() == tasks
+    assert sorted(graph.dependencies()) == sorted(dependencies)
+    pending, pending_deps = load_pending_graph(project, session)
+    assert graph.pending_graph()[0] == pending
+    assert sorted(graph.pending_graph()[1]) == sorted(pending_deps)
+
+def test_hit_needs_only_the_version_query(session, factory, graph_cache, max_queries):
+    project = _project(factory)
+    load_graph(session, project.id, graph_cache)
+    before = metrics.get_metrics()["graph_cache_hits"]
+    with max_queries(1):
+        load_graph(session, project.id, graph_cache)
+    assert metrics.get_metrics()["graph_cache_hits"] == before + 1
+
+def test_writes_publish_a_new_version(session, factory, graph_cache):
+    project = _project(factory)
+    first = load_graph(session, project.id, graph_cache)
+    task = session.get(Task, first.ids[0])
+    task.estimated_hours = 40
+    session.add(task)
+    session.commit()
+
+    assert graph_version(session, project.id) > first.version
+    second = load_graph(session, project.id, graph_cache)
+    assert second.hours[0] == 40
+    # The superseded segment is evicted, but the mapping held here stays readable
+    assert [(e["project_id"], e["version"]) for e in graph_cache.entries()] == [(project.id, second.version)]
+    assert first.hours[0] == 0.5
+
+def test_other_process_attaches_published_segment(session, factory, tmp_path):
+    project = _project(factory)
+    tasks = load_task_records(session, project.id)
+    data = encode_graph(tasks, load_dependencies(session, [t.id for t in tasks]))
+    directory = str(tmp_path / "shared")
+
+    pid = os.fork()
+    if pid == 0:
+        GraphCache(directory).put(project.id, 7, data)
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    graph = GraphCache(directory).get(project.id, 7)
+    assert graph is not None
+    assert graph.records() == tasks
+
+def test_least_recently_used_is_evicted(graph_cache):
+    data = encode_graph([], [])
+    cache = GraphCache(graph_cache.directory, max_bytes=len(data) * 2)
+    cache.put(1, 1, data)
+    cache.put(2, 1, data)
+    cache.get(1, 1)
+    cache.put(3, 1, data)
+    assert sorted(e["project_id"] for e in cache.entries()) == [1, 3]
+    assert not os.path.exists(os.path.join(cache.directory, "2-1.graph"))
+
+def test_lookups_share_the_index_lock(graph_cache):
+    data = encode_graph([], [])
+    graph_cache.put(1, 1, data)
+    before = {e["project_id"]: e["last_used_us"] for e in graph_cache.entries()}[1]
+
+    # Another reader holds the index lock shared; a lookup must not wait for it
+    fd = os.open(os.path.join(graph_cache.directory, "index"), os.O_RDWR)
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    found = []
+    reader = threading.Thread(target=lambda: found.append(GraphCache(graph_cache.directory).get(1, 1)))
+    reader.start()
+    reader.join(2)
+    finished_while_held = not reader.is_alive()
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+    reader.join()
+    assert finished_while_held and found[0] is not None
+    assert graph_cache.entries()[0]["last_used_us"] > before
+
+def test_paths_endpoint_uses_cache(client, session, factory):
+    project = _project(factory)
+    first = client.get(f"/projects/{project.id}/paths").json()
+    before = metrics.get_metrics()["graph_cache_hits"]
+    assert client.get(f"/projects/{project.id}/paths").json() == first
+    assert metrics.get_metrics()["graph_cache_hits"] == before + 1
@@ -90,3 +90,210 @@ def test_multiple_critical_paths():
     assert set(cp) == {1, 2, 3, 4}
     for tid in [1, 2, 3, 4]:
         assert slack[tid] <= 0.001
+
+def test_crashing_analysis_break_even():
+    """
+    Path A: 1 (5h) -> 2 (10h) -> 4 (5h)  [Total 20h]
+    Path B: 1 (5h) -> 3 (2h)  -> 4 (5h)  [Total 12h]
+    Shortening T2 pays off hour-for-hour until Path B (12h) takes over: 8h break-even.
+    """
+    tasks = [
+        Task(id=1, title="T1", estimated_hours=5.0),
+        Task(id=2, title="T2", estimated_hours=10.0),
+        Task(id=3, title="T3", estimated_hours=2.0),
+        Task(id=4, title="T4", estimated_hours=5.0),
+    ]
+    dependencies = [(2, 1), (3, 1), (4, 2), (4, 3)]
+    
+    analysis = {r["task_id"]: r for r in GraphEngine.calculate_crashing_analysis(tasks, dependencies)}
+    
+    assert analysis[2]["break_even_hours"] == 8.0
+    assert analysis[2]["duration_at_break_even"] == 12.0
+    assert analysis[1]["break_even_hours"] == 5.0
+    assert analysis[4]["break_even_hours"] == 5.0
+    assert analysis[3]["marginal_reduction_per_hour"] == 0.0
+    assert analysis[3]["slack"] == 8.0
+
+def test_crashing_analysis_parallel_critical_paths():
+    """Shortening one of two equal parallel critical branches buys nothing."""
+    tasks = [
+        Task(id=1, title="T1", estimated_hours=5.0),
+        Task(id=2, title="T2", estimated_hours=10.0),
+        Task(id=3, title="T3", estimated_hours=10.0),
+        Task(id=4, title="T4", estimated_hours=5.0),
+        Task(id=5, title="T5", estimated_hours=3.0),
+    ]
+    # 1 -> 2 -> 4, 1 -> 3 -> 4, plus an unrelated 3h task
+    dependencies = [(2, 1), (3, 1), (4, 2), (4, 3)]
+    
+    analysis = {r["task_id"]: r for r in GraphEngine.calculate_crashing_analysis(tasks, dependencies)}
+    
+    assert analysis[2]["marginal_reduction_per_hour"] == 0.0
+    assert analysis[3]["marginal_reduction_per_hour"] == 0.0
+    assert analysis[1]["break_even_hours"] == 5.0
+    assert analysis[4]["marginal_reduction_per_hour"] == 1.0
+
+def test_k_longest_paths_separates_parallel_branches():
+    """Two equal critical branches come back as separate ordered paths, then the shorter one."""
+    tasks = [
+        Task(id=1, title="T1", estimated_hours=5.0),
+        Task(id=2, title="T2", estimated_hours=10.0),
+        Task(id=3, title="T3", estimated_hours=10.0),
+        Task(id=4, title="T4", estimated_hours=5.0),
+        Task(id=5, title="T5", estimated_hours=9.0),
+    ]
+    # 1 -> {2, 3, 5} -> 4
+    dependencies = [(2, 1), (3, 1), (5, 1), (4, 2), (4, 3), (4, 5)]
+    
+    paths = GraphEngine.k_longest_paths(tasks, dependencies, k=3)
+    
+    assert [p["length"] for p in paths] == [20.0, 20.0, 19.0]
+    assert sorted(p["tasks"] for p in paths[:2]) == [[1, 2, 4], [1, 3, 4]]
+    assert paths[2]["tasks"] == [1, 5, 4]
+    assert paths[2]["slack"] == 1.0
+    
+    critical_only = GraphEngine.k_longest_paths(tasks, dependencies, k=10, within_hours=0.5)
+    assert len(critical_only) == 2
+
+def test_k_longest_paths_ignores_repeated_dependencies():
+    tasks = [Task(id=i, title=f"T{i}", estimated_hours=h) for i, h in ((1, 5.0), (2, 10.0), (3, 9.0), (4, 5.0))]
+    dependencies = [(2, 1), (2, 1), (3, 1), (4, 2), (4, 2), (4, 3)]
+    paths = GraphEngine.k_longest_paths(tasks, dependencies, k=2)
+    assert [p["tasks"] for p in paths] == [[1, 2, 4], [1, 3, 4]]
+
+def test_k_longest_paths_exponential_graph():
+    """A ladder of 60 diamonds has 2^60 paths; asking for the top few must stay cheap."""
+    tasks = [Task(id=0, title="S", estimated_hours=1.0)]
+    dependencies = []
+    prev = 0
+    for i in range(60):
+        a, b, join = 3 * i + 1, 3 * i + 2, 3 * i + 3
+        tasks += [
+            Task(id=a, title="A", estimated_hours=2.0),
+            Task(id=b, title="B", estimated_hours=1.0),
+            Task(id=join, title="J", estimated_hours=1.0),
+        ]
+        dependencies += [(a, prev), (b, prev), (join, a), (join, b)]
+        prev = join
+    
+    paths = GraphEngine.k_longest_paths(tasks, dependencies, k=5)
+    
+    assert len(paths) == 5
+    assert paths[0]["length"] == 1 + 60 * 3
+    assert all(p["slack"] == 1.0 for p in paths[1:])
+
+def test_k_longest_paths_equal_weight_ladder():
+    """Every one of the 2^40 paths ties; the first k must still come out without a blow-up."""
+    import time
+    tasks = [Task(id=0, title="S", estimated_hours=1.0)]
+    dependencies = []
+    prev = 0
+    for i in range(40):
+        a, b, join = 3 * i + 1, 3 * i + 2, 3 * i + 3
+        tasks += [Task(id=t, title="T", estimated_hours=1.0) for t in (a, b, join)]
+        dependencies += [(a, prev), (b, prev), (join, a), (join, b)]
+        prev = join
+    
+    start = time.perf_counter()
+    paths = GraphEngine.k_longest_paths(tasks, dependencies, k=3)
+    assert time.perf_counter() - start < 0.5
+    assert len(paths) == 3
+    assert all(p["length"] == 81.0 and p["slack"] == 0 for p in paths)
+    assert len({tuple(p["tasks"]) for p in paths}) == 3
+
+def test_propagate_deadlines_through_descendants():
+    """
+    1 (4h) -> 2 (4h) -> 3 (4h), with only 3 due, 10h from now; 4 (2h) is independent.
+    3 must finish by 10, so 2 by 6 and 1 by 2: the whole chain is 2h late. Task 1 is
+    already done, so it adds no remaining work and is not reported.
+    """
+    tasks = [
+        Task(id=1, title="T1", estimated_hours=4.0, status=True),
+        Task(id=2, title="T2", estimated_hours=4.0),
+        Task(id=3, title="T3", estimated_hours=4.0),
+        Task(id=4, title="T4", estimated_hours=2.0),
+    ]
+    dependencies = [(2, 1), (3, 2)]
+    cpm = GraphEngine.calculate_schedule(tasks, dependencies)
+    
+    result = GraphEngine.propagate_deadlines(tasks, cpm, {3: 10.0, 4: 100.0})
+    
+    assert result["required_finish"] == {1: 2.0, 2: 6.0, 3: 10.0, 4: 100.0}
+    assert result["lateness"] == {2: -2.0, 3: -2.0, 4: -98.0}
+    assert result["deadline_critical"] == []
+    
+    result = GraphEngine.propagate_deadlines(tasks, cpm, {3: 6.0})
+    assert result["lateness"] == {2: 2.0, 3: 2.0}
+    assert result["deadline_critical"] == [2, 3]
+
+def test_pert_schedule_propagates_variance():
+    """
+    1 -> 2 chain with three-point estimates, plus 3 done. Means add along the chain and so
+    do variances; with no spread anywhere the result equals the CPM duration.
+    """
+    tasks = [
+        Task(id=1, title="T1", estimated_hours=4.0, optimistic_hours=2.0, most_likely_hours=4.0, pessimistic_hours=12.0),
+        Task(id=2, title="T2", estimated_hours=3.0, optimistic_hours=3.0, most_likely_hours=3.0, pessimistic_hours=9.0),
+        Task(id=3, title="T3", estimated_hours=8.0, status=True),
+    ]
+    dependencies = [(2, 1), (2, 3)]
+    cpm = GraphEngine.calculate_schedule(tasks, dependencies)
+    pert = GraphEngine.pert_schedule(tasks, cpm)
+    
+    assert pert["mean"][1] == pytest.approx(5.0)
+    assert pert["mean"][2] == pytest.approx(5.0 + 4.0)
+    assert pert["variance"][2] == pytest.approx((10 / 6) ** 2 + 1.0)
+    assert pert["mean"][3] == 0.0
+    assert pert["total_mean"] == pytest.approx(9.0)
+    
+    plain = [Task(id=t.id, title=t.title, estimated_hours=t.estimated_hours) for t in tasks]
+    flat = GraphEngine.pert_schedule(plain, GraphEngine.calculate_schedule(plain, dependencies))
+    assert flat["total_mean"] == GraphEngine.calculate_schedule(plain, dependencies)["total_duration"]
+    assert flat["total_variance"] == 0.0
+
+def test_pert_parallel_paths_delay_expected_finish():
+    """Two identical uncertain branches into a join finish later on average than either alone."""
+    tasks = [
+        Task(id=1, title="A", estimated_hours=5.0, optimistic_hours=2.0, most_likely_hours=5.0, pessimistic_hours=8.0),
+        Task(id=2, title="B", estimated_hours=5.0, optimistic_hours=2.0, most_likely_hours=5.0, pessimistic_hours=8.0),
+        Task(id=3, title="Join", estimated_hours=1.0),
+    ]
+    dependencies = [(3, 1), (3, 2)]
+    pert = GraphEngine.pert_schedule(tasks, GraphEngine.calculate_schedule(tasks, dependencies))
+    
+    # E[max] of two iid N(5, 1) is 5 + 1/sqrt(pi)
+    assert pert["total_mean"] == pytest.approx(6.0 + 1 / 3.14159265 ** 0.5, rel=1e-6)
+    assert 0 < pert["total_variance"] < 1.0
+
+def test_redundant_dependencies():
+    """1 -> 2 -> 3 with a 1 -> 3 shortcut and a repeated 2 -> 3; the diamond 1 -> {2, 4} -> 5 stays."""
+    tasks = [Task(id=i, title=f"T{i}", estimated_hours=float(i)) for i in range(1, 6)]
+    dependencies = [(2, 1), (3, 2), (3, 1), (3, 2), (4, 1), (5, 2), (5, 4), (5, 1)]
+    
+    redundant = GraphEngine.redundant_dependencies(tasks, dependencies)
+    assert [dependencies[k] for k in redundant] == [(3, 1), (3, 2), (5, 1)]
+    assert redundant[1] == 3  # the repeat, not the first occurrence
+    
+    reduced = [d for k, d in enumerate(dependencies) if k not in set(redundant)]
+    before = GraphEngine.calculate_schedule(tasks, dependencies)
+    after = GraphEngine.calculate_schedule(tasks, reduced)
+    for key in ("es", "ef", "ls", "lf", "critical_path", "total_duration"):
+        assert before[key] == after[key]
+    
+    with pytest.raises(ValueError):
+        GraphEngine.redundant_dependencies(tasks, dependencies + [(1, 5)])
+
+def test_redundant_dependencies_random_dags_keep_schedule():
+    import random
+    rng = random.Random(7)
+    for _ in range(20):
+        n = 40
+        tasks = [Task(id=i, title=f"T{i}", estimated_hours=rng.choice([1.0, 2.0, 4.0])) for i in range(n)]
+        dependencies = [(j, i) for j in range(n) for i in range(j) if rng.random() < 0.15]
+        redundant = set(GraphEngine.redundant_dependencies(tasks, dependencies))
+        reduced = [d for k, d in enumerate(dependencies) if k not in redundant]
+        before = GraphEngine.calculate_schedule(tasks, dependencies)
+        after = GraphEngine.calculate_schedule(tasks, reduced)
+        assert before["es"] == after["es"] and before["lf"] == after["lf"]
+        # Minimal: removing any remaining edge changes reachability
+        assert GraphEngine.redundant_dependencies(tasks, reduced) == []
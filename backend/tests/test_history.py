@@ -0,0 +1,88 @@
+import pytest
+from datetime import datetime
+from sqlmodel import Session, select
+from models import ChangeEvent, HistorySnapshot
+import history
+from history import state_at, historical_stats
+
+def _events(session):
+    return session.exec(select(ChangeEvent).order_by(ChangeEvent.id)).all()
+
+def test_mutations_are_logged(session, factory):
+    project = factory.project()
+    factory.milestone(project)
+    a, b = factory.task(project, 4), factory.task(project, 2)
+    factory.depend([(b, a)])
+    a.estimated_hours = 8
+    session.add(a)
+    session.commit()
+    session.delete(b)
+    session.commit()
+
+    log = [(e.entity, e.op) for e in _events(session)]
+    assert log == [("milestone", "upsert"), ("task", "upsert"), ("task", "upsert"), ("dependency", "upsert"), ("task", "upsert"), ("task", "delete")]
+    assert all(e.project_id == project.id for e in _events(session))
+
+def test_dependency_deleted_with_its_task_is_logged(session, factory):
+    project = factory.project()
+    a, b = factory.task(project, 4), factory.task(project, 2)
+    [dependency] = factory.depend([(b, a)])
+    dependency_id, task_id = dependency.id, b.id
+    session.delete(dependency)
+    session.delete(b)
+    session.commit()
+
+    deletes = [(e.entity, e.entity_id, e.project_id) for e in _events(session) if e.op == "delete"]
+    assert sorted(deletes) == [("dependency", dependency_id, project.id), ("task", task_id, project.id)]
+
+def test_point_in_time_reconstruction(session, factory):
+    project = factory.project()
+    a, b = factory.task(project, 4), factory.task(project, 6)
+    factory.depend([(b, a)])
+    before_change = datetime.utcnow()
+    
+    a.estimated_hours = 10
+    b.status = True
+    session.add_all([a, b])
+    session.commit()
+    
+    past = state_at(session, project.id, before_change)
+    assert {t.id: (t.estimated_hours, t.status) for t in past.task_records()} == {a.id: (4, False), b.id: (6, False)}
+    assert past.dependency_pairs() == [(b.id, a.id)]
+    
+    stats = historical_stats(session, project, before_change)
+    assert stats["critical_path"] == [a.id, b.id]
+    assert stats["critical_path_hours"] == 10
+    
+    now = historical_stats(session, project, datetime.utcnow())
+    assert now["critical_path_hours"] == 10 and now["completed_tasks"] == 1
+    assert state_at(session, project.id, project.start_date).task == {}
+
+def test_snapshots_bound_replay(session, factory, monkeypatch):
+    monkeypatch.setattr(history, "SNAPSHOT_EVERY", 5)
+    project = factory.project()
+    task = factory.task(project, 1)
+    for hours in range(2, 13):
+        task.estimated_hours = hours
+        session.add(task)
+        session.commit()
+    
+    assert len(session.exec(select(HistorySnapshot)).all()) == 2
+    state = state_at(session, project.id)
+    assert state.replayed == 2
+    assert state.task[task.id]["estimated_hours"] == 12
+    # Between snapshots: start from the first one and replay up to the requested event
+    middle = state_at(session, project.id, _events(session)[6].timestamp)
+    assert middle.task[task.id]["estimated_hours"] == 7
+    assert middle.replayed == 2
+
+def test_history_endpoints(client, session, factory):
+    project = factory.project()
+    factory.task(project, 3)
+    
+    response = client.get(f"/projects/{project.id}/history", params={"at": datetime.utcnow().isoformat()})
+    assert response.status_code == 200
+    assert response.json()["total_tasks"] == 1
+    events = client.get(f"/projects/{project.id}/history/events").json()
+    assert [e["entity"] for e in events] == ["task"]
+    assert client.get("/projects/999/history", params={"at": datetime.utcnow().isoformat()}).status_code == 404
@@ -0,0 +1,63 @@
+import pytest
+from sqlmodel import select, func
+from main import app
+from models import BehaviorLog, BehaviorEvent, DailyRollup
+from ingestion import BehaviorIngestor, get_ingestor
+
+@pytest.fixture(name="ingestor")
+def ingestor_fixture(engine):
+    ingestor = BehaviorIngestor(engine, max_batch=100, flush_interval=0.01)
+    app.dependency_overrides[get_ingestor] = lambda: ingestor
+    yield ingestor
+    ingestor.stop()
+
+def test_batch_group_commit_updates_rollup(session, ingestor, factory):
+    project = factory.project(days_left=5)
+    events = [BehaviorEvent(action_type="work_session", duration_minutes=10) for _ in range(250)]
+    events.append(BehaviorEvent(action_type="completion"))
+    
+    ingestor.submit(project.id, events, wait=True, timeout=5)
+    ingestor.flush()
+    
+    assert session.exec(select(func.count(BehaviorLog.id))).one() == 251
+    rollup = session.exec(select(DailyRollup).where(DailyRollup.project_id == project.id)).one()
+    assert rollup.work_minutes == 2500
+    assert rollup.completions == 1
+
+def test_ingest_endpoint_single_and_batch(client, session, ingestor, factory):
+    project = factory.project(days_left=5)
+    
+    single = client.post(f"/projects/{project.id}/events?ack=committed", json={"action_type": "completion"})
+    assert single.status_code == 202
+    assert single.json() == {"accepted": 1, "ack": "committed"}
+    
+    batch = client.post(f"/projects/{project.id}/events", json=[{"action_type": "work_session", "duration_minutes": 25}] * 3)
+    assert batch.json()["accepted"] == 3
+    ingestor.flush()
+    
+    assert session.exec(select(func.count(BehaviorLog.id))).one() == 4
+    assert client.post(f"/projects/{project.id}/events?ack=fsync", json={}).status_code == 422
+
+def test_empty_and_unknown_submissions(client, session, ingestor, factory):
+    project = factory.project(days_left=5)
+    response = client.post(f"/projects/{project.id}/events?ack=committed", json=[])
+    assert response.status_code == 202
+    assert response.json()["accepted"] == 0
+    assert client.post("/projects/999/events", json={"action_type": "completion"}).status_code == 404
+    assert ingestor.pending() == 0
+
+def test_backpressure_above_high_water_mark(client, session, engine, factory):
+    project = factory.project(days_left=5)
+    # No background flushes within the test: the buffer only drains when told to
+    ingestor = BehaviorIngestor(engine, max_batch=1000, flush_interval=60, max_pending=5, backpressure_timeout=0.05)
+    app.dependency_overrides[get_ingestor] = lambda: ingestor
+    try:
+        event = {"action_type": "work_session", "duration_minutes": 5}
+        assert client.post(f"/projects/{project.id}/events", json=[event] * 4).status_code == 202
+        response = client.post(f"/projects/{project.id}/events", json=[event] * 2)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        ingestor.flush()
+        assert client.post(f"/projects/{project.id}/events", json=[event] * 2).status_code == 202
+    finally:
+        ingestor.stop()
@@ -0,0 +1,83 @@
+import itertools
+import random
+from records import TaskRecord
+from layout import LayoutCache, layered_layout, get_layout_cache
+from main import app
+
+def _rec(task_id, hours=1.0, milestone_id=None):
+    return TaskRecord(id=task_id, estimated_hours=hours, impact_score=3, effort_score=3, deadline=None,
+                      status=False, milestone_id=milestone_id, completed_at=None)
+
+def _crossings(layout):
+    """Count crossings between edges joining adjacent layers (bends included)."""
+    pos = {n[0]: (n[1], n[2]) for n in layout["nodes"]}
+    segments = []
+    for src, dst, bends, reversed_ in layout["edges"]:
+        if reversed_:
+            src, dst, bends = dst, src, bends[::-1]
+        points = [pos[src][1]] + bends + [pos[dst][1]]
+        for i, (a, b) in enumerate(zip(points, points[1:])):
+            segments.append((pos[src][0] + i, a, b))
+    return sum(1 for (l1, a1, b1), (l2, a2, b2) in itertools.combinations(segments, 2)
+               if l1 == l2 and (a1 - a2) * (b1 - b2) < 0)
+
+def test_layers_follow_longest_path():
+    # 1 -> 2 -> 3, 1 -> 3: 3 sits below 2 and the long edge gets one bend
+    tasks = [_rec(1), _rec(2), _rec(3)]
+    layout = layered_layout(tasks, [(2, 1), (3, 2), (3, 1)])
+    layers = {n[0]: n[1] for n in layout["nodes"]}
+    assert layers == {1: 0, 2: 1, 3: 2}
+    assert layout["layers"] == 3
+    bends = {(e[0], e[1]): e[2] for e in layout["edges"]}
+    assert len(bends[(1, 3)]) == 1 and bends[(1, 2)] == []
+
+def test_barycenter_removes_avoidable_crossings():
+    # Two independent chains laid out interleaved by id; sweeps must untangle them
+    tasks = [_rec(i) for i in range(1, 7)]
+    deps = [(5, 1), (4, 2), (6, 3)]
+    assert _crossings(layered_layout(tasks, deps)) == 0
+
+    rng = random.Random(7)
+    tasks = [_rec(i) for i in range(40)]
+    deps = {(b, a) for a in range(40) for b in range(a + 1, 40) if rng.random() < 0.08}
+    assert _crossings(layered_layout(tasks, list(deps))) <= _crossings(layered_layout(tasks, list(deps), sweeps=0))
+
+def test_collapse_by_milestone():
+    tasks = [_rec(1, milestone_id=10), _rec(2, milestone_id=10), _rec(3, milestone_id=20), _rec(4)]
+    layout = layered_layout(tasks, [(2, 1), (3, 2), (4, 3)], collapse="milestone")
+    nodes = {n[0]: n for n in layout["nodes"]}
+    assert set(nodes) == {"m10", "m20", 4}
+    assert nodes["m10"][3] == 2
+    assert {(e[0], e[1]) for e in layout["edges"]} == {("m10", "m20"), ("m20", 4)}
+
+def test_cluster_edges_keep_direction():
+    # 1 -> 2 -> 3 -> 4 with 1 and 4 in m10: m10 -> m20 and back again
+    tasks = [_rec(1, milestone_id=10), _rec(2, milestone_id=20), _rec(3, milestone_id=20), _rec(4, milestone_id=10)]
+    layout = layered_layout(tasks, [(2, 1), (3, 2), (4, 3)], collapse="milestone")
+    edges = {(e[0], e[1]): e[3] for e in layout["edges"]}
+    assert edges == {("m10", "m20"): False, ("m20", "m10"): True}
+
+def test_collapse_off_critical_chains():
+    # Critical 1 (10h) -> 5; side chain 2 -> 3 -> 4 (1h each) also feeds 5
+    tasks = [_rec(1, 10), _rec(2), _rec(3), _rec(4), _rec(5)]
+    layout = layered_layout(tasks, [(5, 1), (3, 2), (4, 3), (5, 4)], collapse="chains")
+    nodes = {n[0]: n for n in layout["nodes"]}
+    assert set(nodes) == {1, "c2-4", 5}
+    assert nodes["c2-4"][3] == 3 and not nodes["c2-4"][4]
+    assert nodes[1][4] and nodes[5][4]
+
+def test_layout_endpoint_caches_per_version(client, factory, worker):
+    project = factory.project(started_days_ago=0, days_left=10)
+    a, b = factory.tasks(project, [2, 2])
+    cache = LayoutCache()
+    app.dependency_overrides[get_layout_cache] = lambda: cache
+
+    first = client.get(f"/projects/{project.id}/layout").json()
+    assert first["layers"] == 1
+    assert client.get(f"/projects/{project.id}/layout").json() == first
+
+    client.post(f"/tasks/{b.id}/dependencies", params={"depends_on_id": a.id})
+    second = client.get(f"/projects/{project.id}/layout").json()
+    assert second["version"] > first["version"]
+    assert second["layers"] == 2
+    assert client.get(f"/projects/{project.id}/layout", params={"collapse": "bogus"}).status_code == 422
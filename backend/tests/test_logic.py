@@ -1,6 +1,6 @@
 import pytest
 from datetime import datetime, timedelta
-from services import score_task_v2, calculate_risk_model
+from services import score_task_v2, calculate_risk_model, risk_from_counts
 from models import Project, Task, Milestone
 
 def test_impact_logic_determinism():
@@ -120,3 +120,32 @@ def test_time_fit_bonus_determinism():
     
     # W_TIME_FIT = 30.
     assert score_fit == score_no_fit + 30
+
+def test_inherited_deadline_urgency():
+    """A task with no deadline of its own gets urgency from downstream deadline slack."""
+    project = Project(
+        id=1,
+        start_date=datetime.utcnow() - timedelta(days=10),
+        deadline=datetime.utcnow() + timedelta(days=10),
+        tasks=[],
+        milestones=[]
+    )
+    task = Task(id=1, impact_score=3, effort_score=3, estimated_hours=1)
+    
+    base, _ = score_task_v2(task, project, available_hours=5.0)
+    tight, breakdown = score_task_v2(task, project, available_hours=5.0, deadline_slack_days=1.5)
+    late, _ = score_task_v2(task, project, available_hours=5.0, deadline_slack_days=-0.5)
+    
+    assert breakdown["urgency"] == 60
+    assert tight == base + 60
+    assert late == base + 100
+
+def test_risk_from_counts_matches_task_model():
+    """The aggregate form gives the same risk as the model over Task rows."""
+    now = datetime.utcnow()
+    project = Project(id=1, start_date=now - timedelta(days=20), deadline=now + timedelta(days=10), tasks=[])
+    tasks = [Task(id=i, impact_score=3, effort_score=3, estimated_hours=1, status=i < 4) for i in range(10)]
+    
+    assert calculate_risk_model(project, tasks=tasks) == risk_from_counts(10, 4, project.start_date, project.deadline)
+    assert risk_from_counts(0, 0, project.start_date, project.deadline) == (0, "Low")
+    assert risk_from_counts(5, 2, now - timedelta(days=30), now - timedelta(days=1)) == (100, "High")
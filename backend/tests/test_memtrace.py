@@ -0,0 +1,34 @@
+from memtrace import stage, trace_memory, get_memory_diagnostics
+from main import app
+import benchmark
+
+def test_stages_record_allocations():
+    with stage("ignored"):
+        pass
+    with trace_memory() as trace:
+        with stage("alloc"):
+            block = bytearray(1_000_000)
+            del block
+        with stage("keep"):
+            kept = [bytearray(100_000) for _ in range(3)]
+    stages = trace.stage_map()
+    assert list(stages) == ["alloc", "keep"]
+    assert stages["alloc"]["peak_bytes"] >= 1_000_000 > stages["alloc"]["retained_bytes"]
+    assert stages["keep"]["retained_bytes"] >= 300_000
+    assert trace.peak_bytes >= 1_000_000
+
+def test_memory_diagnostic_endpoint(client, factory):
+    project = factory.project(days_left=30)
+    factory.tasks(project, [1] * 20)
+    assert client.get(f"/projects/{project.id}/diagnostics/memory").status_code == 404
+
+    app.dependency_overrides[get_memory_diagnostics] = lambda: True
+    report = client.get(f"/projects/{project.id}/diagnostics/memory").json()
+    assert report["tasks"] == 20
+    assert [s["stage"] for s in report["stages"]] == ["load", "cpm", "forecast", "scoring", "serialization", "encode"]
+    assert report["peak_bytes"] >= max(s["peak_bytes"] for s in report["stages"])
+
+def test_benchmark_budgets():
+    results = benchmark.run([200], benchmark.DEFAULT_BUDGETS)
+    assert results[0]["failures"] == []
+    assert benchmark.main(["--tasks", "200", "--budget", "cpm=1"]) == 1
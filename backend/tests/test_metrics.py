@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+from array import array
+import pytest
+from metrics import MetricsTracker
+
+def _work(path, n):
+    tracker = MetricsTracker(path, slots=8)
+    for _ in range(n):
+        tracker.increment("cpm_runs")
+        tracker.observe("sql_ms_per_request", 3.0)
+
+def test_in_process_tracker():
+    tracker = MetricsTracker()
+    tracker.increment("cpm_runs", 2)
+    tracker.increment("unknown")
+    tracker.observe("sql_statements_per_request", 7)
+    tracker.observe("sql_statements_per_request", 10_000)
+    assert tracker.get_metrics()["cpm_runs"] == 2
+    histogram = tracker.get_histograms()["sql_statements_per_request"]
+    assert histogram["count"] == 2 and histogram["sum"] == 10_007
+    assert histogram["counts"][3] == 1 and histogram["counts"][-1] == 1
+
+def test_workers_share_totals(tmp_path):
+    path = str(tmp_path / "metrics.bin")
+    reader = MetricsTracker(path, slots=8)
+    reader.increment("tasks_scored")
+    
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_work, args=(path, 500)) for _ in range(3)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+        assert p.exitcode == 0
+    
+    assert reader.get_metrics()["cpm_runs"] == 1500
+    assert reader.get_metrics()["tasks_scored"] == 1
+    histogram = reader.get_histograms()["sql_ms_per_request"]
+    assert histogram["count"] == 1500 and histogram["sum"] == 4500.0
+    
+    # A later worker reuses a dead worker's slot and keeps its counts
+    _work(path, 10)
+    assert reader.get_metrics()["cpm_runs"] == 1510
+
+def test_layout_change_waits_for_running_owners(tmp_path):
+    path = str(tmp_path / "metrics.bin")
+    old = MetricsTracker(path, slots=4)
+    cells = [0] * (4 * old._slot_cells)
+    cells[old._slot_cells] = os.getppid()  # a live process holding slot 1
+    with open(path, "wb") as f:
+        f.write(array("q", cells).tobytes())
+
+    tracker = MetricsTracker(path, slots=8)
+    with pytest.raises(RuntimeError, match="another layout"):
+        tracker.increment("cpm_runs")
+
+    cells[old._slot_cells] = 0
+    with open(path, "wb") as f:
+        f.write(array("q", cells).tobytes())
+    tracker.increment("cpm_runs")
+    assert tracker.get_metrics()["cpm_runs"] == 1
+    assert os.path.getsize(path) == 8 * tracker._slot_cells * 8
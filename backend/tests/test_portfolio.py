@@ -0,0 +1,75 @@
+import pytest
+from sqlmodel import Session, select
+from models import Task, TaskDependency
+from graph_engine import GraphEngine
+from portfolio import PortfolioPlanner, condense_project, get_planner
+from graph_cache import graph_version
+from records import TaskRecord
+from main import app
+
+def _seed(factory):
+    """
+    Project A: a1 (4h) -> a2 (6h) -> a3 (2h)          standalone 12h
+    Project B: b1 (3h) -> b2 (5h)                      standalone 8h
+    Cross: b2 depends on a2, a3 depends on b2 (A waits for B, which waits for A).
+    """
+    a, b = factory.project(title="A", started_days_ago=0, days_left=30), factory.project(title="B", started_days_ago=0, days_left=30)
+    a1, a2, a3 = factory.tasks(a, [4, 6, 2])
+    b1, b2 = factory.tasks(b, [3, 5])
+    factory.depend([(a2, a1), (a3, a2), (b2, b1), (b2, a2), (a3, b2)])
+    return a, b, (a1, a2, a3, b1, b2)
+
+def test_condensed_schedule_matches_flat_cpm(session, factory, worker):
+    a, b, tasks = _seed(factory)
+    planner = PortfolioPlanner(graph_version)
+    
+    result = planner.schedule(session)
+    
+    all_tasks = [TaskRecord.from_task(t) for t in tasks]
+    deps = [(d.task_id, d.depends_on_id) for d in session.exec(select(TaskDependency)).all()]
+    _, flat_duration, _ = GraphEngine.calculate_critical_path(all_tasks, deps)
+    
+    # a1 4 -> a2 10 -> b2 15 -> a3 17
+    assert result["total_duration"] == flat_duration == 17.0
+    by_project = {p["project_id"]: p for p in result["projects"]}
+    assert by_project[a.id]["delay_from_dependencies"] == 5.0
+    assert by_project[b.id]["finish"] == 15.0
+    assert [step["project_id"] for step in result["critical_chain"]] == [a.id, b.id, a.id]
+
+def test_expand_applies_cross_project_release(session, factory, worker):
+    a, b, (a1, a2, a3, b1, b2) = _seed(factory)
+    planner = PortfolioPlanner(graph_version)
+    
+    result = planner.schedule(session, expand=[a.id])
+    
+    expanded = {row["task_id"]: row for row in result["expanded"][a.id]}
+    assert expanded[a3.id]["es"] == 15.0
+    assert expanded[a3.id]["ef"] == 17.0
+    assert expanded[a1.id]["es"] == 0.0
+
+def test_condensations_are_reused_until_version_changes(session, factory, worker, monkeypatch):
+    _seed(factory)
+    planner = PortfolioPlanner(graph_version)
+    calls = []
+    import portfolio
+    original = portfolio.condense_project
+    monkeypatch.setattr(portfolio, "condense_project", lambda *args: calls.append(args[0]) or original(*args))
+    
+    planner.schedule(session)
+    planner.schedule(session)
+    assert len(calls) == 2
+    
+    # A write through any process appends a ChangeEvent, which moves the shared version
+    task = session.exec(select(Task).where(Task.project_id == calls[0])).first()
+    task.estimated_hours += 1
+    session.add(task)
+    session.commit()
+    planner.schedule(session)
+    assert len(calls) == 3
+
+def test_portfolio_endpoint_detects_cycles(client, session, factory, worker):
+    a, b, (a1, a2, a3, b1, b2) = _seed(factory)
+    factory.depend([(b1, a3)])
+    app.dependency_overrides[get_planner] = lambda: PortfolioPlanner(graph_version)
+    
+    assert client.get("/portfolio/schedule").status_code == 409
@@ -0,0 +1,74 @@
+import threading
+import time
+import pytest
+import profiling
+from profiling import Profiler, ProfileStore, StackSampler
+
+@pytest.fixture(name="profiler")
+def profiler_fixture(tmp_path, monkeypatch):
+    profiler = Profiler(ProfileStore(str(tmp_path), keep=3), sample_rate=0, interval=0.0005, token=None, enabled=True)
+    monkeypatch.setattr(profiling, "profiler", profiler)
+    return profiler
+
+def test_sampler_attributes_busy_threads():
+    def spin():
+        # Spin until the sampler has had a few turns at the GIL, whatever the machine load
+        end = time.perf_counter() + 2
+        while sampler.samples < 5 and time.perf_counter() < end:
+            pass
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    spin()
+    sampler.stop()
+    # Self samples: every frame above spin ties on inclusive count, so "total" may cut it off
+    top = dict(sampler.summary()["self"])
+    assert sampler.samples > 0
+    assert top.get("test_profiling:test_sampler_attributes_busy_threads.<locals>.spin", 0) > 0
+
+def test_sampler_skips_background_threads():
+    stop = threading.Event()
+    def background_loop():
+        while not stop.is_set():
+            pass
+    thread = threading.Thread(target=background_loop, name="recompute-worker", daemon=True)
+    thread.start()
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    end = time.perf_counter() + 2
+    while sampler.samples < 5 and time.perf_counter() < end:
+        pass
+    sampler.stop()
+    stop.set()
+    thread.join()
+    assert not any("background_loop" in stack for stack in sampler.stacks)
+
+def test_header_triggers_profile(client, profiler):
+    response = client.get("/metrics", headers={"X-Profile": "1"})
+    profile_id = response.headers["X-Profile-Id"]
+    
+    listing = client.get("/profiles").json()
+    assert [p["id"] for p in listing] == [profile_id]
+    assert listing[0]["path"] == "/metrics" and listing[0]["status"] == 200 and listing[0]["trigger"] == "header"
+    assert listing[0]["concurrent_requests"] == 0
+    assert "top" in client.get(f"/profiles/{profile_id}").json()
+    assert client.get(f"/profiles/{profile_id}/download").status_code == 200
+    assert client.get("/profiles/../etc/download").status_code == 404
+
+def test_unprofiled_requests_pass_through(client, profiler):
+    assert "X-Profile-Id" not in client.get("/metrics").headers
+    profiler.token = "secret"
+    assert "X-Profile-Id" not in client.get("/metrics", headers={"X-Profile": "1"}).headers
+    assert "X-Profile-Id" in client.get("/metrics", headers={"X-Profile": "secret"}).headers
+    assert client.get("/profiles").status_code == 404
+    assert len(client.get("/profiles", headers={"X-Profile": "secret"}).json()) == 1
+
+def test_disabled_profiler_serves_nothing(client, profiler):
+    profiler.enabled = False
+    assert "X-Profile-Id" not in client.get("/metrics", headers={"X-Profile": "1"}).headers
+    assert client.get("/profiles").status_code == 404
+
+def test_sampling_and_ring_bound(client, profiler):
+    profiler.sample_rate = 1.0
+    ids = [client.get("/metrics").headers["X-Profile-Id"] for _ in range(5)]
+    assert [p["id"] for p in client.get("/profiles").json()] == ids[::-1][:3]
+    assert client.get(f"/profiles/{ids[0]}").status_code == 404
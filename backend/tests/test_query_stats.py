@@ -0,0 +1,63 @@
+from sqlmodel import select
+from models import Project, Task, TaskDependency
+from logic import calculate_project_stats
+from metrics import metrics
+from query_stats import track_queries, note_tasks
+
+def _project(factory, n_tasks):
+    project = factory.project()
+    milestone = factory.milestone(project)
+    factory.chain(factory.tasks(project, [1] * n_tasks, milestone_id=milestone.id))
+    return project
+
+def test_project_stats_query_count_is_flat(session, factory, max_queries):
+    small, large = _project(factory, 3), _project(factory, 60)
+    counts = []
+    for project in (small, large):
+        session.expire_all()
+        project = session.get(Project, project.id)
+        with max_queries(8) as stats:
+            calculate_project_stats(project, session)
+        counts.append(stats.statements)
+    assert counts[0] == counts[1]
+
+def test_repeated_statements_are_reported(session, factory):
+    project = _project(factory, 12)
+    session.expire_all()
+    with track_queries() as stats:
+        for task in session.exec(select(Task)).all():
+            task.project.title  # lazy load per task
+    assert stats.objects_loaded >= 12
+    # Identity map serves the shared project after the first lazy load
+    assert stats.repeated(threshold=2) == []
+    
+    with track_queries() as stats:
+        for task_id in range(1, 13):
+            session.exec(select(Task).where(Task.id == task_id)).one()
+    assert stats.repeated(threshold=10)[0][1] == 12
+
+def test_n_plus_one_is_judged_against_task_count(session, factory):
+    project = _project(factory, 60)
+    session.expire_all()
+    with track_queries() as stats:
+        calculate_project_stats(session.get(Project, project.id), session)
+    assert stats.tasks == 60
+    assert not stats.n_plus_one()
+
+    with track_queries() as stats:
+        task_ids = session.exec(select(Task.id).where(Task.project_id == project.id)).all()
+        note_tasks(len(task_ids))
+        for task_id in task_ids:
+            session.exec(select(TaskDependency).where(TaskDependency.task_id == task_id)).all()
+    assert stats.n_plus_one()
+
+def test_request_headers_and_histograms(client, session, factory):
+    project = _project(factory, 5)
+    before = metrics.get_histograms()["sql_statements_per_request"]["count"]
+    
+    response = client.get(f"/projects/{project.id}")
+    assert int(response.headers["X-SQL-Count"]) > 0
+    assert float(response.headers["X-SQL-Time-Ms"]) >= 0
+    
+    histograms = client.get("/metrics").json()["histograms"]
+    assert histograms["sql_statements_per_request"]["count"] >= before + 1
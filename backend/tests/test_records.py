@@ -0,0 +1,42 @@
+import pytest
+from sqlmodel import Session
+from models import Project
+from records import TaskRecord, load_task_records
+from graph_engine import GraphEngine
+from logic import calculate_project_stats
+
+def _seed(factory):
+    project = factory.project(title="Records", started_days_ago=3, days_left=10)
+    tasks = factory.tasks(project, [5.0, 10.0, 2.0, 5.0], effort_score=2)
+    tasks[2].status = True
+    factory.depend([(tasks[1], tasks[0]), (tasks[2], tasks[0]), (tasks[3], tasks[1]), (tasks[3], tasks[2])])
+    return project.id, [t.id for t in tasks]
+
+def test_records_load_without_orm_objects(engine, session, factory):
+    project_id, ids = _seed(factory)
+    
+    with Session(engine) as fresh:
+        records = load_task_records(fresh, project_id)
+        assert len(fresh.identity_map) == 0
+        pending = load_task_records(fresh, project_id, pending_only=True)
+    
+    assert [r.id for r in records] == ids
+    assert all(isinstance(r, TaskRecord) for r in records)
+    assert not hasattr(records[0], "__dict__")
+    assert len(pending) == 3
+
+def test_engines_accept_records(engine, session, factory):
+    project_id, ids = _seed(factory)
+    dependencies = [(ids[1], ids[0]), (ids[2], ids[0]), (ids[3], ids[1]), (ids[3], ids[2])]
+    
+    with Session(engine) as fresh:
+        records = load_task_records(fresh, project_id)
+        cp, duration, _ = GraphEngine.calculate_critical_path(records, dependencies)
+        detail = calculate_project_stats(fresh.get(Project, project_id), session=fresh)
+    
+    assert duration == 20.0
+    assert cp == [ids[0], ids[1], ids[3]]
+    assert detail.critical_path == cp
+    assert detail.completed_tasks == 1
+    assert sorted(detail.tasks[3].dependency_ids) == sorted([ids[1], ids[2]])
+    assert detail.tasks[0].title == "t0"
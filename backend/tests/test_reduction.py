@@ -0,0 +1,50 @@
+from sqlmodel import select
+from models import TaskDependency, ChangeEvent
+
+def _project(factory):
+    project = factory.project(title="Chain")
+    tasks = factory.tasks(project, [2] * 4)
+    a, b, c, d = tasks
+    # Chain a -> b -> c -> d, decorated with shortcuts that the chain already implies
+    factory.depend([(b, a), (c, b), (d, c), (c, a), (d, a), (d, b)])
+    return project, tasks
+
+def test_reduce_dry_run_reports_savings(client, session, factory):
+    project, tasks = _project(factory)
+    report = client.post(f"/projects/{project.id}/dependencies/reduce").json()
+    
+    assert report["edges"] == 6
+    assert report["redundant_edges"] == 3
+    assert report["savings_percentage"] == 50.0
+    assert report["applied"] is False
+    assert len(session.exec(select(TaskDependency)).all()) == 6
+
+def test_reduce_apply_keeps_schedule(client, session, factory):
+    project, tasks = _project(factory)
+    before = client.get(f"/projects/{project.id}").json()
+    
+    report = client.post(f"/projects/{project.id}/dependencies/reduce", params={"apply": True}).json()
+    assert report["applied"] is True
+    pairs = {(d.task_id, d.depends_on_id) for d in session.exec(select(TaskDependency)).all()}
+    ids = [t.id for t in tasks]
+    assert pairs == {(ids[1], ids[0]), (ids[2], ids[1]), (ids[3], ids[2])}
+    deletes = session.exec(select(ChangeEvent).where(ChangeEvent.entity == "dependency", ChangeEvent.op == "delete")).all()
+    assert len(deletes) == 3
+    
+    after = client.get(f"/projects/{project.id}", params={"fresh": True}).json()
+    assert after["critical_path"] == before["critical_path"]
+    assert after["forecast_completion"][:13] == before["forecast_completion"][:13]
+    assert client.post(f"/projects/{project.id}/dependencies/reduce").json()["redundant_edges"] == 0
+
+def test_reduce_unknown_project(client):
+    assert client.post("/projects/999/dependencies/reduce").status_code == 404
+
+def test_shortcut_through_completed_task_is_kept(client, factory):
+    project = factory.project(title="Done middle")
+    a, b, c = factory.tasks(project, [5] * 3)
+    b.status = True
+    factory.depend([(b, a), (c, b), (c, a)])
+    
+    report = client.post(f"/projects/{project.id}/dependencies/reduce", params={"apply": True}).json()
+    assert report["redundant_edges"] == 0
+    assert client.get(f"/projects/{project.id}/paths").json()[0]["length"] == 10.0
@@ -0,0 +1,51 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlmodel import select
+from models import BehaviorLog, DailyRollup
+from rollups import record_behavior_log, rebuild_project_rollup
+from services import calculate_analytics
+
+def test_rollup_accumulates_logs(session, factory):
+    project = factory.project(started_days_ago=30, days_left=30)
+    now = datetime.utcnow()
+    record_behavior_log(session, BehaviorLog(project_id=project.id, action_type="completion", timestamp=now))
+    record_behavior_log(session, BehaviorLog(project_id=project.id, action_type="completion", timestamp=now))
+    record_behavior_log(session, BehaviorLog(project_id=project.id, action_type="work_session", duration_minutes=90, timestamp=now))
+    record_behavior_log(session, BehaviorLog(project_id=project.id, action_type="work_session", duration_minutes=30, timestamp=now - timedelta(days=3)))
+    session.commit()
+    
+    rows = {r.day: r for r in session.exec(select(DailyRollup).where(DailyRollup.project_id == project.id)).all()}
+    assert rows[now.date()].completions == 2
+    assert rows[now.date()].work_minutes == 90
+    assert rows[(now - timedelta(days=3)).date()].work_minutes == 30
+    
+    analytics = calculate_analytics(project, session, window_days=7)
+    assert len(analytics["completion_trend"]) == 7
+    assert analytics["completion_trend"][-1]["count"] == 2
+    assert analytics["active_days"] == 2
+    assert analytics["consistency_score"] == int(2 / 7 * 100)
+    assert analytics["work_hours_per_day"] == round(2 / 7, 2)
+
+def test_rebuild_counts_legacy_completions(session, factory):
+    project = factory.project(started_days_ago=30, days_left=30)
+    done_at = datetime.utcnow() - timedelta(days=1)
+    factory.task(project, 1, status=True, completed_at=done_at)
+    
+    rebuild_project_rollup(session, project.id)
+    session.commit()
+    
+    analytics = calculate_analytics(project, session, window_days=30)
+    assert analytics["completion_trend"][-2]["count"] == 1
+    assert sum(d["count"] for d in analytics["completion_trend"]) == 1
+
+def test_toggle_task_updates_analytics(client, session, factory):
+    project = factory.project(started_days_ago=30, days_left=30)
+    task = factory.task(project)
+    
+    assert client.patch(f"/tasks/{task.id}/toggle").json()["status"] is True
+    data = client.get(f"/projects/{project.id}/analytics?window=30").json()
+    assert data["completion_trend"][-1]["count"] == 1
+    
+    assert client.patch(f"/tasks/{task.id}/toggle").json()["status"] is False
+    data = client.get(f"/projects/{project.id}/analytics?window=30").json()
+    assert data["completion_trend"][-1]["count"] == 0
@@ -0,0 +1,66 @@
+from sqlmodel import select
+from models import Task
+from search import build_match, rebuild_search_index, search
+
+def _seed(factory):
+    p1, p2 = factory.project(title="One", days_left=30), factory.project(title="Two", days_left=30)
+    factory.task(p1, 2, title="Write database migration", guidance="Use ALTER TABLE for the new columns")
+    factory.task(p1, 1, title="Review docs", description="Mention the database schema once")
+    factory.task(p2, 1, title="Database backups")
+    factory.milestone(p2, title="Launch", description="Database frozen before launch")
+    return p1, p2
+
+def test_build_match_quotes_terms():
+    assert build_match('data* "OR" NEAR(') == '"data"* "OR" "NEAR"'
+    assert build_match("  ") == ""
+
+def test_ranked_scoped_prefix_search(session, factory):
+    p1, p2 = _seed(factory)
+    conn = session.connection()
+    
+    hits = search(conn, "database")
+    assert len(hits) == 4
+    # Title matches outrank body-only matches
+    assert {h["kind"] for h in hits[:2]} == {"task"} and "<mark>" in hits[0]["title"]
+    
+    scoped = search(conn, "database", project_id=p1.id)
+    assert [h["project_id"] for h in scoped] == [p1.id, p1.id]
+    assert "<mark>schema</mark>" not in scoped[1]["snippet"] and "<mark>database</mark>" in scoped[1]["snippet"]
+    
+    assert [h["kind"] for h in search(conn, "launch", kind="milestone")] == ["milestone"]
+    assert len(search(conn, "migra*")) == 1
+    assert search(conn, "migra") == []
+
+def test_index_follows_writes(session, factory):
+    p1, p2 = _seed(factory)
+    task = session.exec(select(Task).where(Task.title == "Review docs")).one()
+    task.title = "Review changelog"
+    session.add(task)
+    session.commit()
+    conn = session.connection()
+    assert [h["entity_id"] for h in search(conn, "changelog")] == [task.id]
+    
+    session.delete(task)
+    session.commit()
+    assert search(session.connection(), "changelog") == []
+    
+    rebuild_search_index(session.connection())
+    assert len(search(session.connection(), "database")) == 3
+
+def test_search_endpoint(client, session, factory):
+    p1, p2 = _seed(factory)
+    response = client.get("/search", params={"q": "backup*", "project_id": p2.id})
+    assert response.status_code == 200
+    assert [h["title"] for h in response.json()] == ["Database <mark>backups</mark>"]
+    assert client.get("/search", params={"q": "x", "kind": "project"}).status_code == 422
+
+def test_highlights_are_escaped(session, factory):
+    p1, p2 = _seed(factory)
+    factory.task(p2, 1, title="<b>Fix</b> database & cache", description="<img src=x onerror=alert(1)> database")
+    conn = session.connection()
+    hit = search(conn, "cache", project_id=p2.id)[0]
+    assert hit["title"] == "&lt;b&gt;Fix&lt;/b&gt; database &amp; <mark>cache</mark>"
+    hit = search(conn, "onerror")[0]
+    assert "<img" not in hit["snippet"] and "&lt;img" in hit["snippet"]
+    assert [h["kind"] for h in search(conn, "launch", project_id=p2.id)] == ["milestone"]
+    assert search(conn, "launch", project_id=p1.id) == []
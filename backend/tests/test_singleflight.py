@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import pytest
+from singleflight import SingleFlight
+
+def test_concurrent_threads_share_one_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+    
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"critical_path": [1, 2]}
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do(("stats", 1, 0), compute))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while flights.in_flight() == 0:
+        pass
+    release.set()
+    for t in threads:
+        t.join()
+    
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert all(r is results[0] for r in results)
+    assert flights.in_flight() == 0
+
+def test_errors_propagate_and_are_not_cached():
+    flights = SingleFlight()
+    
+    def fail():
+        raise ValueError("boom")
+    
+    with pytest.raises(ValueError):
+        flights.do("k", fail)
+    assert flights.do("k", lambda: 42) == 42
+
+def test_async_callers_share_one_call_with_threads():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    
+    def blocking_compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "detail"
+    
+    async def main():
+        leader = asyncio.create_task(flights.do_async("k", blocking_compute))
+        await asyncio.to_thread(started.wait, 5)
+        followers = [asyncio.create_task(flights.do_async("k", blocking_compute)) for _ in range(5)]
+        thread_result = []
+        thread = threading.Thread(target=lambda: thread_result.append(flights.do("k", blocking_compute)))
+        thread.start()
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(leader, *followers)
+        await asyncio.to_thread(thread.join)
+        return results + thread_result
+    
+    results = asyncio.run(main())
+    
+    assert results == ["detail"] * 7
+    assert len(calls) == 1
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flights = SingleFlight()
+    calls = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return "detail"
+
+        leader = asyncio.create_task(flights.do_async("k", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do_async("k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "detail"
+    assert len(calls) == 1
@@ -0,0 +1,74 @@
+import pytest
+from datetime import datetime
+from metrics import metrics
+
+def test_reads_serve_snapshot_and_report_staleness(client, session, worker, factory):
+    project = factory.project()
+    task = factory.task(project, 4)
+    
+    first = client.get(f"/projects/{project.id}")
+    assert first.headers["X-Snapshot-Stale"] == "false"
+    assert first.json()["completed_tasks"] == 0
+    
+    client.patch(f"/tasks/{task.id}/toggle")
+    stale = client.get(f"/projects/{project.id}")
+    assert stale.headers["X-Snapshot-Stale"] == "true"
+    assert stale.json()["completed_tasks"] == 0
+    
+    assert worker.run_pending() == 1
+    refreshed = client.get(f"/projects/{project.id}")
+    assert refreshed.headers["X-Snapshot-Stale"] == "false"
+    assert refreshed.headers["X-Snapshot-Version"] == "1"
+    assert refreshed.json()["completed_tasks"] == 1
+
+def test_fresh_read_bypasses_stale_snapshot(client, session, factory):
+    project = factory.project()
+    task = factory.task(project, 4)
+    client.get(f"/projects/{project.id}")
+    client.patch(f"/tasks/{task.id}/toggle")
+    
+    response = client.get(f"/projects/{project.id}?fresh=true")
+    assert response.headers["X-Snapshot-Stale"] == "false"
+    assert response.json()["completed_tasks"] == 1
+
+def test_dirty_bursts_coalesce_into_one_refresh(session, worker, factory):
+    project = factory.project()
+    factory.task(project, 4)
+    before = metrics.get_metrics()["snapshot_refreshes"]
+    
+    for _ in range(50):
+        worker.mark_dirty(project.id)
+    
+    assert worker.run_pending() == 1
+    assert worker.run_pending() == 0
+    assert metrics.get_metrics()["snapshot_refreshes"] == before + 1
+    assert worker.get_snapshot(project.id).version == 50
+
+def test_writes_from_another_process_mark_snapshot_stale(client, session, worker, factory):
+    project = factory.project()
+    task = factory.task(project, 4)
+    client.get(f"/projects/{project.id}")
+
+    # Written straight to the database, as another worker process would; this one's version never moves
+    task.status = True
+    task.completed_at = datetime.utcnow()
+    session.add(task)
+    session.commit()
+
+    stale = client.get(f"/projects/{project.id}")
+    assert stale.headers["X-Snapshot-Stale"] == "true"
+    assert worker.run_pending() == 1
+    refreshed = client.get(f"/projects/{project.id}")
+    assert refreshed.headers["X-Snapshot-Stale"] == "false"
+    assert refreshed.json()["completed_tasks"] == 1
+
+def test_snapshot_from_an_earlier_day_is_stale(client, session, worker, factory):
+    project = factory.project()
+    task = factory.task(project, 4)
+    client.get(f"/projects/{project.id}")
+    worker.get_snapshot(project.id).computed_at -= 86400
+
+    stale = client.get(f"/projects/{project.id}")
+    assert stale.headers["X-Snapshot-Stale"] == "true"
+    assert worker.run_pending() == 1
+    assert client.get(f"/projects/{project.id}").headers["X-Snapshot-Stale"] == "false"
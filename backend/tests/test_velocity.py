@@ -0,0 +1,100 @@
+import pytest
+from datetime import datetime, date, timedelta
+from models import Project, Task, ProjectVelocity, BehaviorLog
+from velocity import observe, retract, estimate, apply_events, rebuild_project_velocity, load_estimate, ALPHA, VelocityEstimate
+from forecasting import ForecastingModule
+
+def test_ewma_settles_days_and_decays_idle_days():
+    state = ProjectVelocity(project_id=1)
+    day0 = date(2026, 3, 1)
+    observe(state, day0, minutes=240, completions=2)
+    observe(state, day0 + timedelta(days=1), minutes=120)
+    assert state.hours_per_day == 4.0
+    assert state.tasks_per_day == 2.0
+    
+    # Day 1 (2h) settles, then two idle days decay the average
+    observe(state, day0 + timedelta(days=4), minutes=60)
+    expected = ALPHA * 2.0 + (1 - ALPHA) * 4.0
+    expected *= (1 - ALPHA) ** 2
+    assert state.settled_days == 4
+    assert abs(state.hours_per_day - expected) < 1e-9
+
+def test_estimate_requires_history():
+    state = ProjectVelocity(project_id=1)
+    today = date(2026, 3, 10)
+    observe(state, today, minutes=180, completions=1)
+    assert estimate(state, today) is None
+    
+    for i in range(1, 5):
+        observe(state, today + timedelta(days=i), minutes=180, completions=1)
+    result = estimate(state, today + timedelta(days=5))
+    assert result.settled_days == 5
+    assert result.hours_per_day == pytest.approx(3.0)
+    assert result.tasks_per_day == pytest.approx(1.0)
+    # estimate() must not mutate the stored state
+    assert state.open_day == today + timedelta(days=4)
+
+def test_apply_events_matches_replay(session, factory):
+    project = factory.project(title="Velocity", started_days_ago=10, days_left=10)
+    start = datetime.utcnow() - timedelta(days=6)
+    logs = [BehaviorLog(project_id=project.id, action_type="work_session", duration_minutes=120, timestamp=start + timedelta(days=i)) for i in range(6)]
+    
+    # Incremental, one event per call
+    for log in logs:
+        apply_events(session, [log])
+    session.commit()
+    incremental = load_estimate(session, project.id)
+    
+    session.add_all(logs)
+    rebuild_project_velocity(session, project.id)
+    session.commit()
+    session.expire_all()
+    assert load_estimate(session, project.id) == incremental
+    assert incremental.hours_per_day == pytest.approx(2.0)
+
+def test_retract_undoes_a_settled_day():
+    day0 = date(2026, 3, 1)
+    with_event, without = ProjectVelocity(project_id=1), ProjectVelocity(project_id=1)
+    for state, completions in ((with_event, 3), (without, 2)):
+        observe(state, day0, minutes=60, completions=1)
+        observe(state, day0 + timedelta(days=1), completions=completions)
+        observe(state, day0 + timedelta(days=4))
+    retract(with_event, day0 + timedelta(days=1), completions=1)
+    assert with_event.tasks_per_day == pytest.approx(without.tasks_per_day)
+    assert with_event.hours_per_day == pytest.approx(without.hours_per_day)
+
+def test_toggling_a_task_leaves_velocity_unchanged(client, session, factory):
+    project = factory.project(title="Toggle", started_days_ago=10, days_left=10)
+    task = factory.task(project, title="Flip")
+    session.add(ProjectVelocity(project_id=project.id, open_day=date.today() - timedelta(days=2), settled_days=8,
+                                hours_per_day=3.0, tasks_per_day=1.0, open_minutes=90, open_completions=1))
+    session.commit()
+    # The day in progress is not part of the estimate until it is over, so look from tomorrow
+    tomorrow = datetime.utcnow().date() + timedelta(days=1)
+    before = estimate(session.get(ProjectVelocity, project.id), tomorrow)
+    current = load_estimate(session, project.id)
+
+    for _ in range(3):
+        assert client.patch(f"/tasks/{task.id}/toggle").json()["status"] is True
+        assert client.patch(f"/tasks/{task.id}/toggle").json()["status"] is False
+    session.expire_all()
+    after = estimate(session.get(ProjectVelocity, project.id), tomorrow)
+    assert after.tasks_per_day == pytest.approx(before.tasks_per_day)
+    assert after.hours_per_day == pytest.approx(before.hours_per_day)
+    now = load_estimate(session, project.id)
+    assert (now.tasks_per_day, now.hours_per_day, now.settled_days) == (pytest.approx(current.tasks_per_day), pytest.approx(current.hours_per_day), current.settled_days)
+
+def test_forecast_uses_measured_hours_per_day():
+    project = Project(
+        id=1,
+        title="Forecast",
+        start_date=datetime.utcnow() - timedelta(days=10),
+        deadline=datetime.utcnow() + timedelta(days=30),
+        tasks=[Task(id=1, title="T", estimated_hours=24, impact_score=3, effort_score=3)]
+    )
+    default = ForecastingModule.calculate_forecast(project, 24.0)
+    slow = ForecastingModule.calculate_forecast(project, 24.0, VelocityEstimate(hours_per_day=2.0, tasks_per_day=0.5, settled_days=10))
+    
+    # 24h of critical path: 4 days at the 6h default, 12 days at 2h/day
+    assert (slow["estimated_completion"] - default["estimated_completion"]).days == 8
+    assert slow["delay_probability"] > default["delay_probability"]
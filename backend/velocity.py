@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Optional, List, Dict, Union
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, delete
+from models import ProjectVelocity, BehaviorLog
+
+# Smoothing for a ~14 day span: alpha = 2 / (span + 1)
+ALPHA = 2 / 15
+# Days of history before the estimate replaces the defaults
+MIN_SETTLED_DAYS = 3
+DEFAULT_HOURS_PER_DAY = 6.0
+MIN_HOURS_PER_DAY = 0.25
+
+@dataclass
+class VelocityEstimate:
+    hours_per_day: float
+    tasks_per_day: float
+    settled_days: int
+
+def _fold(current: Optional[float], value: float, idle_days: int) -> float:
+    """Fold one day's value into an EWMA after decaying over `idle_days` zero days."""
+    if current is None:
+        return value
+    current *= (1 - ALPHA) ** idle_days
+    return ALPHA * value + (1 - ALPHA) * current
+
+def observe(state: ProjectVelocity, day: date, minutes: int = 0, completions: int = 0):
+    """Add one event to the model in O(1). Events for days before the open day count towards it."""
+    if state.open_day is None:
+        state.open_day = day
+    elif day > state.open_day:
+        idle_days = (day - state.open_day).days - 1
+        state.hours_per_day = _fold(state.hours_per_day, state.open_minutes / 60, 0)
+        state.tasks_per_day = _fold(state.tasks_per_day, state.open_completions, 0)
+        if idle_days:
+            state.hours_per_day = _fold(state.hours_per_day, 0.0, idle_days - 1)
+            state.tasks_per_day = _fold(state.tasks_per_day, 0.0, idle_days - 1)
+        state.settled_days += idle_days + 1
+        state.open_day = day
+        state.open_minutes = 0
+        state.open_completions = 0
+    state.open_minutes += minutes
+    state.open_completions += completions
+
+def retract(state: ProjectVelocity, day: date, minutes: int = 0, completions: int = 0):
+    """
+    Take back an event observe() added, e.g. an undone completion. On the open day the
+    counters drop; for a settled day the event's decayed share of the EWMA is removed,
+    which is exact for an event observed on its own day. Never goes below zero.
+    """
+    if state.open_day is None:
+        return
+    if day >= state.open_day:
+        state.open_minutes = max(0, state.open_minutes - minutes)
+        state.open_completions = max(0, state.open_completions - completions)
+        return
+    weight = ALPHA * (1 - ALPHA) ** ((state.open_day - day).days - 1)
+    if state.hours_per_day is not None:
+        state.hours_per_day = max(0.0, state.hours_per_day - weight * minutes / 60)
+    if state.tasks_per_day is not None:
+        state.tasks_per_day = max(0.0, state.tasks_per_day - weight * completions)
+
+def estimate(state: Optional[ProjectVelocity], today: Optional[date] = None) -> Optional[VelocityEstimate]:
+    """Current estimate, treating the open day as settled if it is already over. Does not mutate state."""
+    if state is None or state.open_day is None:
+        return None
+    today = today or datetime.utcnow().date()
+    snapshot = ProjectVelocity(**state.model_dump())
+    if today > snapshot.open_day:
+        # Today is still in progress, so only the days before it are settled
+        observe(snapshot, today)
+    if snapshot.settled_days < MIN_SETTLED_DAYS or snapshot.hours_per_day is None:
+        return None
+    return VelocityEstimate(
+        hours_per_day=max(MIN_HOURS_PER_DAY, snapshot.hours_per_day),
+        tasks_per_day=snapshot.tasks_per_day,
+        settled_days=snapshot.settled_days,
+    )
+
+def load_estimate(session: Session, project_id: int) -> Optional[VelocityEstimate]:
+    return estimate(session.get(ProjectVelocity, project_id))
+
+def apply_events(conn: Union[Session, Connection], rows: List[dict]):
+    """
+    Fold BehaviorLog rows (dicts or objects with project_id, timestamp, action_type and
+    duration_minutes) into the per-project models: one read and one upsert per call.
+    """
+    _update(conn, rows, observe)
+
+def retract_events(conn: Union[Session, Connection], rows: List[dict]):
+    """Inverse of apply_events for deleted BehaviorLog rows (undone completions)."""
+    _update(conn, rows, retract)
+
+def _update(conn: Union[Session, Connection], rows: List[dict], step: Callable[..., None]):
+    if not rows:
+        return
+    rows = [r if isinstance(r, dict) else r.model_dump() for r in rows]
+    project_ids = {r["project_id"] for r in rows}
+    table = ProjectVelocity.__table__
+    existing = conn.execute(select(table).where(table.c.project_id.in_(project_ids))).mappings().all()
+    states: Dict[int, ProjectVelocity] = {r["project_id"]: ProjectVelocity(**r) for r in existing}
+
+    for row in sorted(rows, key=lambda r: r["timestamp"]):
+        state = states.setdefault(row["project_id"], ProjectVelocity(project_id=row["project_id"]))
+        if row["action_type"] == "completion":
+            step(state, row["timestamp"].date(), completions=1)
+        elif row["action_type"] == "work_session":
+            step(state, row["timestamp"].date(), minutes=row["duration_minutes"] or 0)
+
+    values = [state.model_dump() for state in states.values()]
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["project_id"],
+        set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name != "project_id"},
+    )
+    conn.execute(stmt, values)
+
+def rebuild_project_velocity(session: Session, project_id: int):
+    """Replay a project's BehaviorLog history into a fresh model (migrations and repair only)."""
+    session.exec(delete(ProjectVelocity).where(ProjectVelocity.project_id == project_id))
+    logs = session.exec(select(BehaviorLog).where(BehaviorLog.project_id == project_id)).scalars().all()
+    apply_events(session, logs)
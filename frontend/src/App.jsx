@@ -168,6 +168,11 @@ function App() {
                                 className={`sidebar-item ${project?.id === p.id ? 'active' : ''}`}
                             >
                                 <span style={{ overflow: 'hidden', textOverflow: 'ellipsis', whiteSpace: 'nowrap' }}>{p.title}</span>
+                                {p.total_tasks > 0 && (
+                                    <span className={`badge risk-${p.risk_level.toLowerCase()}`} style={{ marginLeft: 'auto' }} title={`${p.risk_level} risk, ${p.remaining_hours}h left`}>
+                                        {p.completed_tasks}/{p.total_tasks}
+                                    </span>
+                                )}
                             </div>
                         ))}
                         <button